@@ -1,4 +1,8 @@
+import timeit
+from contextlib import contextmanager
+
 import region_profiler as rp
+from region_profiler.overhead import calibrate
 from region_profiler.utils import SeqStats, pretty_print_time
 
 
@@ -11,6 +15,84 @@ def timed_fact(x):
     return x * timed_fact(x - 1) if x > 1 else x
 
 
+@contextmanager
+def generator_region(p, name):
+    """Generator-based region, equivalent to the former
+    ``@contextmanager`` implementation of ``RegionProfiler.region``.
+    Used as a baseline.
+    """
+    parent = p.current_node
+    p.node_stack.append(parent.get_child(name))
+    p.current_node.enter_region()
+    for l in p.listeners:
+        l.region_entered(p, p.current_node)
+    yield p.current_node
+    p.current_node.exit_region()
+    for l in p.listeners:
+        l.region_exited(p, p.current_node)
+    p.node_stack.pop()
+
+
+def measure_entry_cost(p, number=100000, repeat=5):
+    """Measure the cost of entering and leaving an empty region
+    using the generator-based baseline and the cached fast path,
+    with an explicit and an automatically deduced name.
+    """
+
+    def generator_path():
+        with generator_region(p, 'gen'):
+            pass
+
+    def fast_path():
+        with p.region('fast'):
+            pass
+
+    def unnamed_path():
+        with p.region():
+            pass
+
+    results = {}
+    for label, fn in (('generator', generator_path), ('fast path', fast_path),
+                      ('unnamed', unnamed_path)):
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[label] = best / number
+
+    print('Region enter/exit cost:')
+    for label, cost in results.items():
+        print('\t{:<10} {}'.format(label, pretty_print_time(cost)))
+    print('\tspeedup    {:.2f}x'.format(results['generator'] / results['fast path']))
+    print('\tunnamed/named {:.2f}x'.format(results['unnamed'] / results['fast path']))
+
+
+def measure_disabled_cost(number=1000000, repeat=5):
+    """Measure the overhead of instrumentation before :py:func:`rp.install`
+    is called: a decorated function and an empty region.
+    A function decorated after :py:func:`rp.disable` is the original function,
+    so its overhead is zero by construction.
+    """
+
+    def plain():
+        pass
+
+    @rp.func()
+    def decorated():
+        pass
+
+    def empty():
+        pass
+
+    def region():
+        with rp.region('x'):
+            pass
+
+    def cost(fn):
+        return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+    print('Overhead while not installed:')
+    print('\tdecorated call {}'.format(pretty_print_time(cost(decorated) - cost(plain))))
+    print('\tempty region   {}'.format(pretty_print_time(cost(region) - cost(empty))))
+
+
 def main(p):
     reps = 30
     loop_reps = 100
@@ -56,7 +138,16 @@ def main(p):
                  pretty_print_time(stats.avg),
                  pretty_print_time(stats.max)))
 
+    overhead = calibrate(p.timer_cls)
+    print('Calibrated overhead:\n\thit {}, self {}, clock resolution {}'.
+          format(pretty_print_time(overhead.hit_cost),
+                 pretty_print_time(overhead.self_cost),
+                 pretty_print_time(overhead.clock_resolution)))
+
+    measure_entry_cost(p)
+
 
 if __name__ == '__main__':
+    measure_disabled_cost()
     p = rp.install()
     main(p)
@@ -13,5 +13,20 @@
 .. moduleauthor:: Viacheslav Kroilov <slavakroilov@gmail.com>
 """
 
-from region_profiler.global_instance import func, install, iter_proxy, region, uninstall
+from region_profiler.global_instance import (
+    aregion,
+    disable,
+    func,
+    install,
+    is_disabled,
+    iter_proxy,
+    pause,
+    region,
+    resume,
+    toggle_on_signal,
+    uninstall,
+    worker_init_fn,
+)
 from region_profiler.profiler import RegionProfiler
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.sync import SyncPolicy
@@ -0,0 +1,5 @@
+import sys
+
+from region_profiler.cli import main
+
+sys.exit(main())
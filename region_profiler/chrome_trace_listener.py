@@ -1,69 +1,243 @@
+import gzip
+import json
 import os
+import queue
 import sys
 import threading
+import time
+import tracemalloc
 
 from region_profiler.listener import RegionProfilerListener
 
 
+class _ThreadState:
+    """Per-thread state of :py:class:`ChromeTraceListener`."""
+
+    __slots__ = ('tid', 'events', 'pending_begin_node', 'last_canceled_node')
+
+    def __init__(self):
+        self.tid = threading.get_ident()
+        self.events = []
+        self.pending_begin_node = None
+        self.last_canceled_node = None
+
+
 class ChromeTraceListener(RegionProfilerListener):
     """This listener produces a log, suitable for Chrome Trace Viewer.
 
     Learn more about `Chrome Trace Viewer
     <https://aras-p.info/blog/2017/01/23/Chrome-Tracing-as-Profiler-Frontend/>`_.
+
+    Events are recorded as tuples into a per-thread buffer. Full buffers
+    are passed to a background thread, that serializes them and writes
+    them to the file, so the profiled threads do not pay for formatting and I/O.
+    At most ``max_pending_batches`` buffers may wait for the writer,
+    then the profiled threads are blocked until the writer catches up.
+
+    For long runs the trace may be gzip-compressed, written as complete
+    (``"X"``) events, that need a single record per region hit instead of
+    a begin/end pair, and rotated into numbered files
+    (``trace.json``, ``trace.1.json``, ...) once a size or time limit is reached.
+    Each file is a complete JSON array. Use complete events with rotation,
+    otherwise begin and end records of a region may end up in different files.
+
+    With ``memory_counters``, memory usage is recorded on region entry and exit
+    as a counter track: traced memory, if :py:mod:`tracemalloc` is tracing
+    (e.g. with :py:class:`region_profiler.memory_listener.MemoryListener`),
+    or the number of allocated memory blocks otherwise.
     """
 
-    def __init__(self, trace_filename):
+    def __init__(self, trace_filename, batch_size=8192, max_pending_batches=16,
+                 compress=None, complete_events=False,
+                 max_file_size=None, max_file_duration=None, memory_counters=False):
         """Construct ChromeTraceListener.
 
         Args:
             trace_filename: output .json file
+            batch_size (int): number of events, passed to the writer thread at once
+            max_pending_batches (int): max number of batches waiting for the writer
+            compress (bool, optional): write gzip-compressed trace.
+                If None, the trace is compressed if the file name ends with ``.gz``
+            complete_events (bool): write a single ``"X"`` event per region hit
+                instead of ``"B"`` and ``"E"`` events. Recursive entries
+                of a region are included in the event of the outermost entry
+            max_file_size (int, optional): start a new file, once the current one
+                reaches this size (in uncompressed bytes)
+            max_file_duration (float, optional): start a new file, once the current one
+                has been written for this number of seconds
+            memory_counters (bool): record memory usage counters
         """
         self.trace_filename = trace_filename
-        self.f = open(trace_filename, 'w')
-        self.pending_begin_node = None
-        self.last_canceled_node = None
-        self.f.write('[{{"name": "process_name", "ph": "M", "pid": {}, "tid": {},'
-                     '"args": {{"name" : "{}"}}}}'.
-                     format(os.getpid(), threading.get_ident(), os.path.basename(sys.argv[0])))
-        self.f.write(',\n{{"name": "thread_name", "ph": "M", "pid": {}, "tid": {},'
-                     '"args": {{"name" : "Main"}}}}'.
-                     format(os.getpid(), threading.get_ident()))
+        self.batch_size = batch_size
+        self.compress = trace_filename.endswith('.gz') if compress is None else compress
+        self.complete_events = complete_events
+        self.max_file_size = max_file_size
+        self.max_file_duration = max_file_duration
+        self.memory_counters = memory_counters
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.filenames = []
+        self._open_file()
+        self._local = threading.local()
+        self._thread_states = []
+        self._batches = queue.Queue(max_pending_batches)
+        self._writer = threading.Thread(target=self._write_batches,
+                                        name='ChromeTraceListener writer', daemon=True)
+        self._writer.start()
 
     def finalize(self):
-        self.f.write(']')
-        self.f.close()
-        print('RegionProfiler: Chrome Trace is saved in', self.trace_filename, file=sys.stderr)
+        for state in list(self._thread_states):
+            self._submit(state)
+        self._batches.put(None)
+        self._writer.join()
+        self._close_file()
+        print('RegionProfiler: Chrome Trace is saved in', ', '.join(self.filenames),
+              file=sys.stderr)
 
     def region_entered(self, profiler, region):
-        if self.pending_begin_node:
-            self._write_b_event(profiler, self.pending_begin_node)
-        self.pending_begin_node = region
-        self.last_canceled_node = None
+        state = self._state()
+        if state.pending_begin_node and not self.complete_events:
+            self._write_b_event(state, state.pending_begin_node)
+        state.pending_begin_node = region
+        state.last_canceled_node = None
+        if self.memory_counters:
+            self._write_memory_counter(state, region.timer.begin_ts())
 
     def region_exited(self, profiler, region):
-        if self.pending_begin_node:
+        state = self._state()
+        if self.memory_counters:
+            self._write_memory_counter(state, region.timer.end_ts())
+        if state.pending_begin_node:
             # Skip if current node has been canceled
-            if (self.pending_begin_node is region and
-                    self.last_canceled_node is self.pending_begin_node):
-                self.last_canceled_node = None
-                self.pending_begin_node = None
+            if (state.pending_begin_node is region and
+                    state.last_canceled_node is state.pending_begin_node):
+                state.last_canceled_node = None
+                state.pending_begin_node = None
                 return
             else:
-                self.last_canceled_node = None
+                state.last_canceled_node = None
 
-            self._write_b_event(profiler, self.pending_begin_node)
-            self.pending_begin_node = None
-        self._write_e_event(profiler, region)
+            if not self.complete_events:
+                self._write_b_event(state, state.pending_begin_node)
+            state.pending_begin_node = None
+        if self.complete_events:
+            # recursive entries are not timestamped by the node timer,
+            # so the hit is written once, on the exit of the outermost entry
+            if region.recursion_depth == 0 or region is profiler.root:
+                self._write_x_event(state, region)
+        else:
+            self._write_e_event(state, region)
 
     def region_canceled(self, profiler, region):
-        self.last_canceled_node = region
+        self._state().last_canceled_node = region
 
-    def _write_b_event(self, profiler, region):
-        self._write_event(region.name, int(region.timer.begin_ts() * 1000000), 'B')
+    def _state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = _ThreadState()
+            self._thread_states.append(state)
+            return state
 
-    def _write_e_event(self, profiler, region):
-        self._write_event(region.name, int(region.timer.end_ts() * 1000000), 'E')
+    def _write_b_event(self, state, region):
+        self._write_event(state, region.name, region.timer.begin_ts(), 'B')
 
-    def _write_event(self, name, ts, event_type):
-        self.f.write(',\n{{"name": "{}", "ph": "{}", "ts": {}, "pid": {}, "tid": {}}}'.
-                     format(name, event_type, ts, os.getpid(), threading.get_ident()))
+    def _write_e_event(self, state, region):
+        self._write_event(state, region.name, region.timer.end_ts(), 'E')
+
+    def _write_x_event(self, state, region):
+        begin_ts = region.timer.begin_ts()
+        self._write_event(state, region.name, begin_ts, 'X',
+                          region.timer.end_ts() - begin_ts)
+
+    def _write_memory_counter(self, state, ts):
+        if tracemalloc.is_tracing():
+            self._write_event(state, 'traced memory', ts, 'C',
+                              tracemalloc.get_traced_memory()[0])
+        else:
+            self._write_event(state, 'allocated blocks', ts, 'C',
+                              sys.getallocatedblocks())
+
+    def _write_event(self, state, name, ts, event_type, duration=0):
+        events = state.events
+        events.append((name, event_type, ts, state.tid, duration))
+        if len(events) >= self.batch_size:
+            self._submit(state)
+
+    def _submit(self, state):
+        if state.events:
+            events, state.events = state.events, []
+            self._batches.put(events)
+
+    def _write_batches(self):
+        names = {}
+        template = ',\n{{"name": {}, "ph": "{}", "ts": {}, "pid": {}, "tid": {}}}'
+        x_template = (',\n{{"name": {}, "ph": "X", "ts": {}, "dur": {}, '
+                      '"pid": {}, "tid": {}}}')
+        # counter events carry the value in place of the duration
+        c_template = (',\n{{"name": {}, "ph": "C", "ts": {}, "pid": {}, '
+                      '"args": {{"{}": {}}}}}')
+        while True:
+            events = self._batches.get()
+            if events is None:
+                return
+            chunks = []
+            for name, event_type, ts, tid, duration in events:
+                try:
+                    quoted = names[name]
+                except KeyError:
+                    quoted = names[name] = json.dumps(name)
+                if event_type == 'C':
+                    unit = 'bytes' if name == 'traced memory' else 'blocks'
+                    chunks.append(c_template.format(quoted, int(ts * 1000000),
+                                                    self.pid, unit, duration))
+                elif event_type == 'X':
+                    chunks.append(x_template.format(quoted, int(ts * 1000000),
+                                                    int(duration * 1000000),
+                                                    self.pid, tid))
+                else:
+                    chunks.append(template.format(quoted, event_type, int(ts * 1000000),
+                                                  self.pid, tid))
+            self._write(''.join(chunks))
+            self._rotate_if_needed()
+
+    def _write(self, data):
+        self.f.write(data)
+        self._file_size += len(data)
+
+    def _rotate_if_needed(self):
+        if ((self.max_file_size is not None and
+             self._file_size >= self.max_file_size) or
+                (self.max_file_duration is not None and
+                 time.monotonic() - self._file_opened_at >= self.max_file_duration)):
+            self._close_file()
+            self._open_file()
+
+    def _next_filename(self):
+        index = len(self.filenames)
+        if index == 0:
+            return self.trace_filename
+        dirname, basename = os.path.split(self.trace_filename)
+        stem, dot, ext = basename.partition('.')
+        return os.path.join(dirname, '{}.{}{}{}'.format(stem, index, dot, ext))
+
+    def _open_file(self):
+        filename = self._next_filename()
+        self.filenames.append(filename)
+        if self.compress:
+            self.f = gzip.open(filename, 'wt')
+        else:
+            self.f = open(filename, 'w')
+        self._file_size = 0
+        self._file_opened_at = time.monotonic()
+        process_name = json.dumps(os.path.basename(sys.argv[0]))
+        self._write('[{{"name": "process_name", "ph": "M", "pid": {}, "tid": {},'
+                    '"args": {{"name" : {}}}}}'.
+                    format(self.pid, self.tid, process_name))
+        self._write(',\n{{"name": "thread_name", "ph": "M", "pid": {}, "tid": {},'
+                    '"args": {{"name" : "Main"}}}}'.
+                    format(self.pid, self.tid))
+
+    def _close_file(self):
+        self._write(']')
+        self.f.close()
@@ -0,0 +1,139 @@
+"""Command line interface.
+
+Usage::
+
+    python -m region_profiler merge [--format {console,csv}] [-o OUTPUT]
+        [--top-k TOP_K] [--min-percent MIN_PERCENT] SNAPSHOT...
+    python -m region_profiler export [--format {folded,speedscope}] [-o OUTPUT]
+        SNAPSHOT...
+    python -m region_profiler diff --base PROFILE... --new PROFILE...
+        [--metric {total,self,average}] [--threshold THRESHOLD] [--alpha ALPHA]
+        [--min-time MIN_TIME] [--format {console,csv}]
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+from region_profiler import diff, snapshot
+from region_profiler.flamegraph import write_folded, write_speedscope
+from region_profiler.reporters import ConsoleReporter, CsvReporter, get_tree_slice
+
+REPORTERS = {"console": ConsoleReporter, "csv": CsvReporter}
+EXPORTERS = {"folded": write_folded, "speedscope": write_speedscope}
+
+
+def merge_command(args: argparse.Namespace) -> int:
+    root = snapshot.merge([snapshot.load(f) for f in args.snapshots])
+    if args.output:
+        snapshot.save(root, args.output)
+    reporter = REPORTERS[args.format](stream=sys.stdout)
+    reporter.dump_slices(get_tree_slice(root, args.top_k, args.min_percent))
+    return 0
+
+
+def export_command(args: argparse.Namespace) -> int:
+    root = snapshot.merge([snapshot.load(f) for f in args.snapshots])
+    write = EXPORTERS[args.format]
+    if args.output:
+        with open(args.output, "w") as f:
+            write(f, root)
+    else:
+        write(sys.stdout, root)
+    return 0
+
+
+def diff_command(args: argparse.Namespace) -> int:
+    base = [diff.load_profile(f) for f in args.base]
+    new = [diff.load_profile(f) for f in args.new]
+    diffs = diff.diff_profiles(
+        base, new, args.metric, args.threshold, args.alpha, args.min_time * 1e-6
+    )
+    diff.print_diff(diffs, sys.stdout, args.format, base[0].name)
+    return 1 if any(d.regressed for d in diffs) else 0
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m region_profiler",
+        description="Region Profiler snapshot tools",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge = subparsers.add_parser(
+        "merge", help="merge snapshot files and print a single report"
+    )
+    merge.add_argument("snapshots", nargs="+", help="snapshot files")
+    merge.add_argument(
+        "--format", choices=sorted(REPORTERS), default="console", help="report format"
+    )
+    merge.add_argument("-o", "--output", help="save merged snapshot to this file")
+    merge.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="report at most this number of the largest children of each region",
+    )
+    merge.add_argument(
+        "--min-percent",
+        type=float,
+        default=0.0,
+        help="skip regions with less than this percentage of the total time",
+    )
+    merge.set_defaults(handler=merge_command)
+
+    export = subparsers.add_parser(
+        "export", help="merge snapshot files and export them for flame graph viewers"
+    )
+    export.add_argument("snapshots", nargs="+", help="snapshot files")
+    export.add_argument(
+        "--format", choices=sorted(EXPORTERS), default="folded", help="output format"
+    )
+    export.add_argument("-o", "--output", help="output file (stdout by default)")
+    export.set_defaults(handler=export_command)
+
+    diff_parser = subparsers.add_parser(
+        "diff",
+        help="compare profiles and exit with code 1 if any region regressed",
+    )
+    diff_parser.add_argument(
+        "--base", nargs="+", required=True, help="base snapshot or CSV report files"
+    )
+    diff_parser.add_argument(
+        "--new", nargs="+", required=True, help="new snapshot or CSV report files"
+    )
+    diff_parser.add_argument(
+        "--metric",
+        choices=diff.METRICS,
+        default="total",
+        help="region time, that is checked for regressions",
+    )
+    diff_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=5.0,
+        help="allowed growth of the metric in percents",
+    )
+    diff_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="significance level of regressions, if several runs are given",
+    )
+    diff_parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.0,
+        help="ignore regions faster than this time in microseconds",
+    )
+    diff_parser.add_argument(
+        "--format", choices=["console", "csv"], default="console", help="output format"
+    )
+    diff_parser.set_defaults(handler=diff_command)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = make_parser().parse_args(argv)
+    return args.handler(args)
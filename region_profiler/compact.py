@@ -0,0 +1,479 @@
+"""Compact array-backed storage of region trees.
+
+Each :py:class:`region_profiler.node.RegionNode` owns a timer, a stats object
+and a children dictionary, which costs about a kilobyte per node.
+For trees with tens of thousands of nodes (e.g. automatically named regions)
+a :py:class:`CompactTree` may be used instead: stats and timestamps
+of all nodes are kept in contiguous :py:mod:`array` columns indexed
+by node id, and nodes are thin ``__slots__`` handles
+(:py:class:`CompactNode`), that expose the :py:class:`RegionNode` interface.
+
+Use ``RegionProfiler(compact=True)`` to store region trees this way.
+Slices of compact trees are built directly from the columns,
+see :py:func:`region_profiler.reporters.get_tree_slice`.
+Latency histograms are not supported by compact trees.
+"""
+
+import math
+import warnings
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from region_profiler.utils import SeqStats, SeqStatsProtocol, Timer, default_clock
+
+
+class CompactTree:
+    """Columnar storage of a region tree.
+
+    Node 0 is the root. Columns are indexed by node id.
+
+    Attributes:
+        clock (callable): clock, used for timing regions
+        scale (float): number of seconds in a clock unit
+        timer_cls (class): timer class, reported by nodes for compatibility
+        names (list of str): node names
+        parent_ids (array): parent ids, -1 for the root
+        counts (array): number of recorded hits
+        totals (array): total recorded time
+        mins (array): min recorded time
+        maxs (array): max recorded time
+        m2s (array): sums of squared deviations from the mean
+        skipped (array): number of hits, that were not sampled
+        begin_ts (array): raw clock values of the last region entries.
+            Integers, if the clock ``scale`` is not 1
+        end_ts (array): raw clock values of the last region exits
+        nodes (list of :py:class:`CompactNode`): node handles
+        child_ids (dict): ids of node children by child name, by parent id.
+            Nodes without children have no entry
+    """
+
+    def __init__(
+        self,
+        root_name: str = "<root>",
+        clock: Callable[[], float] = default_clock,
+        timer_cls: Callable[[], Timer] = Timer,
+        scale: float = 1.0,
+    ):
+        """
+        Args:
+            root_name (str): name of the root node
+            clock (callable): clock, used for timing regions
+            timer_cls (class): timer class, reported by nodes for compatibility
+            scale (float): number of seconds in a clock unit,
+                e.g. ``1e-9`` for nanosecond clocks
+        """
+        self.clock = clock
+        self.scale = scale
+        self.timer_cls = timer_cls
+        self.names: List[str] = []
+        self.parent_ids = array("l")
+        self.counts = array("q")
+        self.totals = array("d")
+        self.mins = array("d")
+        self.maxs = array("d")
+        self.m2s = array("d")
+        self.skipped = array("q")
+        # clocks with a scale return integer ticks (e.g. nanoseconds),
+        # that are not exactly representable as doubles
+        ts_type = "d" if scale == 1.0 else "q"
+        self.begin_ts = array(ts_type)
+        self.end_ts = array(ts_type)
+        self.nodes: List[CompactNode] = []
+        self.child_ids: Dict[int, Dict[str, int]] = {}
+        self._add_node(root_name, -1, CompactRootNode)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def root(self) -> "CompactRootNode":
+        """Root node handle."""
+        return self.nodes[0]  # type: ignore[return-value]
+
+    def _add_node(self, name: str, parent_id: int, node_cls) -> "CompactNode":
+        node_id = len(self.names)
+        self.names.append(name)
+        self.parent_ids.append(parent_id)
+        for column in (
+            self.counts,
+            self.totals,
+            self.mins,
+            self.maxs,
+            self.m2s,
+            self.skipped,
+            self.begin_ts,
+            self.end_ts,
+        ):
+            column.append(0)
+        node = node_cls(self, node_id)
+        self.nodes.append(node)
+        if parent_id >= 0:
+            self.child_ids.setdefault(parent_id, {})[name] = node_id
+        return node
+
+    def get_child(self, parent_id: int, name: str) -> "CompactNode":
+        """Get or create a child of a node.
+
+        Args:
+            parent_id (int): parent node id
+            name (str): child name
+
+        Returns:
+            :py:class:`CompactNode`: child node handle
+        """
+        try:
+            return self.nodes[self.child_ids[parent_id][name]]
+        except KeyError:
+            return self._add_node(name, parent_id, CompactNode)
+
+    def record(self, node_id: int, x: float):
+        """Add a measurement to the node stats.
+
+        Args:
+            node_id (int): node id
+            x (float): measurement
+        """
+        n = self.counts[node_id]
+        if n:
+            total = self.totals[node_id]
+            delta = x - total / n
+            n += 1
+            total += x
+            self.m2s[node_id] += delta * (x - total / n)
+            self.counts[node_id] = n
+            self.totals[node_id] = total
+            if x < self.mins[node_id]:
+                self.mins[node_id] = x
+            if x > self.maxs[node_id]:
+                self.maxs[node_id] = x
+        else:
+            self.counts[node_id] = 1
+            self.totals[node_id] = x
+            self.mins[node_id] = x
+            self.maxs[node_id] = x
+            self.m2s[node_id] = 0.0
+
+
+class CompactStats(SeqStatsProtocol):
+    """:py:class:`region_profiler.utils.SeqStats` view of a compact tree node."""
+
+    __slots__ = ("tree", "id")
+
+    def __init__(self, tree: CompactTree, node_id: int):
+        self.tree = tree
+        self.id = node_id
+
+    @property
+    def count(self) -> int:  # type: ignore[override]
+        return self.tree.counts[self.id]
+
+    @property
+    def total(self) -> float:  # type: ignore[override]
+        return self.tree.totals[self.id]
+
+    @property
+    def min(self) -> float:  # type: ignore[override]
+        return self.tree.mins[self.id]
+
+    @property
+    def max(self) -> float:  # type: ignore[override]
+        return self.tree.maxs[self.id]
+
+    @property
+    def m2(self) -> float:
+        return self.tree.m2s[self.id]
+
+    @property
+    def avg(self) -> float:
+        count = self.count
+        return self.total / count if count else 0
+
+    @property
+    def stddev(self) -> float:
+        count = self.count
+        return math.sqrt(max(self.m2 / count, 0.0)) if count else 0.0
+
+    def add(self, x: float):
+        self.tree.record(self.id, x)
+
+    def merge(self, other: SeqStatsProtocol):
+        merged = SeqStats(self.count, self.total, self.min, self.max, self.m2)
+        merged.merge(other)
+        tree = self.tree
+        i = self.id
+        tree.counts[i] = merged.count
+        tree.totals[i] = merged.total
+        tree.mins[i] = merged.min
+        tree.maxs[i] = merged.max
+        tree.m2s[i] = merged.m2
+
+    def __eq__(self, other):
+        return (
+            self.total == other.total
+            and self.count == other.count
+            and self.min == other.min
+            and self.max == other.max
+        )
+
+    def __repr__(self):
+        return "CompactStats(count={}, total={}, min={}, max={})".format(
+            self.count, self.total, self.min, self.max
+        )
+
+
+class CompactNode:
+    """Thin handle of a :py:class:`CompactTree` node.
+
+    The handle implements the interface of
+    :py:class:`region_profiler.node.RegionNode`. It also serves as its own
+    timer (:py:attr:`timer`), so that listeners can read region timestamps.
+    Only the per-entry state lives in the handle, stats live in the tree.
+    Recursive entries are not timestamped, so :py:attr:`last_event_time`
+    refers to the outermost entry or exit.
+    """
+
+    __slots__ = (
+        "tree",
+        "id",
+        "recursion_depth",
+        "skip_depth",
+        "mute_depth",
+        "cancelled",
+        "running_stats",
+        "cpu_stats",
+        "memory_stats",
+        "peak_memory_stats",
+        "block_stats",
+        "hit_depth",
+        "recursion_depths",
+        "listener_hooks",
+        "descendant_hits",
+        "entry_mark",
+    )
+
+    stats_cls = SeqStats
+
+    def __init__(self, tree: CompactTree, node_id: int):
+        self.tree = tree
+        self.id = node_id
+        self.recursion_depth = 0
+        self.skip_depth = 0
+        self.mute_depth = 0
+        self.cancelled = False
+        self.running_stats: Optional[SeqStats] = None
+        self.cpu_stats: Optional[SeqStats] = None
+        self.memory_stats: Optional[SeqStats] = None
+        self.peak_memory_stats: Optional[SeqStats] = None
+        self.block_stats: Optional[SeqStats] = None
+        self.hit_depth = 0
+        self.recursion_depths: Optional[Dict[int, int]] = None
+        self.listener_hooks: tuple = ((), (), ())
+        self.descendant_hits = 0
+        self.entry_mark = 0
+
+    @property
+    def name(self) -> str:
+        return self.tree.names[self.id]
+
+    @property
+    def stats(self) -> SeqStatsProtocol:
+        return CompactStats(self.tree, self.id)
+
+    @property
+    def skipped(self) -> int:
+        return self.tree.skipped[self.id]
+
+    @skipped.setter
+    def skipped(self, value: int):
+        self.tree.skipped[self.id] = value
+
+    @property
+    def children(self) -> Dict[str, "CompactNode"]:
+        tree = self.tree
+        child_ids = tree.child_ids.get(self.id, {})
+        return {name: tree.nodes[i] for name, i in child_ids.items()}
+
+    @property
+    def timer_cls(self):
+        return self.tree.timer_cls
+
+    @property
+    def timer(self) -> "CompactNode":
+        return self
+
+    @property
+    def clock(self) -> Callable[[], float]:
+        return self.tree.clock
+
+    @property
+    def scale(self) -> float:
+        return self.tree.scale
+
+    def begin_ts(self) -> float:
+        """Timestamp of the last region entry."""
+        return self.tree.begin_ts[self.id] * self.tree.scale
+
+    def end_ts(self) -> float:
+        """Timestamp of the last region exit."""
+        return self.tree.end_ts[self.id] * self.tree.scale
+
+    @property
+    def last_event_time(self) -> float:
+        tree = self.tree
+        return max(tree.begin_ts[self.id], tree.end_ts[self.id]) * tree.scale
+
+    @property
+    def sample_rate(self) -> float:
+        tree = self.tree
+        count = tree.counts[self.id]
+        hits = count + tree.skipped[self.id]
+        return count / hits if hits else 1.0
+
+    @property
+    def estimated_total(self) -> float:
+        rate = self.sample_rate
+        return self.tree.totals[self.id] / rate if rate else 0.0
+
+    def get_child(self, name: str, timer_cls=None) -> "CompactNode":
+        return self.tree.get_child(self.id, name)
+
+    def enter_region(self):
+        if self.recursion_depth == 0:
+            tree = self.tree
+            tree.begin_ts[self.id] = tree.clock()
+        elif self.recursion_depth >= self.hit_depth:
+            self.hit_depth = self.recursion_depth + 1
+        self.cancelled = False
+        self.recursion_depth += 1
+
+    def skip_region(self):
+        if self.skip_depth == 0:
+            self.tree.skipped[self.id] += 1
+        self.skip_depth += 1
+
+    def exit_skipped_region(self):
+        self.skip_depth -= 1
+
+    def cancel_region(self):
+        if self.skip_depth:
+            if self.skip_depth == 1:
+                self.tree.skipped[self.id] -= 1
+            return
+        self.cancelled = True
+        self.recursion_depth -= 1
+        if self.recursion_depth == 0:
+            tree = self.tree
+            tree.end_ts[self.id] = tree.clock()
+            self.hit_depth = 0
+
+    def exit_region(self):
+        if self.cancelled:
+            self.cancelled = False
+            return
+        self.recursion_depth -= 1
+        if self.recursion_depth == 0:
+            tree = self.tree
+            i = self.id
+            end_ts = tree.end_ts[i] = tree.clock()
+            tree.record(i, (end_ts - tree.begin_ts[i]) * tree.scale)
+            if self.hit_depth:
+                self._add_recursion_depth()
+
+    def _add_recursion_depth(self):
+        if self.recursion_depths is None:
+            self.recursion_depths = {}
+        depths = self.recursion_depths
+        depths[self.hit_depth] = depths.get(self.hit_depth, 0) + 1
+        self.hit_depth = 0
+
+    @property
+    def max_recursion_depth(self) -> int:
+        return max(self.recursion_depths) if self.recursion_depths else 1
+
+    def __str__(self):
+        return self.name or "???"
+
+    def __repr__(self):
+        return 'CompactNode(name="{}", stats={})'.format(str(self), repr(self.stats))
+
+
+class _CompactRootStats(SeqStatsProtocol):
+    """Current elapsed time of the root as a single measurement."""
+
+    __slots__ = ("root",)
+
+    def __init__(self, root: "CompactRootNode"):
+        self.root = root
+
+    @property
+    def count(self) -> int:  # type: ignore[override]
+        return 1
+
+    @property
+    def total(self) -> float:  # type: ignore[override]
+        return self.root.current_elapsed()
+
+    @property
+    def min(self) -> float:  # type: ignore[override]
+        return self.total
+
+    @property
+    def max(self) -> float:  # type: ignore[override]
+        return self.total
+
+    @property
+    def stddev(self) -> float:
+        return 0.0
+
+    def add(self, x: float):
+        raise NotImplementedError
+
+    def merge(self, other: SeqStatsProtocol):
+        raise NotImplementedError
+
+
+class CompactRootNode(CompactNode):
+    """Root of a :py:class:`CompactTree`.
+
+    Like :py:class:`region_profiler.node.RootNode`, its stats report
+    the current elapsed time and it can't be canceled.
+    """
+
+    __slots__ = ("running",)
+
+    def __init__(self, tree: CompactTree, node_id: int):
+        super(CompactRootNode, self).__init__(tree, node_id)
+        self.running = True
+        tree.begin_ts[node_id] = tree.clock()
+        self.recursion_depth = 1
+
+    @property
+    def stats(self) -> SeqStatsProtocol:
+        return _CompactRootStats(self)
+
+    @property
+    def sample_rate(self) -> float:
+        return 1.0
+
+    @property
+    def estimated_total(self) -> float:
+        return self.current_elapsed()
+
+    def current_elapsed(self) -> float:
+        tree = self.tree
+        end_ts = tree.clock() if self.running else tree.end_ts[self.id]
+        return (end_ts - tree.begin_ts[self.id]) * tree.scale
+
+    def enter_region(self):
+        if not self.running:
+            self.tree.begin_ts[self.id] = self.tree.clock()
+            self.running = True
+
+    def cancel_region(self):
+        """Prevents root region from being cancelled."""
+        warnings.warn("Can't cancel root region timer", stacklevel=2)
+
+    def exit_region(self):
+        tree = self.tree
+        tree.end_ts[self.id] = tree.clock()
+        self.running = False
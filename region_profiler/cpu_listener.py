@@ -0,0 +1,60 @@
+from typing import Callable, Dict, Optional, Union
+
+from region_profiler.listener import RegionProfilerListener
+from region_profiler.node import RegionNode
+from region_profiler.utils import SeqStats, get_clock
+
+
+class CpuTimeListener(RegionProfilerListener):
+    """Record CPU time of regions next to their wall time.
+
+    CPU time of each region hit is collected in
+    :py:attr:`region_profiler.node.RegionNode.cpu_stats`.
+    Reports show it with ``cpu`` and ``% cpu`` columns
+    (see :py:mod:`region_profiler.reporter_columns`):
+    compute-bound regions have CPU time close to their wall time,
+    while regions blocked on I/O, locks or a device have much less.
+
+    By default, CPU time of the current thread is measured,
+    which matches per-thread region trees.
+    Only the outermost entry of a recursive region is measured.
+
+    Examples::
+
+        rp.install(cpu_time=True)
+
+        rp = RegionProfiler(listeners=[CpuTimeListener()])
+    """
+
+    def __init__(self, clock: Union[str, Callable[[], float]] = "thread_time_ns"):
+        """
+        Args:
+            clock (str or callable): CPU clock name, e.g. ``thread_time_ns``
+                or ``process_time_ns`` (see :py:data:`region_profiler.utils.CLOCKS`),
+                or a function returning CPU time in seconds
+        """
+        if isinstance(clock, str):
+            self.clock, self.scale = get_clock(clock)
+        else:
+            self.clock, self.scale = clock, 1.0
+        self._begin_ts: Dict[RegionNode, float] = {}
+
+    def finalize(self):
+        self._begin_ts.clear()
+
+    def region_entered(self, profiler, region):
+        if region.recursion_depth == 1:
+            self._begin_ts[region] = self.clock()
+
+    def region_exited(self, profiler, region):
+        if region.recursion_depth == 0 or region is profiler.root:
+            begin_ts: Optional[float] = self._begin_ts.pop(region, None)
+            if begin_ts is None:
+                return
+            if region.cpu_stats is None:
+                region.cpu_stats = SeqStats()
+            region.cpu_stats.add((self.clock() - begin_ts) * self.scale)
+
+    def region_canceled(self, profiler, region):
+        if region.recursion_depth == 0:
+            self._begin_ts.pop(region, None)
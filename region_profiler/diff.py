@@ -0,0 +1,453 @@
+"""Compare profiles and detect regressions.
+
+Profiles are region trees, loaded from snapshots
+(see :py:mod:`region_profiler.snapshot`) or reports of
+:py:class:`region_profiler.reporters.CsvReporter`.
+Regions of two profiles are aligned by their path from the root,
+and total, self and average times of each region are compared.
+
+If several runs are given for each side, metrics are averaged over runs
+and the significance of the difference is estimated with Welch's t-test.
+A region regresses, if its metric grows by more than a threshold
+percentage and the difference is significant (or there is a single run
+on either side)::
+
+    $ python -m region_profiler diff --base main*.rps --new branch*.rps \\
+        --threshold 5 --alpha 0.05
+
+The command exits with code 1 if any region regresses,
+so it can be used as a merge gate.
+"""
+
+import csv
+import math
+import statistics
+import sys
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple
+
+from region_profiler import snapshot
+from region_profiler.flamegraph import iter_self_times
+from region_profiler.node import RegionNode
+from region_profiler.utils import SeqStats, pretty_print_time
+
+METRICS = ("total", "self", "average")
+
+Path = Tuple[str, ...]
+
+
+class RegionMetrics:
+    """Times of a region in a single run.
+
+    Attributes:
+        total (float): total time in seconds
+        self_time (float): total time excluding time of child regions
+        count (int): number of region hits
+    """
+
+    __slots__ = ("total", "self_time", "count")
+
+    def __init__(self, total: float = 0.0, self_time: float = 0.0, count: int = 0):
+        self.total = total
+        self.self_time = self_time
+        self.count = count
+
+    @property
+    def average(self) -> float:
+        """Average time of a region hit."""
+        return self.total / self.count if self.count else 0.0
+
+    def get(self, metric: str) -> float:
+        """Return metric by name (see :py:data:`METRICS`)."""
+        if metric == "self":
+            return self.self_time
+        return getattr(self, metric)
+
+
+def region_metrics(root: RegionNode) -> Dict[Path, RegionMetrics]:
+    """Collect times of all regions of a tree by their path.
+
+    Paths do not include the root name, so that trees with
+    differently named roots (e.g. per-rank snapshots) are aligned.
+    Times of sampled regions are estimated from the recorded hits.
+
+    Args:
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree
+
+    Returns:
+        dict: :py:class:`RegionMetrics` by region path
+    """
+    metrics = {}
+    for path, self_time in iter_self_times(root):
+        node = path[-1]
+        key = tuple(n.name for n in path[1:])
+        metrics[key] = RegionMetrics(
+            node.estimated_total, self_time, node.stats.count + node.skipped
+        )
+    return metrics
+
+
+def read_csv(f: TextIO) -> RegionNode:
+    """Read a region tree from a report of
+    :py:class:`region_profiler.reporters.CsvReporter`.
+
+    The report must have ``id``, ``name``, ``parent_id``,
+    ``total_us`` and ``count`` columns. If the stream has several reports
+    (e.g. written by :py:class:`region_profiler.periodic.PeriodicReporter`
+    with ``delta=False``), the last one is read.
+
+    Args:
+        f (text file-like object): input stream
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: root of the tree
+    """
+    header: Optional[List[str]] = None
+    rows: List[List[str]] = []
+    for row in csv.reader(f, skipinitialspace=True):
+        if not row or row[0].startswith("#"):
+            continue
+        if row[0] == "id":
+            header, rows = row, []
+        else:
+            rows.append(row)
+    if header is None:
+        raise ValueError("Not a region profiler CSV report")
+    missing = {"id", "name", "parent_id", "total_us", "count"} - set(header)
+    if missing:
+        raise ValueError("CSV report has no columns: {}".format(sorted(missing)))
+
+    index = {name: i for i, name in enumerate(header)}
+    nodes: Dict[str, RegionNode] = {}
+    for row in rows:
+        node = RegionNode(row[index["name"]])
+        total = float(row[index["total_us"]]) * 1e-6
+        count = int(row[index["count"]])
+        node.stats = SeqStats(count, total, total, total)
+        nodes[row[index["id"]]] = node
+    # rows are linked after all nodes are created,
+    # so that the tree doesn't depend on the order of rows
+    root: Optional[RegionNode] = None
+    for row in rows:
+        node = nodes[row[index["id"]]]
+        parent_id = row[index["parent_id"]]
+        if not parent_id:
+            if root is None:
+                root = node
+            continue
+        try:
+            parent = nodes[parent_id]
+        except KeyError:
+            raise ValueError(
+                "Region {} has unknown parent id {}".format(node.name, parent_id)
+            ) from None
+        parent.children[node.name] = node
+    if root is None:
+        raise ValueError("CSV report has no regions")
+    return root
+
+
+def load_profile(filename: str) -> RegionNode:
+    """Load a region tree from a snapshot or a CSV report.
+
+    Args:
+        filename (str): snapshot or CSV file
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: root of the tree
+    """
+    with open(filename, "rb") as f:
+        is_snapshot = f.read(len(snapshot.MAGIC)) == snapshot.MAGIC
+    if is_snapshot:
+        return snapshot.load(filename)
+    with open(filename, newline="") as f:
+        return read_csv(f)
+
+
+def welch_t_test(a: Sequence[float], b: Sequence[float]) -> Optional[float]:
+    """Two-sided Welch's t-test for the difference of means of two samples.
+
+    Args:
+        a (list of float): first sample
+        b (list of float): second sample
+
+    Returns:
+        :py:class:`float`, optional: p-value,
+        or ``None`` if either sample has less than two values
+    """
+    if len(a) < 2 or len(b) < 2:
+        return None
+    va = statistics.variance(a) / len(a)
+    vb = statistics.variance(b) / len(b)
+    diff = statistics.mean(b) - statistics.mean(a)
+    if va + vb == 0:
+        return 1.0 if diff == 0 else 0.0
+    t = diff / math.sqrt(va + vb)
+    df = (va + vb) ** 2 / (va**2 / (len(a) - 1) + vb**2 / (len(b) - 1))
+    return _betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def _betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log(1.0 - x)
+    )
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction of the incomplete beta function (modified Lentz's method)."""
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for aa in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return h
+
+
+class RegionDiff:
+    """Comparison of a region in two profiles.
+
+    Attributes:
+        path (tuple of str): region path, excluding the root name
+        base (:py:class:`RegionMetrics`): metrics averaged over base runs
+        new (:py:class:`RegionMetrics`): metrics averaged over new runs
+        in_base (bool): whether the region is present in base runs
+        in_new (bool): whether the region is present in new runs
+        p_value (:py:class:`float`, optional): significance of the difference
+            of the gate metric, ``None`` if there are not enough runs
+        regressed (bool): whether the region regressed
+    """
+
+    __slots__ = ("path", "base", "new", "in_base", "in_new", "p_value", "regressed")
+
+    def __init__(
+        self,
+        path: Path,
+        base: RegionMetrics,
+        new: RegionMetrics,
+        in_base: bool,
+        in_new: bool,
+        p_value: Optional[float] = None,
+        regressed: bool = False,
+    ):
+        self.path = path
+        self.base = base
+        self.new = new
+        self.in_base = in_base
+        self.in_new = in_new
+        self.p_value = p_value
+        self.regressed = regressed
+
+    def change(self, metric: str) -> Optional[float]:
+        """Return relative change of a metric in percents.
+
+        Args:
+            metric (str): metric name (see :py:data:`METRICS`)
+
+        Returns:
+            :py:class:`float`, optional: change, or ``None``
+            if the base metric is zero
+        """
+        base = self.base.get(metric)
+        if base == 0:
+            return None
+        return (self.new.get(metric) - base) / base * 100.0
+
+
+def _mean_metrics(runs: List[Optional[RegionMetrics]]) -> RegionMetrics:
+    present = [m for m in runs if m is not None]
+    n = len(runs)
+    return RegionMetrics(
+        sum(m.total for m in present) / n,
+        sum(m.self_time for m in present) / n,
+        int(round(sum(m.count for m in present) / n)),
+    )
+
+
+def diff_profiles(
+    base_roots: Sequence[RegionNode],
+    new_roots: Sequence[RegionNode],
+    metric: str = "total",
+    threshold: float = 5.0,
+    alpha: float = 0.05,
+    min_time: float = 0.0,
+) -> List[RegionDiff]:
+    """Compare regions of two sets of runs.
+
+    A region missing in a run counts as a region with zero times.
+    A region regresses, if it is present in base runs, its ``metric``
+    grows by more than ``threshold`` percents, its new metric
+    is at least ``min_time``, and the difference
+    is significant at level ``alpha`` (significance is not checked,
+    if either side has a single run). The root is not checked: its time
+    is the whole run time, that includes unprofiled code
+    and grows with any of its regions.
+
+    Args:
+        base_roots (list of :py:class:`region_profiler.node.RegionNode`): base runs
+        new_roots (list of :py:class:`region_profiler.node.RegionNode`): new runs
+        metric (str): metric, that is checked for regressions
+            (see :py:data:`METRICS`)
+        threshold (float): allowed relative growth in percents
+        alpha (float): significance level
+        min_time (float): ignore regions faster than this time in seconds
+
+    Returns:
+        list of :py:class:`RegionDiff`: regions in the depth-first order,
+        siblings sorted by the larger of base and new ``metric`` descending
+    """
+    if metric not in METRICS:
+        raise ValueError("Unknown metric: {}".format(metric))
+    base_runs = [region_metrics(root) for root in base_roots]
+    new_runs = [region_metrics(root) for root in new_roots]
+    paths: Dict[Path, None] = {}
+    for run in base_runs + new_runs:
+        paths.update(dict.fromkeys(run))
+
+    diffs: Dict[Path, RegionDiff] = {}
+    for path in paths:
+        base = [run.get(path) for run in base_runs]
+        new = [run.get(path) for run in new_runs]
+        d = RegionDiff(
+            path,
+            _mean_metrics(base),
+            _mean_metrics(new),
+            any(m is not None for m in base),
+            any(m is not None for m in new),
+        )
+        d.p_value = welch_t_test(
+            [m.get(metric) if m is not None else 0.0 for m in base],
+            [m.get(metric) if m is not None else 0.0 for m in new],
+        )
+        change = d.change(metric)
+        d.regressed = (
+            bool(path)
+            and d.in_base
+            and change is not None
+            and change > threshold
+            and d.new.get(metric) >= min_time
+            and (d.p_value is None or d.p_value < alpha)
+        )
+        diffs[path] = d
+    return _tree_order(diffs, metric)
+
+
+def _tree_order(diffs: Dict[Path, RegionDiff], metric: str) -> List[RegionDiff]:
+    children: Dict[Path, List[RegionDiff]] = {}
+    for path, d in diffs.items():
+        if path:
+            children.setdefault(path[:-1], []).append(d)
+    ordered = []
+    stack = [diffs[()]] if () in diffs else []
+    while stack:
+        d = stack.pop()
+        ordered.append(d)
+        siblings = children.get(d.path, [])
+        # the largest sibling is pushed last to be printed first
+        siblings.sort(
+            key=lambda s: (max(s.base.get(metric), s.new.get(metric)), s.path)
+        )
+        stack.extend(siblings)
+    return ordered
+
+
+def _format_change(d: RegionDiff, metric: str) -> str:
+    if not d.in_base:
+        return "new"
+    if not d.in_new:
+        return "removed"
+    change = d.change(metric)
+    return "{:+.2f}%".format(change) if change is not None else ""
+
+
+def _format_time(sec: float) -> str:
+    return pretty_print_time(sec) if sec else "0"
+
+
+def _format_row(d: RegionDiff) -> List[str]:
+    row = []
+    for metric in METRICS:
+        row.append(_format_time(d.base.get(metric)))
+        row.append(_format_time(d.new.get(metric)))
+        row.append(_format_change(d, metric))
+    row.append("{:.4f}".format(d.p_value) if d.p_value is not None else "")
+    row.append("REGRESSED" if d.regressed else "")
+    return row
+
+
+DIFF_COLUMNS = [
+    "base total",
+    "new total",
+    "total diff",
+    "base self",
+    "new self",
+    "self diff",
+    "base avg",
+    "new avg",
+    "avg diff",
+    "p-value",
+    "status",
+]
+
+
+def print_diff(
+    diffs: List[RegionDiff],
+    stream: TextIO = sys.stdout,
+    format: str = "console",
+    root_name: str = "<root>",
+):
+    """Print region comparison.
+
+    Args:
+        diffs (list of :py:class:`RegionDiff`): compared regions
+        stream (file-like object): output stream
+        format (str): ``console`` for an indented table,
+            ``csv`` for a CSV table with region paths separated by ``;``
+        root_name (str): name of the root region
+    """
+    if format == "csv":
+        writer = csv.writer(stream, lineterminator="\n")
+        writer.writerow(["path"] + [c.replace(" ", "_") for c in DIFF_COLUMNS])
+        for d in diffs:
+            path = ";".join((root_name,) + d.path)
+            writer.writerow([path] + _format_row(d))
+        return
+
+    rows = [["name"] + DIFF_COLUMNS]
+    for d in diffs:
+        name = ". " * len(d.path) + (d.path[-1] if d.path else root_name)
+        rows.append([name] + _format_row(d))
+    col_width = [len(c) for c in rows[0]]
+    for row in rows:
+        for i, c in enumerate(row):
+            col_width[i] = max(col_width[i], len(c))
+    rows.insert(1, ["-" * w for w in col_width])
+    line = "  ".join(
+        "{:" + ("<" if i == 0 else ">") + str(w) + "}" for i, w in enumerate(col_width)
+    )
+    for row in rows:
+        print(line.format(*row).rstrip(), file=stream)
+    regressed = sum(d.regressed for d in diffs)
+    print("\n{} of {} regions regressed".format(regressed, len(diffs)), file=stream)
@@ -0,0 +1,184 @@
+"""Export region trees for flame graph viewers.
+
+Two formats are supported:
+
+- collapsed stacks (:py:func:`write_folded`), the input format of
+  Brendan Gregg's ``flamegraph.pl`` and many other tools. Each line
+  is a region path with names separated by ``;`` followed by
+  the self time of the region in microseconds::
+
+      <main>;train;forward 1520000
+
+- speedscope JSON profile (:py:func:`write_speedscope`),
+  that can be opened at https://www.speedscope.app.
+
+Self time of a region is its total time excluding time of its children.
+Trees are written while they are walked, so the time is linear
+in the size of the output, and the memory used, besides the output stream,
+is proportional to the depth of the tree rather than its size
+(and to the number of distinct region names for speedscope frames).
+
+Examples::
+
+    rp.install(reporter=FoldedStackReporter('profile.folded'))
+
+    $ python -m region_profiler export --format speedscope -o profile.json rank*.rps
+"""
+
+import json
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from region_profiler.node import RegionNode
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def iter_self_times(root: RegionNode) -> Iterator[Tuple[List[RegionNode], float]]:
+    """Walk a region tree in the depth-first order.
+
+    Times of sampled regions are estimated from the recorded hits.
+
+    Args:
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree
+
+    Yields:
+        tuple: region path (a list of nodes from the root to the current node,
+        which is reused between iterations) and self time of the region in seconds
+    """
+    path = [root]
+    children = list(root.children.values())
+    pending = [iter(children)]
+    yield path, _self_time(root, children)
+    while pending:
+        node = next(pending[-1], None)
+        if node is None:
+            pending.pop()
+            path.pop()
+            continue
+        children = list(node.children.values())
+        path.append(node)
+        pending.append(iter(children))
+        yield path, _self_time(node, children)
+
+
+def _self_time(node: RegionNode, children: List[RegionNode]) -> float:
+    return max(node.estimated_total - sum(ch.estimated_total for ch in children), 0.0)
+
+
+def _folded_name(name: str) -> str:
+    return name.replace(";", ":").replace("\n", " ")
+
+
+def write_folded(f: TextIO, root: RegionNode):
+    """Write a region tree in the collapsed stack format.
+
+    Regions with zero self time (e.g. with self time below a microsecond)
+    are omitted. ``;`` in region names is replaced with ``:``.
+
+    Args:
+        f (text file-like object): output stream
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree
+    """
+    names: List[str] = []
+    for path, self_time in iter_self_times(root):
+        del names[len(path) - 1 :]
+        names.append(_folded_name(path[-1].name))
+        value = int(round(self_time * 1000000))
+        if value:
+            f.write("{} {}\n".format(";".join(names), value))
+
+
+def write_speedscope(f: TextIO, root: RegionNode, name: Optional[str] = None):
+    """Write a region tree as a speedscope profile.
+
+    The profile is an ``evented`` profile with times in seconds.
+    Hits of a region are merged into a single frame, so the timeline
+    shows children of each region one after another followed by
+    the self time of the region. Frames are shared by regions with the same name,
+    so that the sandwich view aggregates them.
+
+    Args:
+        f (text file-like object): output stream
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree
+        name (:py:class:`str`, optional): profile name,
+            name of the root by default
+    """
+    name = json.dumps(root.name if name is None else name)
+    frames: Dict[str, int] = {}
+    f.write(
+        '{{"$schema": "{}", "exporter": "region_profiler", '.format(SPEEDSCOPE_SCHEMA)
+    )
+    f.write('"name": {}, "activeProfileIndex": 0, "profiles": [{{'.format(name))
+    f.write('"type": "evented", "name": {}, "unit": "seconds", '.format(name))
+    f.write('"startValue": 0, "events": [')
+    open_frames: List[Tuple[int, float]] = []  # frame and end time of its self time
+    at = 0.0
+    sep = ""
+    for path, _ in iter_self_times(root):
+        # close regions, that are not ancestors of the current one
+        while len(open_frames) >= len(path):
+            frame, end = open_frames.pop()
+            at = max(at, end)
+            f.write(',{{"type": "C", "frame": {}, "at": {!r}}}'.format(frame, at))
+        frame_name = path[-1].name
+        frame = frames.get(frame_name)
+        if frame is None:
+            frame = frames[frame_name] = len(frames)
+        f.write('{}{{"type": "O", "frame": {}, "at": {!r}}}'.format(sep, frame, at))
+        sep = ","
+        open_frames.append((frame, at + path[-1].estimated_total))
+    while open_frames:
+        frame, end = open_frames.pop()
+        at = max(at, end)
+        f.write(',{{"type": "C", "frame": {}, "at": {!r}}}'.format(frame, at))
+    f.write('], "endValue": {!r}}}], "shared": {{"frames": ['.format(at))
+    f.write(",".join('{{"name": {}}}'.format(json.dumps(n)) for n in frames))
+    f.write("]}}\n")
+
+
+class FoldedStackReporter:
+    """Save profiler state to a file in the collapsed stack format.
+
+    See :py:func:`write_folded`.
+    """
+
+    def __init__(self, filename: str):
+        """Initialize the reporter.
+
+        Args:
+            filename (str): output file
+        """
+        self.filename = filename
+
+    def dump_profiler(self, rp):
+        """Dump the profiler state.
+
+        Args:
+            rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
+        """
+        with open(self.filename, "w") as f:
+            write_folded(f, rp.merged_root())
+
+
+class SpeedscopeReporter:
+    """Save profiler state to a speedscope profile.
+
+    See :py:func:`write_speedscope`.
+    """
+
+    def __init__(self, filename: str):
+        """Initialize the reporter.
+
+        Args:
+            filename (str): output file
+        """
+        self.filename = filename
+
+    def dump_profiler(self, rp):
+        """Dump the profiler state.
+
+        Args:
+            rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
+        """
+        with open(self.filename, "w") as f:
+            write_speedscope(f, rp.merged_root())
@@ -1,13 +1,21 @@
 import atexit
+import os
+import signal
+import sys
 import warnings
-from typing import Any, Callable, Iterable, List, Optional, Type, TypeVar
+from typing import Any, Callable, Iterable, List, Optional, Type, TypeVar, Union
 
-from region_profiler.chrome_trace_listener import ChromeTraceListener
-from region_profiler.debug_listener import DebugListener
 from region_profiler.listener import RegionProfilerListener
 from region_profiler.profiler import RegionProfiler
 from region_profiler.reporters import ConsoleReporter
-from region_profiler.utils import NullContext, Timer, null_decorator
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.sync import SyncPolicy
+from region_profiler.utils import (
+    NullContext,
+    Timer,
+    is_coroutine_function,
+    null_decorator,
+)
 
 _profiler = None
 """Global :py:class:`RegionProfiler` instance.
@@ -15,6 +23,14 @@ _profiler = None
 This singleton is initialized using :py:func:`install`.
 """
 
+DISABLE_ENV_VAR = "REGION_PROFILER_DISABLE"
+
+_disabled = os.environ.get(DISABLE_ENV_VAR, "") not in ("", "0")
+"""If True, profiling is disabled for the process, see :py:func:`disable`."""
+
+_null_context = NullContext()
+"""Shared no-op context, returned by :py:func:`region` when profiling is off."""
+
 F = TypeVar("F", bound=Callable[..., Any])
 
 
@@ -23,11 +39,27 @@ def install(
     chrome_trace_file: Optional[str] = None,
     debug_mode: bool = False,
     timer_cls: Optional[Callable[[], Timer]] = None,
-) -> RegionProfiler:
+    sync_policy: Optional[SyncPolicy] = None,
+    torch_annotations: Optional[bool] = None,
+    collect_workers: bool = False,
+    sampling: Optional[SamplingPolicy] = None,
+    histograms: bool = False,
+    report_interval: Optional[float] = None,
+    report_file: Optional[str] = None,
+    metrics_port: Optional[int] = None,
+    compact: bool = False,
+    collapse_recursion: bool = False,
+    clock: Optional[str] = None,
+    cpu_time: Union[bool, str] = False,
+    compensate_overhead: bool = False,
+    memory: Union[bool, str] = False,
+) -> Optional[RegionProfiler]:
     """Enable profiling.
 
     Initialize a global profiler with user arguments
     and register its finalization at application exit.
+    Does nothing and returns None, if profiling has been disabled
+    (see :py:func:`disable`).
 
     Args:
         reporter (:py:class:`region_profiler.reporters.ConsoleReporter`):
@@ -44,19 +76,143 @@ def install(
             See :py:class:`region_profiler.debug_listener.DebugListener`
         timer_cls: (:py:obj:`region_profiler.utils.Timer`):
             Pass custom timer constructor. Mainly useful for testing.
+        sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+            Synchronize Torch CUDA device around regions according to this policy.
+            By default, the device is not synchronized.
+            Torch is resolved once, when this function is called.
+        torch_annotations (:py:class:`bool`, optional):
+            Annotate regions for the torch autograd profiler.
+            See :py:class:`region_profiler.torch_listener.TorchAnnotationListener`.
+            If None, annotations are enabled if ``torch`` has already been imported.
+        collect_workers (:py:class:`bool`, default=False):
+            Collect region trees of worker processes forked by :py:mod:`multiprocessing`
+            (e.g. ``DataLoader`` workers) and report them as ``<worker ...>`` subtrees.
+            See :py:class:`region_profiler.workers.WorkerCollector`
+            and :py:func:`worker_init_fn`.
+        sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+            Record only sampled region hits, e.g. ``SamplingPolicy.every(100)``.
+            Reports show estimated totals and the ``sample rate`` column.
+            By default, every hit is recorded.
+        histograms (:py:class:`bool`, default=False):
+            Collect latency histograms of regions, so that reporters
+            can show percentile columns, e.g. ``p50`` and ``p99``.
+        report_interval (:py:class:`float`, optional):
+            Also report stats of each interval of this many seconds
+            from a background thread using ``reporter``.
+            See :py:class:`region_profiler.periodic.PeriodicReporter`.
+        report_file (:py:class:`str`, optional):
+            Write periodic reports to this rotating file
+            instead of the reporter stream.
+        metrics_port (:py:class:`int`, optional):
+            Serve region stats for Prometheus on ``127.0.0.1:<metrics_port>/metrics``.
+            See :py:class:`region_profiler.prometheus.PrometheusExporter`.
+        compact (:py:class:`bool`, default=False):
+            Store region trees in arrays to reduce memory usage,
+            when there are many regions (e.g. automatically named ones).
+            See :py:class:`region_profiler.compact.CompactTree`.
+        collapse_recursion (:py:class:`bool`, default=False):
+            Fold recursive entries of a region into a single node
+            instead of a chain of nested ones, e.g. for recursive
+            functions decorated with :py:func:`func`. Reports may show
+            recursion depths with the ``max recursion depth`` column.
+        clock (:py:class:`str`, optional):
+            Clock used for timing regions: ``perf_counter`` (default),
+            ``perf_counter_ns``, ``monotonic_ns``, or a CPU clock, like
+            ``thread_time_ns``. See :py:data:`region_profiler.utils.CLOCKS`.
+            Nanosecond clocks keep exact integer timestamps over long runs.
+        cpu_time (:py:class:`bool` or :py:class:`str`, default=False):
+            Also record CPU time of regions for ``cpu`` and ``% cpu`` columns.
+            A string selects the CPU clock (default: ``thread_time_ns``).
+            See :py:class:`region_profiler.cpu_listener.CpuTimeListener`.
+        compensate_overhead (:py:class:`bool`, default=False):
+            Calibrate the cost of entering and exiting regions now,
+            so that reports can show times without the instrumentation
+            overhead (``compensated total``, ``compensated inner``
+            and ``% overhead`` columns). Calibration takes a few dozen ms.
+            See :py:func:`region_profiler.overhead.calibrate`.
+        memory (:py:class:`bool` or :py:class:`str`, default=False):
+            Record memory allocations of regions with :py:mod:`tracemalloc`
+            for ``allocated``, ``retained`` and ``peak memory`` columns.
+            ``'counts'`` only counts allocated memory blocks (``net blocks`` column),
+            which is cheap enough for production.
+            The Chrome trace additionally gets memory counters.
+            See :py:class:`region_profiler.memory_listener.MemoryListener`.
     """
     global _profiler
+    if _disabled:
+        warnings.warn(
+            "region_profiler is disabled, install() has no effect", stacklevel=2
+        )
+        return None
     if _profiler is None:
         listeners: List[RegionProfilerListener] = []
+        # optional features are imported only when enabled,
+        # so that importing region_profiler stays cheap
+        if memory:
+            from region_profiler.memory_listener import MemoryListener
+
+            listeners.append(MemoryListener(counts_only=memory == "counts"))
         if chrome_trace_file:
-            listeners.append(ChromeTraceListener(chrome_trace_file))
+            from region_profiler.chrome_trace_listener import ChromeTraceListener
+
+            listeners.append(
+                ChromeTraceListener(chrome_trace_file, memory_counters=bool(memory))
+            )
         if debug_mode:
+            from region_profiler.debug_listener import DebugListener
+
             listeners.append(DebugListener())
+        if cpu_time:
+            from region_profiler.cpu_listener import CpuTimeListener
+
+            if isinstance(cpu_time, str):
+                listeners.append(CpuTimeListener(cpu_time))
+            else:
+                listeners.append(CpuTimeListener())
+        if torch_annotations is None:
+            torch_annotations = "torch" in sys.modules
+        if torch_annotations:
+            from region_profiler.torch_listener import TorchAnnotationListener
+
+            listeners.append(TorchAnnotationListener())
+
+        _profiler = RegionProfiler(
+            listeners=listeners,
+            timer_cls=timer_cls,
+            sync_policy=sync_policy,
+            sampling=sampling,
+            histograms=histograms,
+            compact=compact,
+            collapse_recursion=collapse_recursion,
+            clock=clock,
+        )
+        if compensate_overhead:
+            from region_profiler.overhead import calibrate
 
-        _profiler = RegionProfiler(listeners=listeners, timer_cls=timer_cls)
+            _profiler.overhead = calibrate(_profiler.timer_cls, compact)
 
         _profiler.root.enter_region()
+        if collect_workers:
+            from region_profiler.workers import WorkerCollector
+
+            collector = WorkerCollector(_profiler)
+            # atexit callbacks are called in reverse order,
+            # so the worker trees are removed after the report
+            atexit.register(collector.cleanup)
         atexit.register(lambda: reporter.dump_profiler(_profiler))
+        if report_interval is not None:
+            from region_profiler.periodic import PeriodicReporter
+
+            periodic = PeriodicReporter(
+                _profiler, report_interval, reporter, filename=report_file
+            )
+            periodic.start()
+            # the final periodic report precedes the cumulative one
+            atexit.register(periodic.stop)
+        if metrics_port is not None:
+            from region_profiler.prometheus import PrometheusExporter
+
+            PrometheusExporter(_profiler, metrics_port).start()
         atexit.register(lambda: _profiler.finalize())  # type: ignore[union-attr]
     else:
         warnings.warn(
@@ -70,7 +226,97 @@ def uninstall():
     _profiler = None
 
 
-def region(name: Optional[str] = None, asglobal: bool = False):
+def disable():
+    """Disable profiling for the rest of the process lifetime.
+
+    Functions decorated with :py:func:`func` afterwards are returned
+    unchanged, :py:func:`region` returns a shared no-op context
+    and :py:func:`install` has no effect, so instrumented code
+    runs without any overhead. Call this before importing instrumented modules
+    or set ``REGION_PROFILER_DISABLE=1`` environment variable.
+
+    Without this call, functions decorated before :py:func:`install`
+    only check whether the profiler is installed on each call.
+    """
+    global _disabled
+    _disabled = True
+
+
+def is_disabled() -> bool:
+    """Check if profiling has been disabled with :py:func:`disable`."""
+    return _disabled
+
+
+def pause():
+    """Pause recording of the global profiler.
+
+    See :py:meth:`region_profiler.profiler.RegionProfiler.pause`.
+    """
+    if _profiler is not None:
+        _profiler.pause()
+
+
+def resume():
+    """Resume recording of the global profiler after :py:func:`pause`."""
+    if _profiler is not None:
+        _profiler.resume()
+
+
+def toggle_on_signal(signum: Optional[int] = None):
+    """Pause and resume the global profiler when the process receives a signal.
+
+    Examples::
+
+        rp.install()
+        rp.pause()
+        rp.toggle_on_signal()
+
+        $ kill -USR1 <pid>  # start recording
+        $ kill -USR1 <pid>  # stop recording
+
+    Must be called from the main thread.
+
+    Args:
+        signum (:py:class:`int`, optional): signal number. Default: ``SIGUSR1``
+    """
+    if signum is None:
+        signum = signal.SIGUSR1
+
+    def handler(signum, frame):
+        if _profiler is not None:
+            if _profiler.paused:
+                _profiler.resume()
+            else:
+                _profiler.pause()
+
+    signal.signal(signum, handler)
+
+
+def worker_init_fn(worker_id: int):
+    """Label the current worker process for the report.
+
+    Intended to be passed as ``worker_init_fn`` to ``DataLoader``,
+    so that trees of workers with the same id are merged
+    across epochs. Requires ``install(collect_workers=True)``.
+
+    Examples::
+
+        loader = DataLoader(dataset, num_workers=4,
+                            worker_init_fn=rp.worker_init_fn)
+
+    Args:
+        worker_id (int): worker id
+    """
+    if _profiler is not None and _profiler.worker_collector is not None:
+        _profiler.worker_collector.set_worker_label(str(worker_id))
+
+
+def region(
+    name: Optional[str] = None,
+    asglobal: bool = False,
+    sync_policy: Optional[SyncPolicy] = None,
+    sampling: Optional[SamplingPolicy] = None,
+):
     """Start new region in the current context.
 
     This function implements context manager interface.
@@ -88,39 +334,90 @@ def region(name: Optional[str] = None, asglobal: bool = False):
             If None, the name is deducted from region location in source
         asglobal (bool): enter the region from root context, not a current one.
             May be used to merge stats from different call paths
+        sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+            device synchronization policy of this region
+        sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+            sampling policy of this region
 
     Returns:
         :py:class:`region_profiler.node.RegionNode`: node of the region.
     """
     if _profiler is not None:
-        return _profiler.region(name, asglobal, 0)
+        return _profiler.region(name, asglobal, 1, sync_policy, sampling)
     else:
-        return NullContext()
+        return _null_context
+
 
+def aregion(name: Optional[str] = None, asglobal: bool = False):
+    """Start new region in the current asynchronous context.
 
-def func(name: Optional[str] = None, asglobal: bool = False) -> Callable[[F], F]:
+    This function implements asynchronous context manager interface.
+    Unlike :py:func:`region`, the region may span ``await`` expressions.
+    See :py:meth:`region_profiler.profiler.RegionProfiler.aregion`.
+
+    Examples::
+
+        async with rp.aregion('A'):
+            await ...
+
+    Args:
+        name (:py:class:`str`, optional): region name.
+            If None, the name is deducted from region location in source
+        asglobal (bool): enter the region from root context, not a current one.
+            May be used to merge stats from different call paths
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: node of the region.
+    """
+    if _profiler is not None:
+        return _profiler.aregion(name, asglobal, 1)
+    else:
+        return _null_context
+
+
+def func(
+    name: Optional[str] = None,
+    asglobal: bool = False,
+    sync_policy: Optional[SyncPolicy] = None,
+    sampling: Optional[SamplingPolicy] = None,
+) -> Callable[[F], F]:
     """Decorator (factory) for entering region on a function call.
 
+    Coroutine functions are profiled as asynchronous regions,
+    see :py:meth:`region_profiler.profiler.RegionProfiler.func`.
+    If profiling is disabled (see :py:func:`disable`),
+    functions are returned unchanged.
+
     Examples::
 
         @rp.func()
         def foo():
             ...
 
+        @rp.func()
+        async def bar():
+            ...
+
     Args:
         name (:py:class:`str`, optional): region name.
             If None, the name is deducted from region location in source
         asglobal (bool): enter the region from root context, not a current one.
             May be used to merge stats from different call paths
+        sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+            device synchronization policy of this region
+        sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+            sampling policy of this region. Coroutine functions are not sampled
 
     Returns:
         Callable: a decorator for wrapping a function
     """
 
+    if _disabled:
+        return null_decorator()
+
     # We can't just use _profiler?.func() here because this function, as well as
     # decorator() will execute on import, before rp.install() can be called. So
-    # we can't be conditional on _profiler until we're inside wrapped(), and
-    # region() already does that.
+    # we can't be conditional on _profiler until we're inside wrapped().
     def decorator(fn):
         nonlocal name
         if name is None:
@@ -128,8 +425,21 @@ def func(name: Optional[str] = None, asglobal: bool = False) -> Callable[[F], F]
 
         name += "()"
 
+        if is_coroutine_function(fn):
+
+            async def async_wrapped(*args, **kwargs):
+                if _profiler is None:
+                    return await fn(*args, **kwargs)
+                return await _profiler._timed_coroutine(
+                    name, asglobal, fn(*args, **kwargs)
+                )
+
+            return async_wrapped
+
         def wrapped(*args, **kwargs):
-            with region(name, asglobal=asglobal):
+            if _profiler is None:
+                return fn(*args, **kwargs)
+            with _profiler.region(name, asglobal, 0, sync_policy, sampling):
                 return fn(*args, **kwargs)
 
         return wrapped
@@ -138,7 +448,11 @@ def func(name: Optional[str] = None, asglobal: bool = False) -> Callable[[F], F]
 
 
 def iter_proxy(
-    iterable: Iterable, name: Optional[str] = None, asglobal: bool = False
+    iterable: Iterable,
+    name: Optional[str] = None,
+    asglobal: bool = False,
+    sync_policy: Optional[SyncPolicy] = None,
+    sampling: Optional[SamplingPolicy] = None,
 ) -> Iterable:
     """Wraps an iterable and profiles :func:`next()` calls on this iterable.
 
@@ -163,11 +477,17 @@ def iter_proxy(
             If None, the name is deducted from region location in source
         asglobal (bool): enter the region from root context, not a current one.
             May be used to merge stats from different call paths
+        sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+            device synchronization policy of this region
+        sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+            sampling policy of this region
 
     Returns:
         Iterable: an iterable, that yield same data as the passed one
     """
     if _profiler is not None:
-        return _profiler.iter_proxy(iterable, name, asglobal, 0)
+        return _profiler.iter_proxy(
+            iterable, name, asglobal, 0, sync_policy=sync_policy, sampling=sampling
+        )
     else:
         return iterable
@@ -0,0 +1,188 @@
+"""Latency histograms with logarithmic buckets.
+
+:py:class:`LogHistogram` keeps counts of values in buckets,
+whose bounds grow geometrically, so the relative error of a percentile
+is bounded by the histogram precision for any value in the tracked range.
+The number of buckets is fixed by the range and the precision,
+adding a value is O(1) and histograms with the same parameters
+can be merged across nodes, threads and processes.
+
+:py:class:`HistSeqStats` extends :py:class:`region_profiler.utils.SeqStats`
+with a histogram. It is used for region stats, when the profiler
+is created with ``histograms=True``.
+"""
+
+import math
+from typing import Dict, Optional
+
+from region_profiler.utils import SeqStats, SeqStatsProtocol
+
+
+class LogHistogram:
+    """Fixed-memory histogram with logarithmic buckets.
+
+    Bucket 0 counts values below :py:attr:`min_value`.
+    Bucket ``i > 0`` counts values in
+    ``[min_value * base ** (i - 1), min_value * base ** i)``,
+    where ``base = 1 + precision``. Values above :py:attr:`max_value`
+    are counted in the last bucket. Only non-empty buckets are stored.
+
+    Attributes:
+        precision (float): relative width of a bucket
+        min_value (float): lower bound of the tracked range
+        max_value (float): upper bound of the tracked range
+        buckets (dict): value counts by bucket index
+        count (int): number of values
+    """
+
+    def __init__(
+        self,
+        precision: float = 0.01,
+        min_value: float = 1e-7,
+        max_value: float = 3600.0,
+    ):
+        """
+        Args:
+            precision (float): relative width of a bucket
+            min_value (float): lower bound of the tracked range (in seconds)
+            max_value (float): upper bound of the tracked range (in seconds)
+        """
+        if precision <= 0 or min_value <= 0 or max_value <= min_value:
+            raise ValueError("Invalid histogram parameters")
+        self.precision = precision
+        self.min_value = min_value
+        self.max_value = max_value
+        self._log_base = math.log1p(precision)
+        self._last_bucket = self._index(max_value)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def _index(self, x: float) -> int:
+        return int(math.log(x / self.min_value) / self._log_base) + 1
+
+    def add(self, x: float):
+        """Count a value.
+
+        Args:
+            x (float): value
+        """
+        if x < self.min_value:
+            i = 0
+        elif x >= self.max_value:
+            i = self._last_bucket
+        else:
+            i = self._index(x)
+        buckets = self.buckets
+        buckets[i] = buckets.get(i, 0) + 1
+        self.count += 1
+
+    def merge(self, other: "LogHistogram"):
+        """Add counts of another histogram with the same parameters.
+
+        Args:
+            other (:py:class:`LogHistogram`): histogram to be merged
+        """
+        if (other.precision, other.min_value, other.max_value) != (
+            self.precision,
+            self.min_value,
+            self.max_value,
+        ):
+            raise ValueError("Can't merge histograms with different parameters")
+        buckets = self.buckets
+        for i, n in other.buckets.items():
+            buckets[i] = buckets.get(i, 0) + n
+        self.count += other.count
+
+    def bucket_value(self, i: int) -> float:
+        """Return a representative value of a bucket (its geometric midpoint)."""
+        if i == 0:
+            return self.min_value
+        return self.min_value * math.exp((i - 0.5) * self._log_base)
+
+    def bucket_upper_bound(self, i: int) -> float:
+        """Return the upper bound of a bucket."""
+        return self.min_value * math.exp(i * self._log_base)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate a percentile of the counted values.
+
+        Args:
+            q (float): percentile in [0, 100]
+
+        Returns:
+            :py:class:`float`, optional: estimated value, None if the histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(q / 100.0 * self.count), 1)
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return self.bucket_value(i)
+        return self.bucket_value(max(self.buckets))
+
+    def __repr__(self):
+        return (
+            "LogHistogram(precision={}, min_value={}, max_value={}, count={})".format(
+                self.precision, self.min_value, self.max_value, self.count
+            )
+        )
+
+
+class HistSeqStats(SeqStats):
+    """:py:class:`region_profiler.utils.SeqStats` with a latency histogram.
+
+    Stats without a histogram may be merged in (e.g. a tree recorded
+    without histograms), then the histogram covers only a part
+    of the sequence (see :py:attr:`partial`).
+
+    Attributes:
+        histogram (:py:class:`LogHistogram`): histogram of the sequence values
+    """
+
+    def __init__(
+        self,
+        count: int = 0,
+        total: float = 0,
+        min: float = 0,
+        max: float = 0,
+        m2: float = 0.0,
+        histogram: Optional[LogHistogram] = None,
+    ):
+        super(HistSeqStats, self).__init__(count, total, min, max, m2)
+        self.histogram = histogram if histogram is not None else LogHistogram()
+
+    def add(self, x: float):
+        super(HistSeqStats, self).add(x)
+        self.histogram.add(x)
+
+    def merge(self, other: SeqStatsProtocol):
+        super(HistSeqStats, self).merge(other)
+        histogram = getattr(other, "histogram", None)
+        if histogram is not None:
+            self.histogram.merge(histogram)
+
+    @property
+    def partial(self) -> bool:
+        """Whether some values of the sequence are missing in the histogram."""
+        return self.histogram.count < self.count
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate a percentile of the sequence.
+
+        If the histogram is :py:attr:`partial`, the estimate is based
+        only on the values in the histogram.
+
+        The estimate is clamped to the observed min and max values.
+
+        Args:
+            q (float): percentile in [0, 100]
+
+        Returns:
+            :py:class:`float`, optional: estimated value, None if there are no values
+        """
+        value = self.histogram.percentile(q)
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
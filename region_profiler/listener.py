@@ -1,4 +1,12 @@
+import threading
 from abc import abstractmethod
+from fnmatch import fnmatchcase
+from typing import FrozenSet, List, Optional, Tuple
+
+ENTER = 'enter'
+EXIT = 'exit'
+CANCEL = 'cancel'
+ALL_EVENTS = frozenset((ENTER, EXIT, CANCEL))
 
 
 class RegionProfilerListener:
@@ -10,8 +18,61 @@ class RegionProfilerListener:
     - Exit region
     - Cancel region
     - Finish profiling
+
+    By default, a listener receives all events of all regions.
+    A listener may subscribe to a subset of event types
+    and regions with :py:meth:`subscribe`.
+    The profiler resolves subscriptions once per region name,
+    so events, that no listener is subscribed to, cost nothing.
+
+    Attributes:
+        events (frozenset of str): subscribed event types,
+            a subset of :py:data:`ALL_EVENTS`
+        region_patterns (tuple of str, optional): glob patterns
+            of subscribed region names (``None`` matches all regions)
     """
 
+    events: FrozenSet[str] = ALL_EVENTS
+    region_patterns: Optional[Tuple[str, ...]] = None
+
+    def subscribe(self, events=None, regions=None):
+        """Restrict events passed to the listener.
+
+        Subscriptions should be set before the listener is attached to a profiler.
+
+        Args:
+            events (iterable of str, optional): event types:
+                :py:data:`ENTER`, :py:data:`EXIT` and :py:data:`CANCEL`
+                (all by default)
+            regions (iterable of str, optional): glob patterns of region names,
+                e.g. ``'data*'`` (all regions by default)
+
+        Returns:
+            :py:class:`RegionProfilerListener`: the listener itself
+        """
+        events = ALL_EVENTS if events is None else frozenset(events)
+        unknown = events - ALL_EVENTS
+        if unknown:
+            raise ValueError('Unknown listener events: {}'.format(sorted(unknown)))
+        self.events = events
+        self.region_patterns = None if regions is None else tuple(regions)
+        return self
+
+    def is_subscribed(self, event, name):
+        """Check whether the listener receives the event of the region.
+
+        Args:
+            event (str): event type
+            name (str): region name
+
+        Returns:
+            bool: ``True``, if the listener is subscribed to the event
+        """
+        if event not in self.events:
+            return False
+        patterns = self.region_patterns
+        return patterns is None or any(fnmatchcase(name, p) for p in patterns)
+
     @abstractmethod
     def finalize(self):
         """Hook 'Finish profiling' event.
@@ -53,3 +114,87 @@ class RegionProfilerListener:
                 Region associated with the event
         """
         raise NotImplementedError
+
+
+class BatchedListener(RegionProfilerListener):
+    """Base class for listeners, that process events in batches.
+
+    Instead of a call per event, events are buffered per thread
+    and passed to :py:meth:`process_events` every ``batch_size`` events,
+    on :py:meth:`flush` and on profiler finalization.
+    Each event is a tuple ``(event, region, timestamp)``,
+    where ``event`` is :py:data:`ENTER`, :py:data:`EXIT` or :py:data:`CANCEL`
+    and ``timestamp`` is the time of the event in seconds
+    on the region timer clock.
+
+    Since regions are processed after the fact, a listener should only read
+    immutable region attributes, like its name and parent.
+    """
+
+    def __init__(self, batch_size=4096):
+        """
+        Args:
+            batch_size (int): number of events in a batch
+        """
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._buffers: List[list] = []
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    @abstractmethod
+    def process_events(self, profiler, events):
+        """Process a batch of events.
+
+        Args:
+            profiler (:py:class:`region_profiler.profiler.RegionProfiler`):
+                Profiler instance
+            events (list of tuple): events in the order of occurrence
+                within a thread
+        """
+        raise NotImplementedError
+
+    def flush(self, profiler):
+        """Pass buffered events of the current thread to :py:meth:`process_events`.
+
+        Args:
+            profiler (:py:class:`region_profiler.profiler.RegionProfiler`):
+                Profiler instance
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer:
+            events = buffer[:]
+            del buffer[:]
+            self.process_events(profiler, events)
+
+    def finalize(self):
+        """Pass buffered events of all threads to :py:meth:`process_events`.
+        """
+        with self._lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            if buffer:
+                events = buffer[:]
+                del buffer[:]
+                self.process_events(self._profiler, events)
+
+    def _add_event(self, profiler, event, region):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = []
+            with self._lock:
+                self._buffers.append(buffer)
+                self._profiler = profiler
+        buffer.append((event, region, region.timer.last_event_time))
+        if len(buffer) >= self.batch_size:
+            self.flush(profiler)
+
+    def region_entered(self, profiler, region):
+        self._add_event(profiler, ENTER, region)
+
+    def region_exited(self, profiler, region):
+        self._add_event(profiler, EXIT, region)
+
+    def region_canceled(self, profiler, region):
+        self._add_event(profiler, CANCEL, region)
@@ -0,0 +1,132 @@
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List
+
+from region_profiler.listener import RegionProfilerListener
+from region_profiler.node import RegionNode
+from region_profiler.utils import SeqStats
+
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+
+class MemoryListener(RegionProfilerListener):
+    """Record memory allocations of regions.
+
+    By default, memory is traced with :py:mod:`tracemalloc`, which is started
+    by the listener, unless it is already tracing, and stopped on finalization.
+    For each region hit, the listener records:
+
+    - memory retained by the hit: traced memory at exit minus at entry
+      (:py:attr:`region_profiler.node.RegionNode.memory_stats`)
+    - peak growth of traced memory during the hit
+      (:py:attr:`region_profiler.node.RegionNode.peak_memory_stats`).
+      The total of peak growths is a lower bound of the bytes allocated
+      by the region
+
+    Reports show them with ``allocated``, ``retained`` and ``peak memory``
+    columns (see :py:mod:`region_profiler.reporter_columns`).
+    Peak growth requires Python 3.9 or later.
+
+    Tracing slows down every allocation considerably.
+    In the counts only mode, memory is not traced,
+    and the listener only records the net number of memory blocks,
+    allocated by each region hit, using :py:func:`sys.getallocatedblocks`
+    (:py:attr:`region_profiler.node.RegionNode.block_stats`,
+    ``net blocks`` column), which is cheap enough for production use.
+
+    Memory is counted for the whole process, so allocations
+    of concurrent threads are attributed to regions of all threads.
+    Only the outermost entry of a recursive region is measured.
+
+    Examples::
+
+        rp.install(memory=True)
+
+        rp = RegionProfiler(listeners=[MemoryListener(counts_only=True)])
+    """
+
+    def __init__(self, counts_only: bool = False):
+        """
+        Args:
+            counts_only (bool): count allocated memory blocks
+                instead of tracing memory
+        """
+        self.counts_only = counts_only
+        self._started_tracing = False
+        if not counts_only and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._begin_blocks: Dict[RegionNode, int] = {}
+        self._local = threading.local()
+
+    def finalize(self):
+        self._begin_blocks.clear()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _frames(self) -> List[list]:
+        """Return stack of [region, traced memory at entry, peak of exited children]
+        of the current thread."""
+        try:
+            return self._local.frames
+        except AttributeError:
+            frames = self._local.frames = []
+            return frames
+
+    def region_entered(self, profiler, region):
+        if region.recursion_depth != 1:
+            return
+        if self.counts_only:
+            self._begin_blocks[region] = sys.getallocatedblocks()
+            return
+        frames = self._frames()
+        # the frame is allocated before memory is read,
+        # so that it is not accounted in the region
+        frame = [region, 0, 0]
+        current, peak = tracemalloc.get_traced_memory()
+        if frames and peak > frames[-1][2]:
+            # the peak is reset below, so keep the peak of the parent region
+            frames[-1][2] = peak
+        frame[1] = frame[2] = current
+        frames.append(frame)
+        if _reset_peak is not None:
+            _reset_peak()
+
+    def region_exited(self, profiler, region):
+        if region.recursion_depth != 0 and region is not profiler.root:
+            return
+        if self.counts_only:
+            begin_blocks = self._begin_blocks.pop(region, None)
+            if begin_blocks is not None:
+                if region.block_stats is None:
+                    region.block_stats = SeqStats()
+                region.block_stats.add(sys.getallocatedblocks() - begin_blocks)
+            return
+        frames = self._frames()
+        if not frames or frames[-1][0] is not region:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        _, begin, children_peak = frames.pop()
+        if children_peak > peak:
+            peak = children_peak
+        if frames and peak > frames[-1][2]:
+            frames[-1][2] = peak
+        if region.memory_stats is None:
+            region.memory_stats = SeqStats()
+        region.memory_stats.add(current - begin)
+        if _reset_peak is not None:
+            if region.peak_memory_stats is None:
+                region.peak_memory_stats = SeqStats()
+            region.peak_memory_stats.add(peak - begin)
+
+    def region_canceled(self, profiler, region):
+        if region.recursion_depth != 0:
+            return
+        self._begin_blocks.pop(region, None)
+        frames = self._frames()
+        if frames and frames[-1][0] is region:
+            _, _, children_peak = frames.pop()
+            if frames and children_peak > frames[-1][2]:
+                frames[-1][2] = children_peak
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import warnings
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional, Sequence
 
 from region_profiler.utils import SeqStats, SeqStatsProtocol, Timer
 
 
+MEMORY_STATS = ("memory_stats", "peak_memory_stats", "block_stats")
+"""Names of optional memory statistics attributes of region nodes."""
+
+
 class RegionNode:
     """RegionNode represents a single entry in a region tree.
 
@@ -21,25 +25,94 @@ class RegionNode:
     Attributes:
         name (str): Node name.
         stats (SeqStats): Measurement statistics.
+        running_stats (SeqStats, optional): Statistics of the time, when
+            a profiled coroutine was actually running (excluding the time
+            it was suspended). None for regular regions.
+        cpu_stats (SeqStats, optional): CPU time statistics of region hits,
+            collected by :py:class:`region_profiler.cpu_listener.CpuTimeListener`.
+            None if CPU time is not collected.
+        memory_stats (SeqStats, optional): statistics of memory retained
+            by region hits in bytes (traced memory at exit minus at entry),
+            collected by :py:class:`region_profiler.memory_listener.MemoryListener`.
+            None if memory is not traced.
+        peak_memory_stats (SeqStats, optional): statistics of the peak growth
+            of traced memory during region hits in bytes.
+        block_stats (SeqStats, optional): statistics of the net number
+            of memory blocks allocated by region hits.
+        skipped (int): Number of hits, that were not recorded
+            due to sampling (see :py:mod:`region_profiler.sampling`).
+        mute_depth (int): Number of active entries of the region,
+            that are not recorded, because the profiler is paused
+            or the region is filtered out. Such entries are not counted at all.
+        recursion_depths (dict, optional): Number of recorded hits
+            by the maximal recursion depth reached during the hit,
+            for hits with recursive entries. None if the region was never
+            entered recursively. Hits without recursion have depth 1.
+        descendant_hits (int): Number of region entries (including muted
+            and skipped ones) inside the recorded hits of the region,
+            counted while :py:attr:`region_profiler.profiler.RegionProfiler.overhead`
+            is set. Unlike hits of the descendant nodes, this includes
+            global regions entered inside the region.
+            The root counts all entries of its thread.
+        entry_mark (int): :py:attr:`descendant_hits` of the root
+            at the entry of the current hit.
+        listener_hooks (tuple): Enter, exit and cancel hooks of listeners,
+            resolved when the current hit was entered. Exits and cancellations
+            are dispatched only to listeners, that received the entry
+            and are still attached.
     """
 
-    def __init__(self, name: str, timer_cls: Callable[[], Timer] = Timer):
+    def __init__(
+        self,
+        name: str,
+        timer_cls: Callable[[], Timer] = Timer,
+        stats_cls: Callable[[], SeqStatsProtocol] = SeqStats,
+    ):
         """Create new instance of ``RegionNode`` with the given name.
 
         Args:
             name (str): node name
             timer_cls (class): class, used for creating timers.
                 Default: ``region_profiler.utils.Timer``
+            stats_cls (class): class, used for collecting stats.
+                Default: ``region_profiler.utils.SeqStats``.
+                Children inherit the class of their parent
         """
         self.name = name
         self.optimized_class = False
         self.timer_cls = timer_cls
         self.timer = self.timer_cls()
+        self.stats_cls = stats_cls
         self.cancelled = False
-        self.stats: SeqStatsProtocol = SeqStats()
+        self.stats: SeqStatsProtocol = stats_cls()
+        self.running_stats: Optional[SeqStats] = None
+        self.cpu_stats: Optional[SeqStats] = None
+        self.memory_stats: Optional[SeqStats] = None
+        self.peak_memory_stats: Optional[SeqStats] = None
+        self.block_stats: Optional[SeqStats] = None
         self.children: Dict[str, RegionNode] = dict()
         self.recursion_depth = 0
+        self.skipped = 0
+        self.skip_depth = 0
+        self.mute_depth = 0
+        self.hit_depth = 0
+        self.recursion_depths: Optional[Dict[int, int]] = None
         self.last_event_time = 0
+        self.listener_hooks: tuple = ((), (), ())
+        self.descendant_hits = 0
+        self.entry_mark = 0
+
+    @property
+    def sample_rate(self) -> float:
+        """Fraction of region hits, that were recorded."""
+        hits = self.stats.count + self.skipped
+        return self.stats.count / hits if hits else 1.0
+
+    @property
+    def estimated_total(self) -> float:
+        """Total time of all region hits, estimated from the recorded ones."""
+        rate = self.sample_rate
+        return self.stats.total / rate if rate else 0.0
 
     def enter_region(self):
         """Start timing current region."""
@@ -47,19 +120,41 @@ class RegionNode:
             self.timer.start()
         else:
             self.timer.mark_aux_event()
+            if self.recursion_depth >= self.hit_depth:
+                self.hit_depth = self.recursion_depth + 1
 
         self.cancelled = False
         self.recursion_depth += 1
 
+    def skip_region(self):
+        """Enter region without timing.
+
+        The hit is only counted in :py:attr:`skipped`.
+        Recursive entries of a skipped hit are skipped as well.
+        Must be paired with :py:meth:`exit_skipped_region`.
+        """
+        if self.skip_depth == 0:
+            self.skipped += 1
+        self.skip_depth += 1
+
+    def exit_skipped_region(self):
+        """Exit region entered with :py:meth:`skip_region`."""
+        self.skip_depth -= 1
+
     def cancel_region(self):
         """Cancel current region timing.
 
         Stats will not be updated with the current measurement.
         """
+        if self.skip_depth:
+            if self.skip_depth == 1:
+                self.skipped -= 1
+            return
         self.cancelled = True
         self.recursion_depth -= 1
         if self.recursion_depth == 0:
             self.timer.stop()
+            self.hit_depth = 0
         else:
             self.timer.mark_aux_event()
 
@@ -73,9 +168,23 @@ class RegionNode:
             if self.recursion_depth == 0:
                 self.timer.stop()
                 self.stats.add(self.timer.elapsed())
+                if self.hit_depth:
+                    self._add_recursion_depth()
             else:
                 self.timer.mark_aux_event()
 
+    def _add_recursion_depth(self):
+        if self.recursion_depths is None:
+            self.recursion_depths = {}
+        depths = self.recursion_depths
+        depths[self.hit_depth] = depths.get(self.hit_depth, 0) + 1
+        self.hit_depth = 0
+
+    @property
+    def max_recursion_depth(self) -> int:
+        """Maximal recursion depth of the recorded hits."""
+        return max(self.recursion_depths) if self.recursion_depths else 1
+
     def get_child(self, name: str, timer_cls=None) -> RegionNode:
         """Get node child with the given name.
 
@@ -92,7 +201,7 @@ class RegionNode:
         try:
             return self.children[name]
         except KeyError:
-            c = RegionNode(name, timer_cls or self.timer_cls)
+            c = RegionNode(name, timer_cls or self.timer_cls, self.stats_cls)
             self.children[name] = c
             return c
 
@@ -109,6 +218,76 @@ class RegionNode:
         )
 
 
+def merge_nodes(nodes: Sequence[RegionNode]) -> RegionNode:
+    """Merge region trees into a new detached tree.
+
+    Stats of the nodes are merged and children with the same name
+    are merged recursively. Source nodes are not modified,
+    so this function may be called while the trees are updated
+    from other threads. The trees are walked with an explicit stack,
+    so they may be of any depth.
+
+    Args:
+        nodes (list of :py:class:`RegionNode`): nodes to be merged.
+            The first node provides the name and the timer class.
+            If any node has a latency histogram, the merged node has one too
+
+    Returns:
+        RegionNode: merged node
+    """
+    merged = _merge_node_stats(nodes)
+    stack = [(merged, nodes)]
+    while stack:
+        target, group = stack.pop()
+        groups: Dict[str, List[RegionNode]] = {}
+        for n in group:
+            for ch in list(n.children.values()):
+                groups.setdefault(ch.name, []).append(ch)
+        for name, child_group in groups.items():
+            child = _merge_node_stats(child_group)
+            target.children[name] = child
+            stack.append((child, child_group))
+    return merged
+
+
+def _merge_node_stats(nodes: Sequence[RegionNode]) -> RegionNode:
+    """Create a childless node with merged stats of the nodes."""
+    stats_cls = nodes[0].stats_cls
+    for n in nodes:
+        # histogram stats are detected by attribute, so that
+        # region_profiler.histogram is imported only when it is used
+        if hasattr(n.stats, "histogram"):
+            stats_cls = type(n.stats)
+            break
+    merged = RegionNode(nodes[0].name, nodes[0].timer_cls, stats_cls)
+    for n in nodes:
+        merged.stats.merge(n.stats)
+        merged.skipped += n.skipped
+        merged.descendant_hits += n.descendant_hits
+        if n.running_stats is not None:
+            if merged.running_stats is None:
+                merged.running_stats = SeqStats()
+            merged.running_stats.merge(n.running_stats)
+        if n.cpu_stats is not None:
+            if merged.cpu_stats is None:
+                merged.cpu_stats = SeqStats()
+            merged.cpu_stats.merge(n.cpu_stats)
+        for attr in MEMORY_STATS:
+            stats = getattr(n, attr)
+            if stats is not None:
+                if getattr(merged, attr) is None:
+                    setattr(merged, attr, SeqStats())
+                getattr(merged, attr).merge(stats)
+        if n.recursion_depths:
+            if merged.recursion_depths is None:
+                merged.recursion_depths = {}
+            for depth, count in list(n.recursion_depths.items()):
+                merged.recursion_depths[depth] = (
+                    merged.recursion_depths.get(depth, 0) + count
+                )
+    return merged
+
+
 class _RootNodeStats(SeqStatsProtocol):
     """Proxy object that wraps timer in the
     :py:class:`region_profiler.utils.SeqStats` interface.
@@ -137,9 +316,16 @@ class _RootNodeStats(SeqStatsProtocol):
     def max(self) -> float:  # type: ignore[override]
         return self.total
 
+    @property
+    def stddev(self) -> float:
+        return 0.0
+
     def add(self, x: float):
         raise NotImplementedError
 
+    def merge(self, other: SeqStatsProtocol):
+        raise NotImplementedError
+
 
 class RootNode(RegionNode):
     """An instance of :any:`RootNode` is intended to be used
@@ -151,8 +337,8 @@ class RootNode(RegionNode):
     the real stats of previous measurements.
     """
 
-    def __init__(self, name: str = "<root>", timer_cls=Timer):
-        super(RootNode, self).__init__(name, timer_cls)
+    def __init__(self, name: str = "<root>", timer_cls=Timer, stats_cls=SeqStats):
+        super(RootNode, self).__init__(name, timer_cls, stats_cls)
         self.enter_region()
         self.stats = _RootNodeStats(self.timer)
 
@@ -0,0 +1,104 @@
+"""Calibration of the instrumentation overhead.
+
+Entering and exiting a region takes time, that is accounted in the parent
+region, and a part of it is accounted in the region itself.
+For regions with thousands of tiny children this overhead may be
+a noticeable fraction of the reported time.
+
+:py:func:`calibrate` measures the overhead of the current interpreter
+and profiler configuration. When a profiler has a calibrated
+:py:attr:`region_profiler.profiler.RegionProfiler.overhead`, report slices
+estimate the overhead inside each region from the number of its hits
+and hits of its descendants, which are all entered inside the region.
+Reports may then show compensated times with ``compensated total``,
+``compensated inner`` and ``% overhead`` columns
+(see :py:mod:`region_profiler.reporter_columns`).
+"""
+
+from typing import Callable, Optional
+
+from region_profiler.profiler import RegionProfiler
+from region_profiler.utils import Timer
+
+
+class InstrumentationOverhead:
+    """Calibrated instrumentation costs in seconds.
+
+    Attributes:
+        hit_cost (float): time of entering and exiting a region,
+            that is accounted in its parent
+        self_cost (float): part of :py:attr:`hit_cost`,
+            that is accounted in the region itself
+        clock_resolution (float): smallest observed clock increment
+    """
+
+    __slots__ = ("hit_cost", "self_cost", "clock_resolution")
+
+    def __init__(self, hit_cost: float, self_cost: float, clock_resolution: float):
+        self.hit_cost = hit_cost
+        self.self_cost = self_cost
+        self.clock_resolution = clock_resolution
+
+    def __repr__(self):
+        return (
+            "InstrumentationOverhead(hit_cost={}, self_cost={}, "
+            "clock_resolution={})".format(
+                self.hit_cost, self.self_cost, self.clock_resolution
+            )
+        )
+
+
+def calibrate(
+    timer_cls: Optional[Callable[[], Timer]] = None,
+    compact: bool = False,
+    iterations: int = 2000,
+    repeats: int = 5,
+) -> InstrumentationOverhead:
+    """Measure the instrumentation overhead.
+
+    Empty regions are entered in a loop inside an outer region
+    of a scratch profiler. The minimal cost over ``repeats`` runs is taken,
+    since noise only increases the measured time.
+    Listeners are not included in the measurement.
+
+    Args:
+        timer_cls (:obj:`class`, optional): timer class of the profiled profiler
+        compact (bool): whether the profiled profiler uses compact trees
+        iterations (int): number of region hits in a run
+        repeats (int): number of runs
+
+    Returns:
+        :py:class:`InstrumentationOverhead`: calibrated costs
+    """
+    r = range(iterations)
+    hit_cost = self_cost = float("inf")
+    for _ in range(repeats):
+        rp = RegionProfiler(timer_cls=timer_cls, compact=compact)
+        timer = rp.timer_cls()
+        clock, scale = timer.clock, timer.scale
+
+        begin_ts = clock()
+        for _ in r:
+            pass
+        loop_cost = (clock() - begin_ts) * scale
+
+        with rp.region("outer") as outer:
+            for _ in r:
+                with rp.region("inner"):
+                    pass
+        inner = outer.children["inner"]
+        hit_cost = min(hit_cost, (outer.stats.total - loop_cost) / iterations)
+        self_cost = min(self_cost, inner.stats.total / inner.stats.count)
+
+    resolution = float("inf")
+    for _ in range(100):
+        t0 = clock()
+        t1 = clock()
+        while t1 == t0:
+            t1 = clock()
+        resolution = min(resolution, (t1 - t0) * scale)
+
+    hit_cost = max(hit_cost, 0.0)
+    return InstrumentationOverhead(
+        hit_cost, min(max(self_cost, 0.0), hit_cost), resolution
+    )
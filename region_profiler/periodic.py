@@ -0,0 +1,284 @@
+"""Periodic reporting from a background thread.
+
+Reporters passed to :py:func:`region_profiler.install` run only at exit,
+so long-running services and training jobs produce no report until they
+stop, and none at all if they are killed. :py:class:`PeriodicReporter`
+reports the profiler state every few seconds, either cumulative or as
+deltas since the previous report, to a stream or a rotating file.
+
+The tree is copied with :py:func:`region_profiler.node.merge_nodes`,
+which reads the live nodes without locking, so the profiled threads
+are never blocked by the reporter.
+"""
+
+import copy
+import os
+import sys
+import threading
+import time
+from typing import IO, Optional
+
+from region_profiler.histogram import HistSeqStats, LogHistogram
+from region_profiler.node import MEMORY_STATS, RegionNode, merge_nodes
+from region_profiler.reporters import ConsoleReporter, get_tree_slice
+from region_profiler.utils import SeqStats, SeqStatsProtocol
+
+
+def delta_stats(current: SeqStatsProtocol, previous: SeqStatsProtocol) -> SeqStats:
+    """Compute stats of the values, added after ``previous`` was taken.
+
+    Count, total and variance are exact. Min and max can't be recovered
+    from aggregates, so the cumulative values of ``current`` are used.
+    If both stats have histograms, the histogram of the delta is exact too.
+
+    Args:
+        current (:py:class:`region_profiler.utils.SeqStats`): current stats
+        previous (:py:class:`region_profiler.utils.SeqStats`): earlier stats
+            of the same sequence
+
+    Returns:
+        :py:class:`region_profiler.utils.SeqStats`: stats of the new values
+    """
+    count = current.count - previous.count
+    total = current.total - previous.total
+    histogram = getattr(current, "histogram", None)
+    previous_histogram = getattr(previous, "histogram", None)
+    if count <= 0:
+        return HistSeqStats() if histogram is not None else SeqStats()
+    m2 = getattr(current, "m2", 0.0)
+    if previous.count:
+        mean_delta = total / count - previous.total / previous.count
+        m2 -= (
+            getattr(previous, "m2", 0.0)
+            + mean_delta * mean_delta * previous.count * count / current.count
+        )
+    if histogram is None:
+        return SeqStats(count, total, current.min, current.max, max(m2, 0.0))
+
+    delta_histogram = LogHistogram(
+        histogram.precision, histogram.min_value, histogram.max_value
+    )
+    for i, n in histogram.buckets.items():
+        if previous_histogram is not None:
+            n -= previous_histogram.buckets.get(i, 0)
+        if n > 0:
+            delta_histogram.buckets[i] = n
+            delta_histogram.count += n
+    return HistSeqStats(
+        count, total, current.min, current.max, max(m2, 0.0), delta_histogram
+    )
+
+
+def delta_tree(current: RegionNode, previous: Optional[RegionNode]) -> RegionNode:
+    """Compute a region tree with stats of hits between two snapshots.
+
+    Args:
+        current (:py:class:`region_profiler.node.RegionNode`): current snapshot
+        previous (:py:class:`region_profiler.node.RegionNode`, optional):
+            earlier snapshot of the same tree. If None, a copy of ``current``
+            is returned
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: tree of the deltas
+    """
+    if previous is None:
+        return merge_nodes([current])
+    root = _delta_node(current, previous)
+    stack = [(root, current, previous)]
+    while stack:
+        node, current, previous = stack.pop()
+        for name, child in current.children.items():
+            previous_child = previous.children.get(name)
+            if previous_child is None:
+                node.children[name] = merge_nodes([child])
+            else:
+                node.children[name] = _delta_node(child, previous_child)
+                stack.append((node.children[name], child, previous_child))
+    return root
+
+
+def _delta_node(current: RegionNode, previous: RegionNode) -> RegionNode:
+    """Create a childless node with stats of hits between two snapshots."""
+    node = RegionNode(current.name, current.timer_cls, current.stats_cls)
+    node.stats = delta_stats(current.stats, previous.stats)
+    node.skipped = current.skipped - previous.skipped
+    node.descendant_hits = current.descendant_hits - previous.descendant_hits
+    if current.running_stats is not None:
+        if previous.running_stats is not None:
+            node.running_stats = delta_stats(
+                current.running_stats, previous.running_stats
+            )
+        else:
+            node.running_stats = SeqStats()
+            node.running_stats.merge(current.running_stats)
+    if current.cpu_stats is not None:
+        if previous.cpu_stats is not None:
+            node.cpu_stats = delta_stats(current.cpu_stats, previous.cpu_stats)
+        else:
+            node.cpu_stats = SeqStats()
+            node.cpu_stats.merge(current.cpu_stats)
+    for attr in MEMORY_STATS:
+        stats = getattr(current, attr)
+        if stats is None:
+            continue
+        previous_stats = getattr(previous, attr)
+        if previous_stats is not None:
+            setattr(node, attr, delta_stats(stats, previous_stats))
+        else:
+            setattr(node, attr, SeqStats())
+            getattr(node, attr).merge(stats)
+    if current.recursion_depths:
+        previous_depths = previous.recursion_depths or {}
+        depths = {
+            depth: count - previous_depths.get(depth, 0)
+            for depth, count in current.recursion_depths.items()
+        }
+        node.recursion_depths = {d: n for d, n in depths.items() if n > 0} or None
+    return node
+
+
+class PeriodicReporter:
+    """Report profiler state periodically from a background thread.
+
+    Examples::
+
+        rp.install(reporter=CsvReporter(), report_interval=60)
+
+        reporter = PeriodicReporter(profiler, 60, filename='profile.log')
+        reporter.start()
+
+    Attributes:
+        profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+        interval (float): reporting interval in seconds
+        delta (bool): report stats of the last interval instead of cumulative ones
+        reporter: reporter with ``dump_slices()`` method, e.g.
+            :py:class:`region_profiler.reporters.ConsoleReporter`
+        filename (:py:class:`str`, optional): output file
+        report_count (int): number of reports written
+    """
+
+    def __init__(
+        self,
+        profiler,
+        interval: float,
+        reporter=None,
+        delta: bool = True,
+        filename: Optional[str] = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        stream: Optional[IO[str]] = None,
+    ):
+        """
+        Args:
+            profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+            interval (float): reporting interval in seconds
+            reporter: reporter with ``dump_slices()`` method.
+                Default: :py:class:`region_profiler.reporters.ConsoleReporter`
+            delta (bool): report stats of the last interval
+                instead of cumulative ones
+            filename (:py:class:`str`, optional): write reports to this file
+                instead of the reporter stream
+            max_bytes (int): rotate the file, once it exceeds this size
+            backup_count (int): number of rotated files to keep
+                (``filename.1`` is the newest one)
+            stream (file-like object, optional): stream for report headers.
+                Default: the reporter stream or ``sys.stderr``
+        """
+        if interval <= 0:
+            raise ValueError("Reporting interval must be positive")
+        self.profiler = profiler
+        self.interval = interval
+        self.reporter = reporter if reporter is not None else ConsoleReporter()
+        self.delta = delta
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stream = stream
+        self.report_count = 0
+        self._previous: Optional[RegionNode] = None
+        self._previous_ts = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the reporting thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="RegionProfiler reporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, final_report: bool = True):
+        """Stop the reporting thread.
+
+        Args:
+            final_report (bool): write a report of the last, incomplete interval
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if final_report:
+            self.report()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def report(self):
+        """Take a snapshot of the profiler and write a report."""
+        with self._lock:
+            now = time.time()
+            current = merge_nodes([self.profiler.merged_root()])
+            if self.delta:
+                root = delta_tree(current, self._previous)
+                elapsed = now - self._previous_ts
+                root.stats = SeqStats(1, elapsed, elapsed, elapsed)
+            else:
+                root = current
+            self._previous = current
+            self._previous_ts = now
+            self.report_count += 1
+            self._write(root, now)
+
+    def _write(self, root: RegionNode, now: float):
+        header = "# RegionProfiler report {} at {}{}".format(
+            self.report_count,
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+            ", last {:.3f} s".format(root.stats.total) if self.delta else "",
+        )
+        slices = get_tree_slice(
+            root,
+            getattr(self.reporter, "top_k", None),
+            getattr(self.reporter, "min_percent", 0.0),
+            self.profiler.overhead,
+        )
+        if self.filename is None:
+            stream = self.stream or getattr(self.reporter, "stream", sys.stderr)
+            print(header, file=stream)
+            self.reporter.dump_slices(slices)
+            stream.flush()
+            return
+
+        # the reporter may be shared with other threads (e.g. the final report),
+        # so the file is set on a copy of it
+        reporter = copy.copy(self.reporter)
+        with open(self.filename, "a") as f:
+            print(header, file=f)
+            reporter.stream = f
+            reporter.dump_slices(slices)
+        if os.path.getsize(self.filename) >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = "{}.{}".format(self.filename, i)
+            if os.path.exists(src):
+                os.replace(src, "{}.{}".format(self.filename, i + 1))
+        if self.backup_count > 0:
+            os.replace(self.filename, "{}.1".format(self.filename))
+        else:
+            os.remove(self.filename)
@@ -1,13 +1,44 @@
-from contextlib import contextmanager
-from typing import Any, Callable, Generator, Iterable, List, Optional, TypeVar, cast
-
-import torch.autograd.profiler as torch_profiler
-
-from region_profiler.listener import RegionProfilerListener
-from region_profiler.node import RegionNode, RootNode
-from region_profiler.utils import Timer, get_name_by_callsite
+import threading
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from region_profiler.listener import CANCEL, ENTER, EXIT, RegionProfilerListener
+from region_profiler.node import RegionNode, RootNode, merge_nodes
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.sync import CudaSynchronizer, SyncPolicy
+from region_profiler.utils import (
+    SeqStats,
+    Timer,
+    get_name_by_callsite,
+    is_coroutine_function,
+    make_timer_cls,
+)
+
+if TYPE_CHECKING:
+    from region_profiler.overhead import InstrumentationOverhead
+    from region_profiler.workers import WorkerCollector
 
 F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+_ListenerHook = Callable[["RegionProfiler", RegionNode], None]
+_DispatchTable = Tuple[
+    Tuple[_ListenerHook, ...], Tuple[_ListenerHook, ...], Tuple[_ListenerHook, ...]
+]
+_NO_HOOKS: _DispatchTable = ((), (), ())
 
 
 class RegionProfiler:
@@ -27,12 +58,41 @@ class RegionProfiler:
     see package-level function :py:func:`region_profiler.install`,
     :py:func:`region_profiler.region`, :py:func:`region_profiler.func`,
     and :py:func:`region_profiler.iter_proxy`.
+
+    Each thread has its own region stack and region tree,
+    so regions entered concurrently do not interfere.
+    The tree of the thread, that created the profiler, is rooted at
+    :py:attr:`root`, trees of other threads are rooted at :py:attr:`thread_roots`.
+    Use :py:meth:`merged_root` to get a single tree with all threads merged.
+    Trees of finished threads are merged into a single tree, when a new thread
+    enters its first region or :py:meth:`merged_root` is called,
+    so short-lived threads do not accumulate.
+
+    Collection may be paused and resumed at runtime (:py:meth:`pause`,
+    :py:meth:`resume`), regions may be filtered out together with their
+    subtrees (:py:meth:`disable_regions`) and listeners may be attached
+    and detached (:py:meth:`add_listener`, :py:meth:`remove_listener`).
+    Collected stats are kept in all cases.
+
+    Attributes:
+        overhead (:py:class:`region_profiler.overhead.InstrumentationOverhead`, optional):
+            calibrated instrumentation overhead, that reports compensate for
+            (see :py:func:`region_profiler.overhead.calibrate`). None by default
     """
 
     ROOT_NODE_NAME = "<main>"
 
     def __init__(
-        self, timer_cls=None, listeners: Optional[List[RegionProfilerListener]] = None
+        self,
+        timer_cls=None,
+        listeners: Optional[List[RegionProfilerListener]] = None,
+        sync_policy: Optional[SyncPolicy] = None,
+        synchronizer: Optional[Callable[[], None]] = None,
+        sampling: Optional[SamplingPolicy] = None,
+        histograms: bool = False,
+        compact: bool = False,
+        collapse_recursion: bool = False,
+        clock: Optional[str] = None,
     ):
         """Construct new :py:class:`RegionProfiler`.
 
@@ -42,22 +102,88 @@ class RegionProfiler:
             listeners (:py:class:`list` of
                 :py:class:`region_profiler.listener.RegionProfilerListener`, optional):
                 optional list of listeners, that can augment region enter and exit events.
+            sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+                default device synchronization policy for all regions.
+                If None, the device is not synchronized
+                unless a region specifies its own policy.
+            synchronizer (callable, optional): function that synchronizes the device.
+                Default: :py:class:`region_profiler.sync.CudaSynchronizer`,
+                created when a synchronization policy is first used
+            sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+                default sampling policy for all regions.
+                If None, every region hit is recorded
+                unless a region specifies its own policy.
+            histograms (bool): collect latency histograms of regions
+                (see :py:class:`region_profiler.histogram.HistSeqStats`),
+                that allow reporting percentiles.
+            compact (bool): store region trees in arrays
+                (see :py:class:`region_profiler.compact.CompactTree`)
+                to reduce memory usage of large trees.
+                Can't be combined with ``histograms``
+            collapse_recursion (bool): enter a region, that is already
+                on the region stack, as a recursive entry of the outer region
+                instead of creating a nested node. This bounds the tree size
+                for recursive functions; recursion depths of hits are kept
+                in :py:attr:`region_profiler.node.RegionNode.recursion_depths`.
+                The region stack is searched on every region entry
+            clock (:py:class:`str`, optional): name of the clock used for timing
+                regions, e.g. ``perf_counter_ns``
+                (see :py:data:`region_profiler.utils.CLOCKS`).
+                Can't be combined with ``timer_cls``
         """
+        if compact and histograms:
+            raise ValueError("Compact region trees don't support histograms")
+        if clock is not None:
+            if timer_cls is not None:
+                raise ValueError("Only one of timer_cls and clock may be specified")
+            timer_cls = make_timer_cls(clock)
         if timer_cls is None:
             timer_cls = Timer
-        self.root = RootNode(name=self.ROOT_NODE_NAME, timer_cls=timer_cls)
-        self.node_stack: List[RegionNode] = [self.root]
-        self.listeners: List[RegionProfilerListener] = listeners or []
-        for l in self.listeners:
-            l.region_entered(self, self.root)
+        self.timer_cls = timer_cls
+        self.stats_cls: Callable[[], SeqStats] = SeqStats
+        if histograms:
+            from region_profiler.histogram import HistSeqStats
+
+            self.stats_cls = HistSeqStats
+        self.compact = compact
+        self.overhead: Optional["InstrumentationOverhead"] = None
+        self.collapse_recursion = collapse_recursion
+        self.root = self._make_root()
+        self.thread_roots: List[RegionNode] = []
+        self._threads: List[threading.Thread] = []
+        self._threads_lock = threading.Lock()
+        self._finished_root: Optional[RegionNode] = None
+        self._local = threading.local()
+        self._local.node_stack = [self.root]
+        self.worker_collector: Optional["WorkerCollector"] = None
+        self._async_node: ContextVar[Optional[Tuple[RegionNode, int]]] = ContextVar(
+            "region_profiler_async_node", default=None
+        )
+        self._listeners_version = 0
+        self.listeners = listeners or []
+        self._contexts: Dict[Tuple[RegionNode, str], _RegionContext] = {}
+        self._node_contexts: Dict[RegionNode, _RegionContext] = {}
+        self.sync_policy = sync_policy
+        self.synchronizer: Optional[Callable[[], None]] = synchronizer
+        self.sampling = sampling
+        self.paused = False
+        self.disabled_patterns: Tuple[str, ...] = ()
+        self._disabled_names: Dict[str, bool] = {}
+        self._muting = False
+        if sync_policy is not None:
+            self._resolve_synchronizer()
+        self.root.listener_hooks = self._dispatch_table(self.root.name)
+        for fn in self.root.listener_hooks[0]:
+            fn(self, self.root)
 
-    @contextmanager
     def region(
         self,
         name: Optional[str] = None,
         asglobal: bool = False,
         indirect_call_depth: int = 0,
-    ) -> Generator[RegionNode, None, None]:
+        sync_policy: Optional[SyncPolicy] = None,
+        sampling: Optional[SamplingPolicy] = None,
+    ) -> "_RegionContext":
         """Start new region in the current context.
 
         This function implements context manager interface.
@@ -65,6 +191,10 @@ class RegionProfiler:
         it enters a region with the specified name in the current context
         on invocation and leaves it on ``with`` block exit.
 
+        Context objects are cached per parent node and region name,
+        so entering a known region costs a dictionary lookup
+        and a pair of clock reads.
+
         Examples::
 
             with rp.region('A'):
@@ -77,45 +207,172 @@ class RegionProfiler:
                 May be used to merge stats from different call paths
             indirect_call_depth (:py:class:`int`, optional): adjust call depth
                 to correctly identify the callsite position for automatic naming
+            sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+                device synchronization policy of this entry of the region.
+                If None, the profiler policy is used
+            sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+                sampling policy of this entry of the region.
+                If None, the profiler policy is used
 
         Returns:
-            :py:class:`region_profiler.node.RegionNode`: node of the region.
+            context manager, that yields
+            :py:class:`region_profiler.node.RegionNode` of the region.
         """
         if name is None:
-            name = get_name_by_callsite(indirect_call_depth + 2)
-        parent = self.root if asglobal else self.current_node
-        self.node_stack.append(parent.get_child(name))
-        self._enter_current_region()
-        with torch_profiler.record_function(f"region_profiler::{name}"):
-            yield self.current_node
-        self._exit_current_region()
-        self.node_stack.pop()
-
-    def _torch_synchronize(self):
+            name = get_name_by_callsite(indirect_call_depth + 1)
+        parent = self.node_stack[0] if asglobal else self.current_node
         try:
-            import torch
+            ctx = self._contexts[parent, name]
+        except KeyError:
+            ctx = self._make_context(parent, name)
+        if sync_policy is not None or sampling is not None:
+            ctx = self._context_with_policies(ctx, sync_policy, sampling)
+        return ctx
+
+    def aregion(
+        self,
+        name: Optional[str] = None,
+        asglobal: bool = False,
+        indirect_call_depth: int = 0,
+    ) -> "_AsyncRegionContext":
+        """Start new region in the current asynchronous context.
+
+        Unlike :py:meth:`region`, the region may span ``await`` expressions:
+        the current region is tracked per task using :py:mod:`contextvars`,
+        so concurrent tasks do not interfere. Regular regions
+        entered inside the asynchronous region become its children.
+
+        Listeners are not notified about asynchronous regions,
+        since their events interleave between tasks.
+
+        Examples::
 
-            torch.cuda.synchronize()
-        except Exception as e:
-            print(f"Warning: could not synchronize Torch CUDA: {e}")
-            pass
+            async with rp.aregion('fetch'):
+                await ...
+
+        Args:
+            name (:py:class:`str`, optional): region name.
+                If None, the name is deducted from region location in source
+            asglobal (bool): enter the region from root context, not a current one.
+                May be used to merge stats from different call paths
+            indirect_call_depth (:py:class:`int`, optional): adjust call depth
+                to correctly identify the callsite position for automatic naming
+
+        Returns:
+            asynchronous context manager, that yields
+            :py:class:`region_profiler.node.RegionNode` of the region.
+        """
+        if name is None:
+            name = get_name_by_callsite(indirect_call_depth + 1)
+        parent = self.node_stack[0] if asglobal else self.current_node
+        return _AsyncRegionContext(self, parent, parent.get_child(name))
+
+    async def _timed_coroutine(
+        self, name: str, asglobal: bool, coro: Coroutine[Any, Any, T]
+    ) -> T:
+        ctx = self.aregion(name, asglobal)
+        async with ctx:
+            if ctx.muted:
+                return await coro
+            return await _RunningTimeAwaitable(coro, ctx)
+
+    def _make_context(self, parent: RegionNode, name: str) -> "_RegionContext":
+        if self.collapse_recursion:
+            # the collapsed node depends on the whole stack, not only
+            # on the parent, so it is looked up on every entry
+            # and only the contexts are cached, by node
+            node = self._find_entered_region(parent, name)
+            if node is None:
+                node = parent.get_child(name)
+            try:
+                return self._node_contexts[node]
+            except KeyError:
+                ctx = self._node_contexts[node] = _RegionContext(self, node)
+                return ctx
+        ctx = _RegionContext(self, parent.get_child(name))
+        self._contexts[parent, name] = ctx
+        return ctx
+
+    def _find_entered_region(
+        self, parent: RegionNode, name: str
+    ) -> Optional[RegionNode]:
+        """Find a region with the given name on the stack below ``parent``.
+
+        The search is done only if ``parent`` is the innermost entered region.
+        The same node may be entered with different stacks below it,
+        so the result must not be cached by ``parent``.
+        """
+        stack = self.node_stack
+        if stack[-1] is not parent:
+            return None
+        for node in reversed(stack[1:]):
+            if node.name == name:
+                return node
+        return None
+
+    def _context_with_policies(
+        self,
+        ctx: "_RegionContext",
+        sync_policy: Optional[SyncPolicy],
+        sampling: Optional[SamplingPolicy],
+    ) -> "_RegionContext":
+        """Return a context for the node of ``ctx`` with the given policies.
+
+        The cached context is shared by all calls for the region,
+        so policies passed to a single call are kept in a separate context.
+        The last such context is cached in ``ctx``.
+        """
+        policy_ctx = ctx.policy_context
+        if (
+            policy_ctx is None
+            or policy_ctx.sync_policy is not sync_policy
+            or policy_ctx.sampling is not sampling
+        ):
+            if sync_policy is not None:
+                self._resolve_synchronizer()
+            policy_ctx = _RegionContext(self, ctx.node)
+            policy_ctx.sync_policy = sync_policy
+            policy_ctx.sampling = sampling
+            ctx.policy_context = policy_ctx
+        return policy_ctx
+
+    def _resolve_synchronizer(self):
+        if self.synchronizer is None:
+            self.synchronizer = CudaSynchronizer()
 
     def func(
-        self, name: Optional[str] = None, asglobal: bool = False
+        self,
+        name: Optional[str] = None,
+        asglobal: bool = False,
+        sync_policy: Optional[SyncPolicy] = None,
+        sampling: Optional[SamplingPolicy] = None,
     ) -> Callable[[F], F]:
         """Decorator for entering region on a function call.
 
+        Coroutine functions are wrapped in an asynchronous region
+        (see :py:meth:`aregion`), that also accounts the time,
+        when the coroutine was actually running,
+        excluding the time it was suspended in the event loop.
+
         Examples::
 
             @rp.func()
             def foo():
                 ...
 
+            @rp.func()
+            async def bar():
+                ...
+
         Args:
             name (:py:class:`str`, optional): region name.
                 If None, the name is deducted from region location in source
             asglobal (bool): enter the region from root context, not a current one.
                 May be used to merge stats from different call paths
+            sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+                device synchronization policy of this region
+            sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+                sampling policy of this region. Coroutine functions are not sampled
 
         Returns:
             Callable: a decorator for wrapping a function
@@ -128,8 +385,19 @@ class RegionProfiler:
 
             name += "()"
 
+            if is_coroutine_function(fn):
+
+                async def async_wrapped(*args, **kwargs):
+                    return await self._timed_coroutine(
+                        name, asglobal, fn(*args, **kwargs)  # type: ignore[arg-type]
+                    )
+
+                return cast(F, async_wrapped)
+
             def wrapped(*args, **kwargs):
-                with self.region(name, asglobal):
+                with self.region(
+                    name, asglobal, sync_policy=sync_policy, sampling=sampling
+                ):
                     return fn(*args, **kwargs)
 
             return cast(F, wrapped)
@@ -142,6 +410,8 @@ class RegionProfiler:
         name: Optional[str] = None,
         asglobal: bool = False,
         indirect_call_depth: int = 0,
+        sync_policy: Optional[SyncPolicy] = None,
+        sampling: Optional[SamplingPolicy] = None,
     ) -> Iterable:
         """Wraps an iterable and profiles :func:`next()` calls on this iterable.
 
@@ -168,6 +438,10 @@ class RegionProfiler:
                 May be used to merge stats from different call paths
             indirect_call_depth (:py:class:`int`, optional): adjust call depth
                 to correctly identify the callsite position for automatic naming
+            sync_policy (:py:class:`region_profiler.sync.SyncPolicy`, optional):
+                device synchronization policy of this region
+            sampling (:py:class:`region_profiler.sampling.SamplingPolicy`, optional):
+                sampling policy of this region
 
         Returns:
             Iterable: an iterable, that yield same data as the passed one
@@ -175,55 +449,536 @@ class RegionProfiler:
         it = iter(iterable)
         if name is None:
             name = get_name_by_callsite(indirect_call_depth + 1)
-        parent = self.root if asglobal else self.current_node
-        node = parent.get_child(name)
+        parent = self.node_stack[0] if asglobal else self.current_node
+        try:
+            ctx = self._contexts[parent, name]
+        except KeyError:
+            ctx = self._make_context(parent, name)
+        if sync_policy is not None or sampling is not None:
+            ctx = self._context_with_policies(ctx, sync_policy, sampling)
 
         while True:
-            self.node_stack.append(node)
-            self._enter_current_region()
+            ctx.__enter__()
             try:
                 x = next(it)
             except StopIteration:
                 self._cancel_current_region()
                 return
             finally:
-                self._exit_current_region()
-                self.node_stack.pop()
+                ctx.__exit__(None, None, None)
 
             yield x
 
+    def pause(self):
+        """Stop recording region hits.
+
+        Regions entered while the profiler is paused, and all regions
+        nested into them, are neither timed, counted nor passed to listeners.
+        Regions, that have been entered before, are recorded as usual,
+        as well as regions entered after :py:meth:`resume`.
+        """
+        self.paused = True
+        self._update_muting()
+
+    def resume(self):
+        """Resume recording region hits after :py:meth:`pause`."""
+        self.paused = False
+        self._update_muting()
+
+    def disable_regions(self, *patterns: str):
+        """Stop recording regions, whose names match any of the glob patterns.
+
+        Subtrees of the matching regions are not recorded either.
+
+        Examples::
+
+            rp.disable_regions('data*', 'log_*()')
+
+        Args:
+            *patterns (str): :py:mod:`fnmatch`-style patterns of region names
+        """
+        self.disabled_patterns = tuple(
+            sorted(set(self.disabled_patterns).union(patterns))
+        )
+        self._update_muting()
+
+    def enable_regions(self, *patterns: str):
+        """Resume recording regions, disabled with :py:meth:`disable_regions`.
+
+        Args:
+            *patterns (str): patterns to be removed.
+                If no patterns are given, all patterns are removed
+        """
+        if patterns:
+            self.disabled_patterns = tuple(
+                p for p in self.disabled_patterns if p not in patterns
+            )
+        else:
+            self.disabled_patterns = ()
+        self._update_muting()
+
+    def add_listener(self, listener: RegionProfilerListener):
+        """Attach a listener.
+
+        The listener is notified about regions, entered after this call.
+        Hits of regions, that are already entered, are not passed to the listener,
+        including their exits.
+
+        Args:
+            listener (:py:class:`region_profiler.listener.RegionProfilerListener`):
+                listener to be attached
+        """
+        self.listeners = self.listeners + [listener]
+
+    def remove_listener(self, listener: RegionProfilerListener, finalize: bool = True):
+        """Detach a listener.
+
+        Args:
+            listener (:py:class:`region_profiler.listener.RegionProfilerListener`):
+                listener to be detached
+            finalize (bool): finalize the listener, e.g. close its trace file
+        """
+        self.listeners = [l for l in self.listeners if l is not listener]
+        if finalize:
+            listener.finalize()
+
+    @property
+    def listeners(self) -> List[RegionProfilerListener]:
+        """Return attached listeners.
+
+        Assigning a new list re-resolves listener subscriptions
+        (see :py:meth:`region_profiler.listener.RegionProfilerListener.subscribe`).
+
+        Returns:
+            list of :py:class:`region_profiler.listener.RegionProfilerListener`:
+                attached listeners
+        """
+        return self._listeners
+
+    @listeners.setter
+    def listeners(self, listeners: List[RegionProfilerListener]):
+        self._listeners = listeners
+        self._dispatch_tables: Dict[str, _DispatchTable] = {}
+        self._listeners_version += 1
+
+    def _dispatch_table(self, name: str) -> "_DispatchTable":
+        """Return hooks of listeners, subscribed to enter, exit and cancel events
+        of regions with the given name.
+        """
+        tables = self._dispatch_tables
+        try:
+            return tables[name]
+        except KeyError:
+            listeners = self._listeners
+            table = (
+                tuple(
+                    l.region_entered for l in listeners if l.is_subscribed(ENTER, name)
+                ),
+                tuple(
+                    l.region_exited for l in listeners if l.is_subscribed(EXIT, name)
+                ),
+                tuple(
+                    l.region_canceled
+                    for l in listeners
+                    if l.is_subscribed(CANCEL, name)
+                ),
+            )
+            tables[name] = table
+            return table
+
+    def _attached_hooks(
+        self, node: RegionNode, event: int
+    ) -> Tuple[_ListenerHook, ...]:
+        """Return hooks of the current hit of ``node``, that are still attached.
+
+        Args:
+            event (int): index of the event in the dispatch table
+        """
+        attached = self._dispatch_table(node.name)[event]
+        return tuple(fn for fn in node.listener_hooks[event] if fn in attached)
+
+    def _update_muting(self):
+        self._disabled_names = {}
+        self._muting = self.paused or bool(self.disabled_patterns)
+
+    def _should_mute(self, parent: RegionNode, node: RegionNode) -> bool:
+        if self.paused or parent.mute_depth:
+            return True
+        disabled_names = self._disabled_names
+        try:
+            return disabled_names[node.name]
+        except KeyError:
+            muted = any(fnmatchcase(node.name, p) for p in self.disabled_patterns)
+            disabled_names[node.name] = muted
+            return muted
+
     def finalize(self):
         """Perform profiler finalization on application shutdown.
         Finalize all associated listeners.
         """
         self.root.exit_region()
+        for root in self.thread_roots:
+            root.exit_region()
+        for fn in self._attached_hooks(self.root, 1):
+            fn(self, self.root)
         for l in self.listeners:
-            l.region_exited(self, self.root)
             l.finalize()
 
-    def _enter_current_region(self):
-        self._torch_synchronize()
-        self.current_node.enter_region()
-        for l in self.listeners:
-            l.region_entered(self, self.current_node)
+    def merged_root(self) -> RegionNode:
+        """Return the region tree with trees of all threads merged.
 
-    def _exit_current_region(self):
-        self._torch_synchronize()
-        self.current_node.exit_region()
-        for l in self.listeners:
-            l.region_exited(self, self.current_node)
+        Nodes with the same path are merged into a single node.
+        The root keeps the stats of :py:attr:`root`.
+        If :py:attr:`worker_collector` is set, trees of worker processes
+        are added as children of the root, one per worker.
+        If regions were entered from a single thread only
+        and there are no worker trees, :py:attr:`root` itself is returned.
+
+        Returns:
+            :py:class:`region_profiler.node.RegionNode`: root of the merged tree
+        """
+        self._fold_finished_threads()
+        thread_roots = list(self.thread_roots)
+        if self._finished_root is not None:
+            thread_roots.append(self._finished_root)
+        worker_roots = {}
+        collector = self.worker_collector
+        if collector is not None and not collector.is_worker():
+            worker_roots = collector.collect()
+        if not thread_roots and not worker_roots:
+            return self.root
+        merged = merge_nodes([self.root] + thread_roots)
+        merged.stats = self.root.stats
+        merged.children.update(worker_roots)
+        return merged
+
+    def _reset_worker(self):
+        """Start a new region tree in a forked worker process.
+
+        Listeners and device synchronization belong to the parent process
+        and are dropped.
+        """
+        self.root = self._make_root()
+        self.thread_roots = []
+        self._threads = []
+        self._threads_lock = threading.Lock()
+        self._finished_root = None
+        self._local = threading.local()
+        self._local.node_stack = [self.root]
+        self._contexts = {}
+        self._node_contexts = {}
+        self._async_node = ContextVar("region_profiler_async_node", default=None)
+        self.listeners = []
+        self.sync_policy = None
+        self.synchronizer = None
+
+    @property
+    def node_stack(self) -> List[RegionNode]:
+        """Return region stack of the current thread.
+
+        Returns:
+            list of :py:class:`region_profiler.node.RegionNode`:
+                nodes of the entered regions, from root to the current one
+        """
+        try:
+            return self._local.node_stack
+        except AttributeError:
+            return self._init_thread()
+
+    def _make_root(self) -> RootNode:
+        if self.compact:
+            from region_profiler.compact import CompactTree
+
+            timer = self.timer_cls()
+            tree = CompactTree(
+                self.ROOT_NODE_NAME, timer.clock, self.timer_cls, timer.scale
+            )
+            return tree.root  # type: ignore[return-value]
+        return RootNode(
+            name=self.ROOT_NODE_NAME, timer_cls=self.timer_cls, stats_cls=self.stats_cls
+        )
+
+    def _init_thread(self) -> List[RegionNode]:
+        root = self._make_root()
+        self._fold_finished_threads()
+        with self._threads_lock:
+            self.thread_roots.append(root)
+            self._threads.append(threading.current_thread())
+        stack: List[RegionNode] = [root]
+        self._local.node_stack = stack
+        return stack
+
+    def _fold_finished_threads(self):
+        """Merge trees of finished threads into :py:attr:`_finished_root`.
+
+        The trees are removed from :py:attr:`thread_roots`,
+        and region contexts cached for their nodes are dropped.
+        """
+        with self._threads_lock:
+            finished = [
+                root
+                for root, thread in zip(self.thread_roots, self._threads)
+                if not thread.is_alive()
+            ]
+            if not finished:
+                return
+            alive = [
+                (root, thread)
+                for root, thread in zip(self.thread_roots, self._threads)
+                if thread.is_alive()
+            ]
+            self.thread_roots = [root for root, _ in alive]
+            self._threads = [thread for _, thread in alive]
+            if self._finished_root is None:
+                self._finished_root = merge_nodes(finished)
+            else:
+                self._finished_root = merge_nodes([self._finished_root] + finished)
+
+        finished_nodes = set()
+        stack = list(finished)
+        while stack:
+            node = stack.pop()
+            finished_nodes.add(id(node))
+            stack.extend(node.children.values())
+        self._contexts = {
+            key: ctx
+            for key, ctx in list(self._contexts.items())
+            if id(key[0]) not in finished_nodes
+        }
+        self._node_contexts = {
+            node: ctx
+            for node, ctx in list(self._node_contexts.items())
+            if id(node) not in finished_nodes
+        }
 
     def _cancel_current_region(self):
-        self.current_node.cancel_region()
-        for l in self.listeners:
-            l.region_canceled(self, self.current_node)
+        node = self.current_node
+        if node.mute_depth:
+            return
+        skipped = node.skip_depth
+        node.cancel_region()
+        if not skipped:
+            for fn in self._attached_hooks(node, 2):
+                fn(self, node)
 
     @property
     def current_node(self) -> RegionNode:
         """Return current region node.
 
+        This is the innermost region of the current thread,
+        or the innermost asynchronous region of the current task,
+        if no regular region has been entered inside it.
+
         Returns:
             :py:class:`region_profiler.node.RegionNode`:
                 node of the region as defined above
         """
-        return self.node_stack[-1]
+        stack = self.node_stack
+        async_node = self._async_node.get()
+        if async_node is not None and len(stack) <= async_node[1]:
+            return async_node[0]
+        return stack[-1]
+
+
+class _RegionContext:
+    """Reusable context manager for entering a single region node.
+
+    Instances are created by :py:meth:`RegionProfiler.region` and cached
+    per parent node and region name. The context keeps no per-entry
+    state, so the same object may be entered recursively.
+
+    Hits, that are not sampled, are pushed to the region stack,
+    so that nested regions keep their place in the tree,
+    but are neither timed nor passed to listeners.
+    Muted hits (the profiler is paused or the region is disabled)
+    are handled the same way, but are not counted.
+    """
+
+    __slots__ = (
+        "profiler",
+        "node",
+        "sync_policy",
+        "sampling",
+        "listeners_version",
+        "hooks",
+        "policy_context",
+    )
+
+    def __init__(self, profiler: RegionProfiler, node: RegionNode):
+        self.profiler = profiler
+        self.node = node
+        self.sync_policy: Optional[SyncPolicy] = None
+        self.sampling: Optional[SamplingPolicy] = None
+        self.listeners_version = -1
+        self.hooks: _DispatchTable = _NO_HOOKS
+        self.policy_context: Optional[_RegionContext] = None
+
+    def _update_hooks(self):
+        # read the version first, so that a concurrent listener update
+        # can only make the hooks newer than the version
+        version = self.profiler._listeners_version
+        self.hooks = self.profiler._dispatch_table(self.node.name)
+        self.listeners_version = version
+
+    def __enter__(self) -> RegionNode:
+        profiler = self.profiler
+        node = self.node
+        stack = profiler.node_stack
+        if profiler.overhead is not None:
+            # every entry costs instrumentation time in the enclosing regions
+            stack[0].descendant_hits += 1
+        if node.mute_depth or (
+            profiler._muting and profiler._should_mute(profiler.current_node, node)
+        ):
+            node.mute_depth += 1
+            stack.append(node)
+            return node
+        stack.append(node)
+        sampling = self.sampling or profiler.sampling
+        if node.skip_depth or (
+            sampling is not None
+            and node.recursion_depth == 0
+            and not sampling.should_record(node)
+        ):
+            node.skip_region()
+            return node
+        if node.recursion_depth == 0:
+            # listeners are resolved once per hit, so that listeners
+            # attached during the hit don't receive its exit without the entry
+            if self.listeners_version != profiler._listeners_version:
+                self._update_hooks()
+            node.listener_hooks = self.hooks
+            node.entry_mark = stack[0].descendant_hits
+        sync_policy = self.sync_policy or profiler.sync_policy
+        if sync_policy is not None and sync_policy.should_sync_enter(node):
+            profiler.synchronizer()  # type: ignore[misc]
+        node.enter_region()
+        for fn in node.listener_hooks[0]:
+            fn(profiler, node)
+        return node
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        profiler = self.profiler
+        node = self.node
+        if node.mute_depth:
+            node.mute_depth -= 1
+            profiler.node_stack.pop()
+            return
+        if node.skip_depth:
+            node.exit_skipped_region()
+            profiler.node_stack.pop()
+            return
+        sync_policy = self.sync_policy or profiler.sync_policy
+        if sync_policy is not None and sync_policy.should_sync_exit(node):
+            profiler.synchronizer()  # type: ignore[misc]
+        if (
+            profiler.overhead is not None
+            and node.recursion_depth == 1
+            and not node.cancelled
+        ):
+            node.descendant_hits += profiler.node_stack[0].descendant_hits - (
+                node.entry_mark
+            )
+        node.exit_region()
+        hooks = node.listener_hooks
+        if (
+            hooks is not self.hooks
+            or self.listeners_version != profiler._listeners_version
+        ):
+            # listeners were changed during the hit
+            exit_hooks = profiler._attached_hooks(node, 1)
+        else:
+            exit_hooks = hooks[1]
+        for fn in exit_hooks:
+            fn(profiler, node)
+        profiler.node_stack.pop()
+
+
+class _AsyncRegionContext:
+    """Asynchronous context manager for entering a region node.
+
+    A new context is created for each entry. The region is timed
+    by the context itself rather than by the node timer, because
+    entries of concurrent tasks overlap.
+
+    Muted entries (the profiler is paused or the region is disabled)
+    are not recorded, and mute the regions nested into them.
+    """
+
+    __slots__ = ("profiler", "parent", "node", "token", "begin_ts", "running", "muted")
+
+    def __init__(self, profiler: RegionProfiler, parent: RegionNode, node: RegionNode):
+        self.profiler = profiler
+        self.parent = parent
+        self.node = node
+        self.token: Any = None
+        self.begin_ts = 0.0
+        self.running: Optional[float] = None
+        self.muted = False
+
+    async def __aenter__(self) -> RegionNode:
+        profiler = self.profiler
+        node = self.node
+        self.token = profiler._async_node.set((node, len(profiler.node_stack)))
+        if profiler._muting and profiler._should_mute(self.parent, node):
+            # nested regions check the mute depth of their parent
+            node.mute_depth += 1
+            self.muted = True
+            return node
+        self.begin_ts = node.timer.clock()
+        return node
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        node = self.node
+        if self.muted:
+            node.mute_depth -= 1
+        else:
+            timer = node.timer
+            node.stats.add((timer.clock() - self.begin_ts) * timer.scale)
+            if self.running is not None:
+                if node.running_stats is None:
+                    node.running_stats = SeqStats()
+                node.running_stats.add(self.running)
+        self.profiler._async_node.reset(self.token)
+
+
+class _RunningTimeAwaitable:
+    """Drive a coroutine and accumulate time spent in its steps.
+
+    The time between steps, when the task is suspended
+    in the event loop, is not accounted.
+    """
+
+    __slots__ = ("coro", "ctx")
+
+    def __init__(self, coro: Coroutine[Any, Any, Any], ctx: _AsyncRegionContext):
+        self.coro = coro
+        self.ctx = ctx
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        coro = self.coro
+        clock = self.ctx.node.timer.clock
+        running = 0.0
+        value: Any = None
+        error: Optional[BaseException] = None
+        try:
+            while True:
+                begin_ts = clock()
+                try:
+                    if error is None:
+                        signal = coro.send(value)
+                    else:
+                        signal = coro.throw(error)
+                except StopIteration as e:
+                    return e.value
+                finally:
+                    running += clock() - begin_ts
+                try:
+                    value, error = (yield signal), None
+                except GeneratorExit:
+                    coro.close()
+                    raise
+                except BaseException as e:
+                    value, error = None, e
+        finally:
+            self.ctx.running = running * self.ctx.node.timer.scale
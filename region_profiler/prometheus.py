@@ -0,0 +1,290 @@
+"""Export region stats in Prometheus text format.
+
+Each region is identified by its path from the root (region names joined
+with ``/``) and exported as
+
+- ``region_profiler_region_hits_total`` counter: number of recorded region hits
+- ``region_profiler_region_skipped_hits_total`` counter: number of hits,
+  that were not recorded due to sampling (see :py:mod:`region_profiler.sampling`)
+- ``region_profiler_region_seconds_total`` counter: total time
+  of the recorded hits
+- ``region_profiler_region_estimated_seconds`` gauge: total time
+  of all hits, estimated from the recorded ones. It may decrease,
+  when the sample rate changes
+- ``region_profiler_region_duration_seconds`` histogram, if the profiler
+  collects latency histograms (see :py:mod:`region_profiler.histogram`).
+  Its count and sum match the recorded hits counters
+
+Metrics are exposed either by a local HTTP endpoint
+(:py:class:`PrometheusExporter`) or written to a file
+for the node exporter textfile collector (:py:func:`write_textfile`).
+
+Metrics are built from :py:func:`region_profiler.reporters.get_profiler_slice`,
+which reads the region tree without locking,
+so a scrape never blocks the profiled threads.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional, Sequence
+
+from region_profiler.reporters import Slice, get_profiler_slice
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    1e-6,
+    1e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+    5e-2,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    60.0,
+)
+"""Upper bounds (in seconds) of the exported histogram buckets."""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+def slice_path(s: Slice) -> str:
+    """Return the path of a slice: names from the root to the slice joined by ``/``.
+
+    Args:
+        s (:py:class:`region_profiler.reporters.Slice`): slice
+
+    Returns:
+        str: path of the slice
+    """
+    names = []
+    node: Optional[Slice] = s
+    while node is not None:
+        names.append(node.name)
+        node = node.parent
+    return "/".join(reversed(names))
+
+
+def _add_metric(
+    lines: List[str],
+    name: str,
+    metric_type: str,
+    help_text: str,
+    paths: List[str],
+    values: Sequence[Any],
+):
+    lines.append("# HELP {} {}".format(name, help_text))
+    lines.append("# TYPE {} {}".format(name, metric_type))
+    for path, value in zip(paths, values):
+        lines.append('{}{{path="{}"}} {}'.format(name, path, value))
+
+
+def format_metrics(
+    slices: List[Slice],
+    prefix: str = "region_profiler",
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> str:
+    """Format slices in Prometheus text exposition format.
+
+    Args:
+        slices (list of :py:class:`region_profiler.reporters.Slice`): slices
+        prefix (str): metric name prefix
+        buckets (list of float): upper bounds of histogram buckets
+
+    Returns:
+        str: metrics text
+    """
+    paths = [_escape(slice_path(s)) for s in slices]
+    duration_name = prefix + "_region_duration_seconds"
+
+    lines: List[str] = []
+    _add_metric(
+        lines,
+        prefix + "_region_hits_total",
+        "counter",
+        "Number of recorded region hits.",
+        paths,
+        [s.recorded_count for s in slices],
+    )
+    _add_metric(
+        lines,
+        prefix + "_region_skipped_hits_total",
+        "counter",
+        "Number of region hits, that were not recorded due to sampling.",
+        paths,
+        [s.count - s.recorded_count for s in slices],
+    )
+    _add_metric(
+        lines,
+        prefix + "_region_seconds_total",
+        "counter",
+        "Total time of the recorded region hits.",
+        paths,
+        [_format_float(s.recorded_time) for s in slices],
+    )
+    _add_metric(
+        lines,
+        prefix + "_region_estimated_seconds",
+        "gauge",
+        "Total time of all region hits, estimated from the recorded ones.",
+        paths,
+        [_format_float(s.total_time) for s in slices],
+    )
+
+    histograms = [(p, s) for p, s in zip(paths, slices) if s.hist_stats is not None]
+    if histograms:
+        lines.append(
+            "# HELP {} Duration of recorded region hits.".format(duration_name)
+        )
+        lines.append("# TYPE {} histogram".format(duration_name))
+    for path, s in histograms:
+        histogram = s.hist_stats.histogram  # type: ignore[union-attr]
+        counts = sorted(histogram.buckets.items())
+        cumulative = 0
+        j = 0
+        for le in buckets:
+            # a log bucket is counted, once its upper bound fits under ``le``
+            while j < len(counts):
+                i, n = counts[j]
+                if histogram.bucket_upper_bound(i) > le:
+                    break
+                cumulative += n
+                j += 1
+            lines.append(
+                '{}_bucket{{path="{}",le="{}"}} {}'.format(
+                    duration_name, path, _format_float(le), cumulative
+                )
+            )
+        lines.append(
+            '{}_bucket{{path="{}",le="+Inf"}} {}'.format(
+                duration_name, path, histogram.count
+            )
+        )
+        lines.append(
+            '{}_count{{path="{}"}} {}'.format(duration_name, path, histogram.count)
+        )
+        lines.append(
+            '{}_sum{{path="{}"}} {}'.format(
+                duration_name,
+                path,
+                _format_float(s.hist_stats.total),  # type: ignore[union-attr]
+            )
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def write_textfile(profiler, filename: str, prefix: str = "region_profiler"):
+    """Write profiler metrics to a file for the node exporter textfile collector.
+
+    The file is replaced atomically.
+
+    Args:
+        profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+        filename (str): output ``.prom`` file
+        prefix (str): metric name prefix
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w") as f:
+        f.write(format_metrics(get_profiler_slice(profiler), prefix))
+    os.replace(tmp_filename, filename)
+
+
+class PrometheusExporter:
+    """Serve profiler metrics over HTTP for Prometheus scrapes.
+
+    Metrics are generated on each request in a server thread.
+
+    Examples::
+
+        exporter = PrometheusExporter(rp.install(), port=9464)
+        exporter.start()
+
+        $ curl localhost:9464/metrics
+
+    Attributes:
+        profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+        addr (str): listening address
+        port (int): listening port. If 0 was requested, the actual port
+            is available after :py:meth:`start`
+    """
+
+    def __init__(
+        self,
+        profiler,
+        port: int = 9464,
+        addr: str = "127.0.0.1",
+        prefix: str = "region_profiler",
+    ):
+        """
+        Args:
+            profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+            port (int): listening port, 0 to pick a free one
+            addr (str): listening address
+            prefix (str): metric name prefix
+        """
+        self.profiler = profiler
+        self.addr = addr
+        self.port = port
+        self.prefix = prefix
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start serving metrics from a background thread."""
+        if self._server is not None:
+            return
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = format_metrics(
+                    get_profiler_slice(exporter.profiler), exporter.prefix
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.addr, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="RegionProfiler metrics",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the HTTP server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()  # type: ignore[union-attr]
+            self._server = None
+            self._thread = None
@@ -6,9 +6,13 @@ Each column is defined as a function, that takes a current
 of all slices and returns the requested metrics of the current slice.
 
 Each column stores its name in ``column_name`` attribute.
+
+Percentile columns mark values with ``*``, if the latency histogram
+covers only a part of the region hits, e.g. when a tree recorded
+without histograms was merged in.
 """
 
-from region_profiler.utils import pretty_print_time
+from region_profiler.utils import pretty_print_bytes, pretty_print_time
 
 
 def as_column(print_name=None, name=None):
@@ -113,3 +117,215 @@ def max_us(this_slice, all_slices):
 @as_column()
 def max(this_slice, all_slices):
     return pretty_print_time(this_slice.max_time)
+
+
+@as_column()
+def running_us(this_slice, all_slices):
+    if this_slice.running_time is None:
+        return ''
+    return str(int(this_slice.running_time * 1000000))
+
+
+@as_column()
+def running(this_slice, all_slices):
+    if this_slice.running_time is None:
+        return ''
+    return pretty_print_time(this_slice.running_time)
+
+
+@as_column('% running')
+def running_percents(this_slice, all_slices):
+    if this_slice.running_time is None or not this_slice.total_time:
+        return ''
+    p = this_slice.running_time * 100. / this_slice.total_time
+    return '{:.2f}%'.format(p)
+
+
+@as_column()
+def sample_rate(this_slice, all_slices):
+    return '{:.2f}%'.format(this_slice.sample_rate * 100.)
+
+
+@as_column()
+def stddev_us(this_slice, all_slices):
+    return str(int(this_slice.stddev * 1000000))
+
+
+@as_column()
+def stddev(this_slice, all_slices):
+    return pretty_print_time(this_slice.stddev)
+
+
+def _partial_mark(this_slice):
+    return '*' if this_slice.hist_stats.partial else ''
+
+
+def _percentile(this_slice, q):
+    value = this_slice.percentile(q)
+    if value is None:
+        return ''
+    return pretty_print_time(value) + _partial_mark(this_slice)
+
+
+def _percentile_us(this_slice, q):
+    value = this_slice.percentile(q)
+    if value is None:
+        return ''
+    return str(int(value * 1000000)) + _partial_mark(this_slice)
+
+
+@as_column()
+def p50(this_slice, all_slices):
+    return _percentile(this_slice, 50)
+
+
+@as_column()
+def p50_us(this_slice, all_slices):
+    return _percentile_us(this_slice, 50)
+
+
+@as_column()
+def p90(this_slice, all_slices):
+    return _percentile(this_slice, 90)
+
+
+@as_column()
+def p90_us(this_slice, all_slices):
+    return _percentile_us(this_slice, 90)
+
+
+@as_column()
+def p99(this_slice, all_slices):
+    return _percentile(this_slice, 99)
+
+
+@as_column()
+def p99_us(this_slice, all_slices):
+    return _percentile_us(this_slice, 99)
+
+
+@as_column()
+def p999(this_slice, all_slices):
+    return _percentile(this_slice, 99.9)
+
+
+@as_column()
+def p999_us(this_slice, all_slices):
+    return _percentile_us(this_slice, 99.9)
+
+
+@as_column()
+def max_recursion_depth(this_slice, all_slices):
+    depths = this_slice.recursion_depths
+    return str(sorted(depths)[-1]) if depths else '1'
+
+
+@as_column()
+def recursion_depths(this_slice, all_slices):
+    depths = this_slice.recursion_depths
+    if not depths:
+        return ''
+    recursive_count = sum(depths.values())
+    pairs = [(1, this_slice.recorded_count - recursive_count)] + sorted(depths.items())
+    return ' '.join('{}:{}'.format(d, n) for d, n in pairs if n > 0)
+
+
+@as_column()
+def cpu_us(this_slice, all_slices):
+    if this_slice.cpu_time is None:
+        return ''
+    return str(int(this_slice.cpu_time * 1000000))
+
+
+@as_column()
+def cpu(this_slice, all_slices):
+    if this_slice.cpu_time is None:
+        return ''
+    return pretty_print_time(this_slice.cpu_time)
+
+
+@as_column('% cpu')
+def cpu_percents(this_slice, all_slices):
+    if this_slice.cpu_time is None or not this_slice.total_time:
+        return ''
+    p = this_slice.cpu_time * 100. / this_slice.total_time
+    return '{:.2f}%'.format(p)
+
+
+@as_column()
+def compensated_total_us(this_slice, all_slices):
+    return str(int(this_slice.compensated_total_time * 1000000))
+
+
+@as_column()
+def compensated_total(this_slice, all_slices):
+    return pretty_print_time(this_slice.compensated_total_time)
+
+
+@as_column()
+def compensated_inner_us(this_slice, all_slices):
+    return str(int(this_slice.compensated_inner_time * 1000000))
+
+
+@as_column()
+def compensated_inner(this_slice, all_slices):
+    return pretty_print_time(this_slice.compensated_inner_time)
+
+
+@as_column('% overhead')
+def overhead_percents(this_slice, all_slices):
+    if not this_slice.total_time:
+        return ''
+    p = this_slice.overhead_time * 100. / this_slice.total_time
+    if p > 100.:
+        p = 100.
+    return '{:.2f}%'.format(p)
+
+
+@as_column()
+def allocated(this_slice, all_slices):
+    if this_slice.allocated is None:
+        return ''
+    return pretty_print_bytes(this_slice.allocated)
+
+
+@as_column()
+def allocated_bytes(this_slice, all_slices):
+    if this_slice.allocated is None:
+        return ''
+    return str(int(this_slice.allocated))
+
+
+@as_column()
+def retained(this_slice, all_slices):
+    if this_slice.retained is None:
+        return ''
+    return pretty_print_bytes(this_slice.retained)
+
+
+@as_column()
+def retained_bytes(this_slice, all_slices):
+    if this_slice.retained is None:
+        return ''
+    return str(int(this_slice.retained))
+
+
+@as_column()
+def peak_memory(this_slice, all_slices):
+    if this_slice.peak_memory is None:
+        return ''
+    return pretty_print_bytes(this_slice.peak_memory)
+
+
+@as_column()
+def peak_memory_bytes(this_slice, all_slices):
+    if this_slice.peak_memory is None:
+        return ''
+    return str(this_slice.peak_memory)
+
+
+@as_column()
+def net_blocks(this_slice, all_slices):
+    if this_slice.net_blocks is None:
+        return ''
+    return str(int(round(this_slice.net_blocks)))
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import sys
-from typing import List, Optional
+from operator import itemgetter
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, TypeVar
 
 from region_profiler import reporter_columns as cols
 from region_profiler.node import RegionNode
 from region_profiler.profiler import RegionProfiler
+from region_profiler.utils import SeqStatsProtocol
+
+if TYPE_CHECKING:
+    from region_profiler.compact import CompactTree
+    from region_profiler.histogram import HistSeqStats
+    from region_profiler.overhead import InstrumentationOverhead
+
+T = TypeVar("T")
 
 
 class Slice:
@@ -32,8 +41,60 @@ class Slice:
                                  minus total time of all node ancestors
         min_time(float): minimal duration, spent in the corresponding region
         max_time(float): maximal duration, spent in the corresponding region
+        running_time(float, optional): total time, when a profiled coroutine
+                                       was actually running. None for regular regions
+        sample_rate(float): fraction of region hits, that were recorded.
+                            Total times are estimated for all hits
+        recorded_count(int): number of recorded region hits
+        recorded_time(float): total time of the recorded region hits
+        stddev(float): standard deviation of the region duration
+        hist_stats(:py:class:`region_profiler.histogram.HistSeqStats`, optional):
+                            region stats with a latency histogram.
+                            None if histograms are not collected
+        recursion_depths(dict, optional): number of region hits by the maximal
+                            recursion depth, for hits with recursive entries
+        cpu_time(float, optional): total CPU time spent in the region.
+                            None if CPU time is not collected
+        overhead_time(float): estimated instrumentation overhead
+                            included in the total time
+        inner_overhead_time(float): estimated instrumentation overhead
+                            included in the inner time
+        allocated(float, optional): estimated bytes allocated in the region,
+                            as the total growth of traced memory up to its peak
+                            during each hit. None if memory is not traced
+        retained(float, optional): estimated net bytes retained by the region
+        peak_memory(int, optional): maximal growth of traced memory during a hit
+        net_blocks(float, optional): estimated net number of memory blocks
+                            allocated by the region. None if blocks are not counted
     """
 
+    __slots__ = (
+        "id",
+        "name",
+        "parent",
+        "call_depth",
+        "count",
+        "total_time",
+        "total_inner_time",
+        "avg_time",
+        "min_time",
+        "max_time",
+        "running_time",
+        "sample_rate",
+        "recorded_count",
+        "recorded_time",
+        "stddev",
+        "hist_stats",
+        "recursion_depths",
+        "cpu_time",
+        "overhead_time",
+        "inner_overhead_time",
+        "allocated",
+        "retained",
+        "peak_memory",
+        "net_blocks",
+    )
+
     def __init__(
         self,
         id: int,
@@ -45,6 +106,14 @@ class Slice:
         total_inner_time: float,
         min_time: float,
         max_time: float,
+        running_time: Optional[float] = None,
+        sample_rate: float = 1.0,
+        stddev: float = 0.0,
+        hist_stats: Optional[HistSeqStats] = None,
+        recursion_depths: Optional[Dict[int, int]] = None,
+        cpu_time: Optional[float] = None,
+        overhead_time: float = 0.0,
+        inner_overhead_time: float = 0.0,
     ):
         """
         Args:
@@ -58,6 +127,19 @@ class Slice:
                                      minus total time of all node descendants
             min_time(float): minimal duration, spent in the corresponding region
             max_time(float): maximal duration, spent in the corresponding region
+            running_time(float, optional): total time, when a profiled coroutine
+                                           was actually running
+            sample_rate(float): fraction of region hits, that were recorded
+            stddev(float): standard deviation of the region duration
+            hist_stats(:py:class:`region_profiler.histogram.HistSeqStats`, optional):
+                                region stats with a latency histogram
+            recursion_depths(dict, optional): number of region hits
+                                by the maximal recursion depth
+            cpu_time(float, optional): total CPU time spent in the region
+            overhead_time(float): estimated instrumentation overhead
+                                  included in the total time
+            inner_overhead_time(float): estimated instrumentation overhead
+                                  included in the inner time
         """
         self.id = id
         self.name = name
@@ -69,6 +151,44 @@ class Slice:
         self.avg_time = total_time / count if count else 0
         self.min_time = min_time
         self.max_time = max_time
+        self.running_time = running_time
+        self.sample_rate = sample_rate
+        self.recorded_count = int(round(count * sample_rate))
+        self.recorded_time = total_time * sample_rate
+        self.stddev = stddev
+        self.hist_stats = hist_stats
+        self.recursion_depths = recursion_depths
+        self.cpu_time = cpu_time
+        self.overhead_time = overhead_time
+        self.inner_overhead_time = inner_overhead_time
+        self.allocated: Optional[float] = None
+        self.retained: Optional[float] = None
+        self.peak_memory: Optional[int] = None
+        self.net_blocks: Optional[float] = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate a percentile of the region duration.
+
+        Args:
+            q (float): percentile in [0, 100]
+
+        Returns:
+            :py:class:`float`, optional: estimated duration,
+                None if latency histogram is not available
+        """
+        if self.hist_stats is None:
+            return None
+        return self.hist_stats.percentile(q)
+
+    @property
+    def compensated_total_time(self) -> float:
+        """Total time without the estimated instrumentation overhead."""
+        return max(self.total_time - self.overhead_time, 0)
+
+    @property
+    def compensated_inner_time(self) -> float:
+        """Inner time without the estimated instrumentation overhead."""
+        return max(self.total_inner_time - self.inner_overhead_time, 0)
 
     @property
     def parent_name(self) -> str:
@@ -113,57 +233,320 @@ class Slice:
         )
 
 
+def _estimated_cpu_time(
+    cpu_stats: Optional[SeqStatsProtocol], sample_rate: float
+) -> Optional[float]:
+    if cpu_stats is None:
+        return None
+    return cpu_stats.total / sample_rate if sample_rate else 0.0
+
+
+def _prune_children(
+    children: List[Tuple[float, T]], min_total: float, top_k: Optional[int]
+) -> List[Tuple[float, T]]:
+    """Select children, that are reported.
+
+    Args:
+        children (list of tuples): ``(total, child)`` pairs,
+            sorted by total in decreasing order
+        min_total (float): drop children with a smaller total
+        top_k (:py:class:`int`, optional): keep at most this number of children
+
+    Returns:
+        list of tuples: reported children in the same order
+    """
+    if top_k is not None:
+        children = children[:top_k]
+    if min_total > 0:
+        children = [c for c in children if c[0] >= min_total]
+    return children
+
+
 def get_node_slice(
     slices: List[Slice],
     node: RegionNode,
     parent_slice: Optional[Slice],
     call_depth: int,
+    top_k: Optional[int] = None,
+    min_percent: float = 0.0,
+    overhead: Optional[InstrumentationOverhead] = None,
 ):
     """Serialize a node and its descendants data in a list of :py:class:`Slice`.
 
     Descendants are serialized sorted by their total time in decreasing order.
+    Counts include hits, that were not sampled, and total times
+    are scaled by the sampling rate.
+
+    The tree is walked with an explicit stack, so trees of any depth
+    can be serialized. Large trees may be pruned with ``top_k``
+    and ``min_percent``. Time of pruned children is still subtracted
+    from the inner time of their parent.
 
     Args:
         slices (list of :py:class:`Slice`): global list of slices
         node (:py:class:`region_profiler.node.RegionNode`): current node that is to be serialized
         parent_slice (:py:class:`Slice`, optional): link to a slice of the parent node
         call_depth (int): depth of the node in the hierarchy
+        top_k (:py:class:`int`, optional): serialize at most this number
+            of the largest children of each node
+        min_percent (float): skip descendants, whose total time is less than
+            this percentage of the total time of the first slice in ``slices``
+        overhead (:py:class:`region_profiler.overhead.InstrumentationOverhead`, optional):
+            calibrated instrumentation overhead. If provided, the overhead
+            inside each region is estimated from the number of region hits
+            and hits of its descendants
     """
-    s = Slice(
-        len(slices),
-        node.name,
-        parent_slice,
-        call_depth,
-        node.stats.count,
-        node.stats.total,
-        0,
-        node.stats.min,
-        node.stats.max,
-    )
-    slices.append(s)
+    min_total = -1.0
+    descendant_hits = _descendant_hits(node) if overhead is not None else {}
+    stack = [(node.estimated_total, node, parent_slice, call_depth)]
+    while stack:
+        total, node, parent_slice, call_depth = stack.pop()
+        stats = node.stats
+        sample_rate = node.sample_rate
+        s = Slice(
+            len(slices),
+            node.name,
+            parent_slice,
+            call_depth,
+            stats.count + node.skipped,
+            total,
+            0,
+            stats.min,
+            stats.max,
+            node.running_stats.total if node.running_stats is not None else None,
+            sample_rate,
+            stats.stddev,
+            stats if hasattr(stats, "histogram") else None,  # type: ignore[arg-type]
+            node.recursion_depths,
+            _estimated_cpu_time(node.cpu_stats, sample_rate),
+        )
+        s.recorded_count = stats.count
+        s.recorded_time = stats.total
+        _set_memory(s, node)
+        slices.append(s)
+        if min_total < 0:
+            min_total = slices[0].total_time * min_percent / 100.0
+
+        children = [(ch.estimated_total, ch) for ch in list(node.children.values())]
+        children.sort(key=itemgetter(0), reverse=True)
+        s.total_inner_time = max(total - sum(c[0] for c in children), 0)
+
+        if overhead is not None:
+            _set_overhead(
+                s,
+                overhead,
+                sum(ch.stats.count + ch.skipped for _, ch in children),
+                descendant_hits.get(id(node), 0),
+                node.descendant_hits,
+            )
 
-    child_total = 0.0
+        children = _prune_children(children, min_total, top_k)
+        # the largest child is pushed last to be serialized first
+        stack.extend((t, ch, s, call_depth + 1) for t, ch in reversed(children))
+
+
+def _descendant_hits(root: RegionNode) -> Dict[int, int]:
+    """Count hits of descendants of each node in a tree by node id."""
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(list(node.children.values()))
+    counts: Dict[int, int] = {}
+    for node in reversed(order):
+        counts[id(node)] = sum(
+            ch.stats.count + ch.skipped + counts.get(id(ch), 0)
+            for ch in list(node.children.values())
+        )
+    return counts
 
-    for ch in sorted(node.children.values(), key=lambda n: -n.stats.total):
-        get_node_slice(slices, ch, s, call_depth + 1)
-        child_total += ch.stats.total
 
-    s.total_inner_time = max(s.total_time - child_total, 0)
+def _set_overhead(
+    s: Slice,
+    overhead: InstrumentationOverhead,
+    child_hits: int,
+    descendant_hits: float,
+    entries: int,
+):
+    """Estimate instrumentation overhead inside a region.
+
+    Each descendant hit costs :py:attr:`hit_cost` in the region.
+    Each hit of a region costs :py:attr:`self_cost` in the region itself,
+    and this part of the child hit costs is included in the inner time
+    of the children instead. The root has no overhead of its own.
+
+    Descendant hits are counted in the tree, which misses global regions
+    and muted regions entered inside the region. The number of entries
+    inside the recorded hits, counted at runtime
+    (:py:attr:`region_profiler.node.RegionNode.descendant_hits`),
+    is used instead, if it is larger. It is zero for trees recorded
+    without the overhead set, e.g. loaded from snapshots.
+    """
+    if s.sample_rate and entries / s.sample_rate > descendant_hits:
+        descendant_hits = entries / s.sample_rate
+    self_time = overhead.self_cost * s.count if s.parent is not None else 0.0
+    s.overhead_time = self_time + overhead.hit_cost * descendant_hits
+    s.inner_overhead_time = (
+        self_time + (overhead.hit_cost - overhead.self_cost) * child_hits
+    )
+
+
+def _set_memory(s: Slice, node: RegionNode):
+    """Estimate memory usage of a region from its recorded hits."""
+    rate = s.sample_rate
+    if not rate:
+        return
+    if node.memory_stats is not None:
+        s.retained = node.memory_stats.total / rate
+    if node.peak_memory_stats is not None:
+        s.allocated = node.peak_memory_stats.total / rate
+        s.peak_memory = int(node.peak_memory_stats.max)
+    if node.block_stats is not None:
+        s.net_blocks = node.block_stats.total / rate
 
 
-def get_profiler_slice(rp: RegionProfiler) -> List[Slice]:
+def get_profiler_slice(
+    rp: RegionProfiler, top_k: Optional[int] = None, min_percent: float = 0.0
+) -> List[Slice]:
     """Serialize a profiler state in a list of :py:class:`Slice`.
 
+    Region trees of all threads are merged (see
+    :py:meth:`region_profiler.profiler.RegionProfiler.merged_root`).
     Descendants are serialized sorted by their total time in decreasing order.
 
     Args:
         rp(:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+        top_k (:py:class:`int`, optional): serialize at most this number
+            of the largest children of each node
+        min_percent (float): skip regions, whose total time is less than
+            this percentage of the root total time
 
     Returns:
         list of :py:class:`Slice`: serialized nodes of the profiler
     """
+    return get_tree_slice(rp.merged_root(), top_k, min_percent, rp.overhead)
+
+
+def get_tree_slice(
+    root: RegionNode,
+    top_k: Optional[int] = None,
+    min_percent: float = 0.0,
+    overhead: Optional[InstrumentationOverhead] = None,
+) -> List[Slice]:
+    """Serialize a region tree in a list of :py:class:`Slice`.
+
+    Descendants are serialized sorted by their total time in decreasing order.
+    Roots of compact trees are serialized with :py:func:`get_compact_tree_slice`.
+
+    Args:
+        root(:py:class:`region_profiler.node.RegionNode`): root of the tree
+        top_k (:py:class:`int`, optional): serialize at most this number
+            of the largest children of each node
+        min_percent (float): skip regions, whose total time is less than
+            this percentage of the root total time
+
+    Returns:
+        list of :py:class:`Slice`: serialized nodes of the tree
+    """
+    from region_profiler.compact import CompactRootNode
+
+    if isinstance(root, CompactRootNode):
+        return get_compact_tree_slice(root.tree, top_k, min_percent, overhead)
+    slices: List[Slice] = []
+    get_node_slice(slices, root, None, 0, top_k, min_percent, overhead)
+    return slices
+
+
+def get_compact_tree_slice(
+    tree: CompactTree,
+    top_k: Optional[int] = None,
+    min_percent: float = 0.0,
+    overhead: Optional[InstrumentationOverhead] = None,
+) -> List[Slice]:
+    """Serialize a compact region tree in a list of :py:class:`Slice`.
+
+    Produces the same slices as :py:func:`get_node_slice`,
+    but reads the stats columns of the tree in bulk.
+
+    Args:
+        tree(:py:class:`region_profiler.compact.CompactTree`): tree
+        top_k (:py:class:`int`, optional): serialize at most this number
+            of the largest children of each node
+        min_percent (float): skip regions, whose total time is less than
+            this percentage of the root total time
+
+    Returns:
+        list of :py:class:`Slice`: serialized nodes of the tree
+    """
+    size = len(tree)
+    counts = tree.counts[:size]
+    hits = [c + s for c, s in zip(counts, tree.skipped[:size])]
+    totals = [
+        t * h / c if c else 0.0 for t, h, c in zip(tree.totals[:size], hits, counts)
+    ]
+    root_total = tree.root.current_elapsed()
+    hits[0] = 1
+    totals[0] = root_total
+    child_totals = [0.0] * size
+    parent_ids = tree.parent_ids
+    for i in range(1, size):
+        child_totals[parent_ids[i]] += totals[i]
+    min_total = root_total * min_percent / 100.0
+    if overhead is not None:
+        child_hits = [0] * size
+        descendant_hits = [0] * size
+        # children are created after their parents and have greater ids
+        for i in range(size - 1, 0, -1):
+            child_hits[parent_ids[i]] += hits[i]
+            descendant_hits[parent_ids[i]] += hits[i] + descendant_hits[i]
+
     slices: List[Slice] = []
-    get_node_slice(slices, rp.root, None, 0)
+    stack: List[tuple] = [(0, None, 0)]
+    while stack:
+        i, parent_slice, call_depth = stack.pop()
+        if i:
+            count = counts[i]
+            rate = count / hits[i] if hits[i] else 1.0
+            m2 = tree.m2s[i]
+            stddev = (max(m2 / count, 0.0) ** 0.5) if count else 0.0
+            min_time, max_time = tree.mins[i], tree.maxs[i]
+        else:
+            rate, stddev, min_time, max_time = 1.0, 0.0, root_total, root_total
+        node = tree.nodes[i]
+        running_stats = node.running_stats
+        s = Slice(
+            len(slices),
+            tree.names[i],
+            parent_slice,
+            call_depth,
+            hits[i],
+            totals[i],
+            max(totals[i] - child_totals[i], 0),
+            min_time,
+            max_time,
+            running_stats.total if running_stats is not None else None,
+            rate,
+            stddev,
+            None,
+            node.recursion_depths,
+            _estimated_cpu_time(node.cpu_stats, rate),
+        )
+        if i:
+            s.recorded_count = count
+            s.recorded_time = tree.totals[i]
+        if overhead is not None:
+            _set_overhead(
+                s, overhead, child_hits[i], descendant_hits[i], node.descendant_hits
+            )
+        _set_memory(s, node)
+        slices.append(s)
+        child_ids = tree.child_ids.get(i, {})
+        children = [(totals[ch], ch) for ch in list(child_ids.values()) if ch < size]
+        children.sort(key=itemgetter(0), reverse=True)
+        children = _prune_children(children, min_total, top_k)
+        # the largest child is pushed last to be serialized first
+        stack.extend((ch, s, call_depth + 1) for _, ch in reversed(children))
     return slices
 
 
@@ -212,15 +595,27 @@ class ConsoleReporter:
         . . bar() <example2.py:40>  7.866 ms       0.85%      1  7.866 ms  7.866 ms  7.866 ms
     """
 
-    def __init__(self, columns=DEFAULT_CONSOLE_COLUMNS, stream=sys.stderr):
+    def __init__(
+        self,
+        columns=DEFAULT_CONSOLE_COLUMNS,
+        stream=sys.stderr,
+        top_k: Optional[int] = None,
+        min_percent: float = 0.0,
+    ):
         """Initialize the reporter.
 
         Args:
             columns(list of report columns): list of columns that are used in the printout.
             stream (file-like object): stream for output
+            top_k (:py:class:`int`, optional): report at most this number
+                of the largest children of each region
+            min_percent (float): skip regions, whose total time is less than
+                this percentage of the total application time
         """
         self.columns = columns
         self.stream = stream
+        self.top_k = top_k
+        self.min_percent = min_percent
 
     def dump_profiler(self, rp):
         """Dump the profiler state.
@@ -228,8 +623,14 @@ class ConsoleReporter:
         Args:
             rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
         """
-        slices = get_profiler_slice(rp)
+        self.dump_slices(get_profiler_slice(rp, self.top_k, self.min_percent))
 
+    def dump_slices(self, slices: List[Slice]):
+        """Dump serialized region tree.
+
+        Args:
+            slices(list of :py:class:`Slice`): serialized nodes
+        """
         rows = [[col.column_print_name for col in self.columns]]
         col_width = [len(n) for n in rows[0]]
 
@@ -300,15 +701,27 @@ class CsvReporter:
 
     """
 
-    def __init__(self, columns=DEFAULT_CSV_COLUMNS, stream=sys.stderr):
+    def __init__(
+        self,
+        columns=DEFAULT_CSV_COLUMNS,
+        stream=sys.stderr,
+        top_k: Optional[int] = None,
+        min_percent: float = 0.0,
+    ):
         """Initialize the reporter.
 
         Args:
             columns(list of report columns): list of columns that are used in the printout.
             stream (file-like object): stream for output
+            top_k (:py:class:`int`, optional): report at most this number
+                of the largest children of each region
+            min_percent (float): skip regions, whose total time is less than
+                this percentage of the total application time
         """
         self.columns = columns
         self.stream = stream
+        self.top_k = top_k
+        self.min_percent = min_percent
 
     def dump_profiler(self, rp):
         """Dump the profiler state.
@@ -316,8 +729,14 @@ class CsvReporter:
         Args:
             rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
         """
-        slices = get_profiler_slice(rp)
+        self.dump_slices(get_profiler_slice(rp, self.top_k, self.min_percent))
 
+    def dump_slices(self, slices: List[Slice]):
+        """Dump serialized region tree.
+
+        Args:
+            slices(list of :py:class:`Slice`): serialized nodes
+        """
         rows = [[col.column_name for col in self.columns]]
 
         for s in slices:
@@ -350,8 +769,14 @@ class SilentReporter:
         Args:
             rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
         """
-        slices = get_profiler_slice(rp)
+        self.dump_slices(get_profiler_slice(rp))
+
+    def dump_slices(self, slices: List[Slice]):
+        """Dump serialized region tree.
 
+        Args:
+            slices(list of :py:class:`Slice`): serialized nodes
+        """
         rows = [[col.column_name for col in self.columns]]
 
         for s in slices:
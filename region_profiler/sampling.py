@@ -0,0 +1,143 @@
+"""Sampling of region hits.
+
+Regions in tight loops may be hit millions of times, and each hit
+pays for clock reads, stats updates and listener notifications.
+A :py:class:`SamplingPolicy` decides, which hits are recorded.
+Hits, that are not sampled, only increment
+:py:attr:`region_profiler.node.RegionNode.skipped`, and reporters
+scale the recorded totals by the observed sampling rate.
+
+Regions entered inside an unsampled hit are sampled independently,
+so sampling a region does not hide its children.
+"""
+
+import random
+import threading
+import time
+from typing import Callable
+
+from region_profiler.node import RegionNode
+
+
+class SamplingPolicy:
+    """Decide, whether a region hit is recorded.
+
+    Examples::
+
+        SamplingPolicy.every(100)
+        SamplingPolicy.probability(0.01)
+        SamplingPolicy.rate_limited(1000)
+    """
+
+    @classmethod
+    def every(cls, n: int) -> "SamplingPolicy":
+        """Record every Nth hit of each region, starting from the first one."""
+        return EveryNthSampling(n)
+
+    @classmethod
+    def probability(cls, p: float) -> "SamplingPolicy":
+        """Record each hit with probability ``p``."""
+        return RandomSampling(p)
+
+    @classmethod
+    def rate_limited(cls, max_per_second: float) -> "SamplingPolicy":
+        """Record at most ``max_per_second`` hits per second.
+
+        The budget is shared by all regions, that use this policy.
+        """
+        return RateLimitedSampling(max_per_second)
+
+    def should_record(self, node: RegionNode) -> bool:
+        """Check if the current hit of ``node`` should be recorded."""
+        raise NotImplementedError
+
+
+class EveryNthSampling(SamplingPolicy):
+    """Record every Nth hit of each region.
+
+    Attributes:
+        n (int): sampling period
+    """
+
+    def __init__(self, n: int):
+        """
+        Args:
+            n (int): sampling period
+        """
+        if n < 1:
+            raise ValueError("Sampling period must be positive")
+        self.n = n
+
+    def should_record(self, node: RegionNode) -> bool:
+        return (node.stats.count + node.skipped) % self.n == 0
+
+    def __repr__(self):
+        return "SamplingPolicy.every({})".format(self.n)
+
+
+class RandomSampling(SamplingPolicy):
+    """Record each hit with the given probability.
+
+    Attributes:
+        p (float): probability of recording a hit
+    """
+
+    def __init__(self, p: float, random_fn: Callable[[], float] = random.random):
+        """
+        Args:
+            p (float): probability of recording a hit
+            random_fn (callable): source of uniform random numbers in [0, 1)
+        """
+        if not 0 < p <= 1:
+            raise ValueError("Sampling probability must be in (0, 1]")
+        self.p = p
+        self.random_fn = random_fn
+
+    def should_record(self, node: RegionNode) -> bool:
+        return self.random_fn() < self.p
+
+    def __repr__(self):
+        return "SamplingPolicy.probability({})".format(self.p)
+
+
+class RateLimitedSampling(SamplingPolicy):
+    """Record at most the given number of hits per second.
+
+    Hits are recorded while the budget of the current one-second window
+    lasts. The budget is shared between threads without locking,
+    so the limit is approximate.
+
+    Attributes:
+        max_per_second (float): max number of recorded hits per second
+    """
+
+    def __init__(
+        self, max_per_second: float, clock: Callable[[], float] = time.perf_counter
+    ):
+        """
+        Args:
+            max_per_second (float): max number of recorded hits per second
+            clock (callable): clock, used for tracking windows
+        """
+        if max_per_second <= 0:
+            raise ValueError("Sampling rate limit must be positive")
+        self.max_per_second = max_per_second
+        self.clock = clock
+        self._window_start = clock()
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def should_record(self, node: RegionNode) -> bool:
+        now = self.clock()
+        if now - self._window_start >= 1:
+            with self._lock:
+                if now - self._window_start >= 1:
+                    self._window_start = now
+                    self._recorded = 0
+        if self._recorded < self.max_per_second:
+            self._recorded += 1
+            return True
+        return False
+
+    def __repr__(self):
+        return "SamplingPolicy.rate_limited({})".format(self.max_per_second)
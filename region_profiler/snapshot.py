@@ -0,0 +1,274 @@
+"""Save, load and merge region trees.
+
+A snapshot is a compact binary serialization of
+a :py:class:`region_profiler.node.RegionNode` tree with its stats.
+Snapshots of different processes or runs (e.g. ranks of a distributed job)
+can be merged and reported with the regular reporters::
+
+    rp.install(reporter=SnapshotReporter('rank{}.rps'.format(rank)))
+
+    $ python -m region_profiler merge rank*.rps
+
+Format: ``b'RPSNAP'`` magic and a version, followed by nodes in depth-first
+order. Each node is stored as its UTF-8 name, stats, flags, number of children,
+optional running time stats, optional number of unsampled hits,
+optional latency histogram, optional CPU time stats, optional
+memory stats, optional hit counts by recursion depth and optional number
+of region entries inside the node. All numbers are little-endian.
+Version 1 snapshots store only stats without variance and running time stats.
+"""
+
+import struct
+from typing import BinaryIO, List, Optional, Sequence
+
+from region_profiler.histogram import HistSeqStats, LogHistogram
+from region_profiler.node import MEMORY_STATS, RegionNode, merge_nodes
+from region_profiler.utils import SeqStats
+
+MAGIC = b"RPSNAP"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+_HEADER = struct.Struct("<6sH")
+_NAME_LEN = struct.Struct("<I")
+_NODE_V1 = struct.Struct("<qdddBI")
+_NODE = struct.Struct("<qddddHI")
+_STATS = struct.Struct("<qddd")
+_COUNT = struct.Struct("<q")
+_HISTOGRAM = struct.Struct("<dddI")
+_BUCKET = struct.Struct("<iq")
+_DEPTHS = struct.Struct("<I")
+_DEPTH = struct.Struct("<Iq")
+
+_HAS_RUNNING_STATS = 1
+_HAS_SKIPPED = 2
+_HAS_HISTOGRAM = 4
+_HAS_CPU_STATS = 8
+# flags of memory stats, in the order of MEMORY_STATS
+_HAS_MEMORY_STATS = (16, 32, 64)
+_HAS_RECURSION_DEPTHS = 128
+_HAS_DESCENDANT_HITS = 256
+
+
+def write(f: BinaryIO, root: RegionNode, root_name: Optional[str] = None):
+    """Write a region tree to a binary stream.
+
+    Args:
+        f (binary file-like object): output stream
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree
+        root_name (:py:class:`str`, optional): override name of the root
+    """
+    f.write(_HEADER.pack(MAGIC, VERSION))
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        children = list(node.children.values())
+        name = node.name if node is not root or root_name is None else root_name
+        encoded_name = name.encode()
+        stats = node.stats
+        running = node.running_stats
+        flags = 0
+        if running is not None:
+            flags |= _HAS_RUNNING_STATS
+        if node.skipped:
+            flags |= _HAS_SKIPPED
+        histogram = getattr(stats, "histogram", None)
+        if histogram is not None:
+            flags |= _HAS_HISTOGRAM
+        cpu = node.cpu_stats
+        if cpu is not None:
+            flags |= _HAS_CPU_STATS
+        memory = [getattr(node, attr) for attr in MEMORY_STATS]
+        for flag, mem in zip(_HAS_MEMORY_STATS, memory):
+            if mem is not None:
+                flags |= flag
+        depths = node.recursion_depths
+        if depths:
+            flags |= _HAS_RECURSION_DEPTHS
+        if node.descendant_hits:
+            flags |= _HAS_DESCENDANT_HITS
+        f.write(_NAME_LEN.pack(len(encoded_name)))
+        f.write(encoded_name)
+        f.write(
+            _NODE.pack(
+                stats.count,
+                stats.total,
+                stats.min,
+                stats.max,
+                getattr(stats, "m2", 0.0),
+                flags,
+                len(children),
+            )
+        )
+        if running is not None:
+            f.write(_STATS.pack(running.count, running.total, running.min, running.max))
+        if node.skipped:
+            f.write(_COUNT.pack(node.skipped))
+        if histogram is not None:
+            f.write(
+                _HISTOGRAM.pack(
+                    histogram.precision,
+                    histogram.min_value,
+                    histogram.max_value,
+                    len(histogram.buckets),
+                )
+            )
+            for bucket in histogram.buckets.items():
+                f.write(_BUCKET.pack(*bucket))
+        if cpu is not None:
+            f.write(_STATS.pack(cpu.count, cpu.total, cpu.min, cpu.max))
+        for mem in memory:
+            if mem is not None:
+                f.write(_STATS.pack(mem.count, mem.total, mem.min, mem.max))
+        if depths:
+            f.write(_DEPTHS.pack(len(depths)))
+            for depth in sorted(depths.items()):
+                f.write(_DEPTH.pack(*depth))
+        if node.descendant_hits:
+            f.write(_COUNT.pack(node.descendant_hits))
+        stack.extend(reversed(children))
+
+
+def read(f: BinaryIO) -> RegionNode:
+    """Read a region tree from a binary stream.
+
+    Args:
+        f (binary file-like object): input stream
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: root of the tree
+    """
+    magic, version = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a region profiler snapshot")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError("Unsupported snapshot version: {}".format(version))
+
+    root: Optional[RegionNode] = None
+    stack: List[List] = []  # [node, number of children left to read]
+    while root is None or stack:
+        (name_len,) = _NAME_LEN.unpack(_read_exact(f, _NAME_LEN.size))
+        node = RegionNode(_read_exact(f, name_len).decode())
+        if version >= 2:
+            count, total, min, max, m2, flags, child_count = _NODE.unpack(
+                _read_exact(f, _NODE.size)
+            )
+        else:
+            m2 = 0.0
+            count, total, min, max, flags, child_count = _NODE_V1.unpack(
+                _read_exact(f, _NODE_V1.size)
+            )
+        if flags & _HAS_RUNNING_STATS:
+            node.running_stats = SeqStats(*_STATS.unpack(_read_exact(f, _STATS.size)))
+        if flags & _HAS_SKIPPED:
+            (node.skipped,) = _COUNT.unpack(_read_exact(f, _COUNT.size))
+        if flags & _HAS_HISTOGRAM:
+            precision, min_value, max_value, n = _HISTOGRAM.unpack(
+                _read_exact(f, _HISTOGRAM.size)
+            )
+            histogram = LogHistogram(precision, min_value, max_value)
+            for _ in range(n):
+                i, bucket_count = _BUCKET.unpack(_read_exact(f, _BUCKET.size))
+                histogram.buckets[i] = bucket_count
+                histogram.count += bucket_count
+            node.stats_cls = HistSeqStats
+            node.stats = HistSeqStats(count, total, min, max, m2, histogram)
+        else:
+            node.stats = SeqStats(count, total, min, max, m2)
+        if flags & _HAS_CPU_STATS:
+            node.cpu_stats = SeqStats(*_STATS.unpack(_read_exact(f, _STATS.size)))
+        for flag, attr in zip(_HAS_MEMORY_STATS, MEMORY_STATS):
+            if flags & flag:
+                stats = SeqStats(*_STATS.unpack(_read_exact(f, _STATS.size)))
+                setattr(node, attr, stats)
+        if flags & _HAS_RECURSION_DEPTHS:
+            (n,) = _DEPTHS.unpack(_read_exact(f, _DEPTHS.size))
+            node.recursion_depths = {}
+            for _ in range(n):
+                depth, depth_count = _DEPTH.unpack(_read_exact(f, _DEPTH.size))
+                node.recursion_depths[depth] = depth_count
+        if flags & _HAS_DESCENDANT_HITS:
+            (node.descendant_hits,) = _COUNT.unpack(_read_exact(f, _COUNT.size))
+
+        if root is None:
+            root = node
+        else:
+            stack[-1][0].children[node.name] = node
+            stack[-1][1] -= 1
+        if child_count:
+            stack.append([node, child_count])
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+    return root
+
+
+def save(root: RegionNode, filename: str, root_name: Optional[str] = None):
+    """Save a region tree to a file.
+
+    Args:
+        root (:py:class:`region_profiler.node.RegionNode`): root of the tree,
+            e.g. :py:meth:`region_profiler.profiler.RegionProfiler.merged_root`
+        filename (str): output file
+        root_name (:py:class:`str`, optional): override name of the root
+    """
+    with open(filename, "wb") as f:
+        write(f, root, root_name)
+
+
+def load(filename: str) -> RegionNode:
+    """Load a region tree from a file.
+
+    Args:
+        filename (str): snapshot file
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: root of the tree
+    """
+    with open(filename, "rb") as f:
+        return read(f)
+
+
+def merge(roots: Sequence[RegionNode]) -> RegionNode:
+    """Merge region trees.
+
+    Counts and totals are summed, min and max are combined.
+    Merge is associative, so snapshots can be merged in any grouping.
+
+    Args:
+        roots (list of :py:class:`region_profiler.node.RegionNode`): trees to be merged
+
+    Returns:
+        :py:class:`region_profiler.node.RegionNode`: root of the merged tree
+    """
+    return merge_nodes(roots)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated region profiler snapshot")
+    return data
+
+
+class SnapshotReporter:
+    """Save profiler state to a snapshot file.
+
+    The snapshot may be loaded with :py:func:`load`
+    or reported with ``python -m region_profiler merge``.
+    """
+
+    def __init__(self, filename: str):
+        """Initialize the reporter.
+
+        Args:
+            filename (str): output snapshot file
+        """
+        self.filename = filename
+
+    def dump_profiler(self, rp):
+        """Dump the profiler state.
+
+        Args:
+            rp(:py:class:`region_profiler.profiler.RegionProfiler`): region profiler
+        """
+        save(rp.merged_root(), self.filename)
@@ -0,0 +1,139 @@
+"""Device synchronization around profiled regions.
+
+Asynchronous devices (e.g. CUDA) return control to Python before
+the submitted work completes, so region timings only reflect the
+device time if the device is synchronized around the region.
+Synchronization stalls the device pipeline, therefore it is opt-in
+and controlled by a :py:class:`SyncPolicy`.
+"""
+
+import warnings
+from typing import Callable, Iterable, Optional
+
+from region_profiler.node import RegionNode
+
+
+class SyncPolicy:
+    """Decide on which region events the device is synchronized.
+
+    Examples::
+
+        SyncPolicy.never()
+        SyncPolicy.on_exit()
+        SyncPolicy.named('forward', 'backward')
+        SyncPolicy.sampled(100)
+
+    Attributes:
+        on_enter (bool): synchronize before a region is entered
+        on_exit (bool): synchronize before a region is exited
+        regions (:py:class:`frozenset`, optional): if set, synchronize only
+            regions with these names
+        every (int): synchronize only every Nth hit of a region
+    """
+
+    def __init__(
+        self,
+        on_enter: bool = True,
+        on_exit: bool = True,
+        regions: Optional[Iterable[str]] = None,
+        every: int = 1,
+    ):
+        """
+        Args:
+            on_enter (bool): synchronize before a region is entered
+            on_exit (bool): synchronize before a region is exited
+            regions (iterable of :py:class:`str`, optional): if set,
+                synchronize only regions with these names
+            every (int): synchronize only every Nth hit of a region
+        """
+        if every < 1:
+            raise ValueError("SyncPolicy.every must be positive")
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.regions = frozenset(regions) if regions is not None else None
+        self.every = every
+
+    @classmethod
+    def never(cls) -> "SyncPolicy":
+        """Never synchronize."""
+        return cls(on_enter=False, on_exit=False)
+
+    @classmethod
+    def always(cls) -> "SyncPolicy":
+        """Synchronize on every region enter and exit."""
+        return cls()
+
+    @classmethod
+    def on_exit_only(cls) -> "SyncPolicy":
+        """Synchronize before region exit only.
+
+        Device work queued before the region was entered
+        is attributed to the region.
+        """
+        return cls(on_enter=False)
+
+    @classmethod
+    def named(cls, *names: str) -> "SyncPolicy":
+        """Synchronize only regions with the given names."""
+        return cls(regions=names)
+
+    @classmethod
+    def sampled(cls, every: int) -> "SyncPolicy":
+        """Synchronize every Nth hit of each region."""
+        return cls(every=every)
+
+    def should_sync_enter(self, node: RegionNode) -> bool:
+        """Check if the device must be synchronized before entering ``node``."""
+        return self.on_enter and self._matches(node)
+
+    def should_sync_exit(self, node: RegionNode) -> bool:
+        """Check if the device must be synchronized before exiting ``node``."""
+        return self.on_exit and self._matches(node)
+
+    def _matches(self, node: RegionNode) -> bool:
+        if self.regions is not None and node.name not in self.regions:
+            return False
+        # stats.count is updated after exit, so enter and exit
+        # of the same hit see the same value
+        return self.every == 1 or node.stats.count % self.every == 0
+
+    def __repr__(self):
+        return "SyncPolicy(on_enter={}, on_exit={}, regions={}, every={})".format(
+            self.on_enter, self.on_exit, self.regions, self.every
+        )
+
+
+class CudaSynchronizer:
+    """Callable that synchronizes Torch CUDA device.
+
+    ``torch`` is resolved once on construction.
+    The first failure (e.g. torch is missing or the process is
+    a forked worker without CUDA context) issues a warning
+    and disables further synchronization.
+    """
+
+    def __init__(self):
+        self.failed = False
+        self._synchronize: Optional[Callable[[], None]] = None
+        try:
+            import torch
+
+            self._synchronize = torch.cuda.synchronize
+        except Exception as e:
+            self._fail(e)
+
+    def __call__(self):
+        if self.failed:
+            return
+        try:
+            self._synchronize()  # type: ignore[misc]
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, e: Exception):
+        self.failed = True
+        warnings.warn(
+            "RegionProfiler: could not synchronize Torch CUDA, "
+            "synchronization is disabled: {}".format(e),
+            stacklevel=3,
+        )
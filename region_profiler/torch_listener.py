@@ -0,0 +1,55 @@
+import threading
+from typing import Any, Dict, List
+
+import torch.autograd.profiler as torch_profiler
+
+from region_profiler.listener import RegionProfilerListener
+
+
+class TorchAnnotationListener(RegionProfilerListener):
+    """Annotate regions for the torch autograd profiler.
+
+    Each region is wrapped in ``torch.autograd.profiler.record_function``
+    named ``region_profiler::<region name>``, so regions show up in
+    torch profiler traces (e.g. `torchprof <https://github.com/indigoviolet/torchprof>`_).
+
+    This module imports ``torch`` and is imported only
+    when the annotations are enabled.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self.record_names: Dict[str, str] = {}
+
+    @property
+    def records(self) -> List[Any]:
+        """Stack of open annotations of the current thread."""
+        try:
+            return self._local.records
+        except AttributeError:
+            self._local.records = []
+            return self._local.records
+
+    def finalize(self):
+        pass
+
+    def region_entered(self, profiler, region):
+        if region is profiler.root:
+            return
+        try:
+            record_name = self.record_names[region.name]
+        except KeyError:
+            record_name = self.record_names[region.name] = "region_profiler::{}".format(
+                region.name
+            )
+        record = torch_profiler.record_function(record_name)
+        record.__enter__()
+        self.records.append(record)
+
+    def region_exited(self, profiler, region):
+        if region is profiler.root:
+            return
+        self.records.pop().__exit__(None, None, None)
+
+    def region_canceled(self, profiler, region):
+        pass
@@ -1,8 +1,11 @@
-import inspect
+import functools
+import math
 import os
+import sys
 import time
 from collections import namedtuple
-from typing import Any, Callable, Protocol, TypeVar
+from types import CodeType
+from typing import Any, Callable, Dict, Protocol, Tuple, TypeVar
 
 F = TypeVar("F", bound=Callable[..., Any])
 
@@ -13,9 +16,16 @@ class SeqStatsProtocol(Protocol):
     min: float
     max: float
 
+    @property
+    def stddev(self) -> float:
+        ...
+
     def add(self, x: float):
         ...
 
+    def merge(self, other: "SeqStatsProtocol"):
+        ...
+
 
 class SeqStats(SeqStatsProtocol):
     """Helper class for calculating online stats of a number sequence.
@@ -26,18 +36,27 @@ class SeqStats(SeqStatsProtocol):
       - average
       - min value
       - max value
+      - standard deviation
 
     :py:class:`SeqStats` does not store the sequence itself,
-    statistics are calculated online.
+    statistics are calculated online. The variance is tracked
+    with Welford's algorithm as a sum of squared deviations from the mean
+    (:py:attr:`m2`).
     """
 
     def __init__(
-        self, count: int = 0, total: float = 0, min: float = 0, max: float = 0
+        self,
+        count: int = 0,
+        total: float = 0,
+        min: float = 0,
+        max: float = 0,
+        m2: float = 0.0,
     ):
         self.count = count
         self.total = total
         self.min = min
         self.max = max
+        self.m2 = m2
 
     def add(self, x: float):
         """Update statistics with the next value of a sequence.
@@ -45,24 +64,63 @@ class SeqStats(SeqStatsProtocol):
         Args:
             x (number): next value in the sequence
         """
+        delta = x - self.total / self.count if self.count else 0.0
         self.count += 1
         self.total += x
+        self.m2 += delta * (x - self.total / self.count)
         self.max = x if self.count == 1 else max(self.max, x)
         self.min = x if self.count == 1 else min(self.min, x)
 
+    def merge(self, other: SeqStatsProtocol):
+        """Update statistics with statistics of another sequence.
+
+        The result is the same as if all values of ``other``
+        were added to this sequence.
+
+        Args:
+            other (:py:class:`SeqStats`): statistics to be merged
+        """
+        if other.count == 0:
+            return
+        other_m2 = getattr(other, "m2", 0.0)
+        if self.count == 0:
+            self.min = other.min
+            self.max = other.max
+            self.m2 = other_m2
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            delta = other.total / other.count - self.total / self.count
+            self.m2 += (
+                other_m2
+                + delta * delta * self.count * other.count / (self.count + other.count)
+            )
+        self.count += other.count
+        self.total += other.total
+
     @property
     def avg(self):
         """Calculate sequence average."""
         return 0 if self.count == 0 else self.total / self.count
 
+    @property
+    def variance(self) -> float:
+        """Calculate population variance of the sequence."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Calculate population standard deviation of the sequence."""
+        return math.sqrt(max(self.variance, 0.0))
+
     def __str__(self):
         return "SeqStats{{{}..{}..{}/{}}}".format(
             self.min, self.avg, self.max, self.count
         )
 
     def __repr__(self):
-        return "SeqStats(count={}, total={}, min={}, max={})".format(
-            self.count, self.total, self.min, self.max
+        return "SeqStats(count={}, total={}, min={}, max={}, m2={})".format(
+            self.count, self.total, self.min, self.max, self.m2
         )
 
     def __eq__(self, other):
@@ -93,8 +151,15 @@ class Timer:
 
     The duration can be retrieved using
     :py:meth:`current_elapsed` or :py:meth:`total_elapsed()`.
+
+    Attributes:
+        scale (float): number of seconds in a clock unit.
+            Raw clock values (:py:attr:`clock`) multiplied by the scale
+            are seconds
     """
 
+    scale = 1.0
+
     def __init__(self, clock: Callable[[], float] = default_clock):
         """
         Args:
@@ -180,8 +245,109 @@ class Timer:
         )
 
 
+class NsTimer(Timer):
+    """Timer for integer nanosecond clocks, e.g. :py:func:`time.perf_counter_ns`.
+
+    Timestamps are kept as integers, so durations are computed without
+    floating point precision loss, that grows with the clock value
+    over long runs. Durations and timestamps are returned in seconds.
+    """
+
+    scale = 1e-9
+
+    def __init__(self, clock: Callable[[], int] = time.perf_counter_ns):
+        """
+        Args:
+            clock(function): functor, that returns current clock in nanoseconds
+        """
+        super(NsTimer, self).__init__(clock)  # type: ignore[arg-type]
+
+    @property  # type: ignore[override]
+    def last_event_time(self) -> float:
+        return self._last_event_ns * 1e-9
+
+    @last_event_time.setter
+    def last_event_time(self, value):
+        self._last_event_ns = value
+
+    def stop(self):
+        self._last_event_ns = self.clock()
+        if self._running:
+            self._end_ts = self._last_event_ns
+            self._running = False
+
+    def begin_ts(self) -> float:
+        return self._begin_ts * 1e-9
+
+    def end_ts(self) -> float:
+        return self._end_ts * 1e-9
+
+    def elapsed(self) -> float:
+        return (self._end_ts - self._begin_ts) * 1e-9 if not self._running else 0
+
+    def current_elapsed(self) -> float:
+        end_ts = self._end_ts if not self._running else self.clock()
+        return (end_ts - self._begin_ts) * 1e-9
+
+
+CLOCKS: Dict[str, Callable[[], Any]] = {
+    "perf_counter": time.perf_counter,
+    "perf_counter_ns": time.perf_counter_ns,
+    "monotonic": time.monotonic,
+    "monotonic_ns": time.monotonic_ns,
+    "process_time": time.process_time,
+    "process_time_ns": time.process_time_ns,
+    "thread_time": time.thread_time,
+    "thread_time_ns": time.thread_time_ns,
+}
+"""Clocks, that may be selected by name. Clocks with ``_ns`` suffix
+return integer nanoseconds, others return fractional seconds.
+``process_time`` and ``thread_time`` clocks measure CPU time.
+"""
+
+
+def get_clock(name: str) -> Tuple[Callable[[], Any], float]:
+    """Return a clock by name.
+
+    Args:
+        name (str): clock name, one of :py:data:`CLOCKS`
+
+    Returns:
+        tuple: clock function and the number of seconds in a clock unit
+    """
+    try:
+        clock = CLOCKS[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown clock {!r}, expected one of: {}".format(name, ", ".join(CLOCKS))
+        ) from None
+    return clock, 1e-9 if name.endswith("_ns") else 1.0
+
+
+def make_timer_cls(clock: str) -> Callable[[], Timer]:
+    """Return a timer constructor for a clock selected by name.
+
+    Examples::
+
+        rp = RegionProfiler(timer_cls=make_timer_cls('perf_counter_ns'))
+
+    Args:
+        clock (str): clock name, one of :py:data:`CLOCKS`
+
+    Returns:
+        callable: function, that creates :py:class:`Timer`
+            or :py:class:`NsTimer` instances
+    """
+    clock_fn, scale = get_clock(clock)
+    timer_cls = NsTimer if scale != 1.0 else Timer
+    return functools.partial(timer_cls, clock_fn)
+
+
 CallerInfo = namedtuple("CallerInfo", ["file", "line", "name"])
 
+_callsite_names: Dict[Tuple[CodeType, int], str] = {}
+"""Cache of callsite names by code object and bytecode offset of the call."""
+
 
 def get_caller_info(stack_depth=1):
     """
@@ -200,8 +366,8 @@ def get_caller_info(stack_depth=1):
         CallerInfo:  information about the caller
 
     """
-    frame = inspect.stack()[stack_depth + 1]
-    info = CallerInfo(frame[1], frame[2], frame[3])
+    frame = sys._getframe(stack_depth + 1)
+    info = CallerInfo(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
     del frame  # prevents cycle reference
     return info
 
@@ -210,6 +376,10 @@ def get_name_by_callsite(stack_depth=1):
     """Get string description of the call site
     of the caller.
 
+    Names are cached by the code object and the bytecode offset
+    of the call site, so only the first call from each site
+    formats the name. Source files are never read.
+
     Args:
         stack_depth: select caller frame to be inspected.
 
@@ -221,13 +391,48 @@ def get_name_by_callsite(stack_depth=1):
     Returns:
         str: string in the following format: ``'function<filename:line>'``
     """
-    info = get_caller_info(stack_depth + 1)
-    f = os.path.basename(info.file)
-    return "{}() <{}:{}>".format(info.name, f, info.line)
+    frame = sys._getframe(stack_depth + 1)
+    key = (frame.f_code, frame.f_lasti)
+    try:
+        return _callsite_names[key]
+    except KeyError:
+        code = frame.f_code
+        name = "{}() <{}:{}>".format(
+            code.co_name, os.path.basename(code.co_filename), frame.f_lineno
+        )
+        _callsite_names[key] = name
+        return name
+    finally:
+        del frame  # prevents cycle reference
+
+
+_CO_COROUTINE = 0x80
+"""Code flag of ``async def`` functions (``inspect.CO_COROUTINE``)."""
+
+
+def is_coroutine_function(fn: Callable[..., Any]) -> bool:
+    """Check if ``fn`` is an ``async def`` function.
+
+    Replaces :py:func:`inspect.iscoroutinefunction`,
+    since importing :py:mod:`inspect` is expensive.
+
+    Args:
+        fn (Callable): function, method or :py:func:`functools.partial`
+
+    Returns:
+        bool: True if calling ``fn`` returns a coroutine
+    """
+    while isinstance(fn, functools.partial):
+        fn = fn.func
+    code = getattr(getattr(fn, "__func__", fn), "__code__", None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
 
 
 class NullContext:
-    """Empty context manager."""
+    """Empty context manager.
+
+    Supports both regular and asynchronous context manager interfaces.
+    """
 
     def __enter__(self):
         pass
@@ -235,6 +440,12 @@ class NullContext:
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
 
+    async def __aenter__(self):
+        pass
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
 
 def null_decorator() -> Callable[[F], F]:
     """Empty decorator."""
@@ -268,3 +479,33 @@ def pretty_print_time(sec):
         sec *= 1000
 
     return "{} ns".format(int(sec))
+
+
+def pretty_print_bytes(size):
+    """Get memory size as a human-readable string.
+
+    Examples:
+
+        - 512 => '512 B'
+        - 1536 => '1.500 KiB'
+        - -3145728 => '-3.000 MiB'
+
+    Args:
+        size (number): size in bytes
+
+    Returns:
+        str: human-readable string representation as shown above.
+    """
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    if size < 1024:
+        return "{}{:.0f} B".format(sign, size)
+    for unit in ("KiB", "MiB", "GiB"):
+        size /= 1024
+        if size < 1024 or unit == "GiB":
+            break
+    if size >= 100:
+        return "{}{:.1f} {}".format(sign, size, unit)
+    if size >= 10:
+        return "{}{:.2f} {}".format(sign, size, unit)
+    return "{}{:.3f} {}".format(sign, size, unit)
@@ -0,0 +1,141 @@
+"""Collect region trees from forked worker processes.
+
+Region trees of worker processes (e.g. ``torch.utils.data.DataLoader``
+workers) are lost, because the report is dumped only in the main process.
+:py:class:`WorkerCollector` resets the inherited profiler in each worker,
+started by :py:mod:`multiprocessing` with ``fork`` start method,
+and saves the worker tree snapshot (see :py:mod:`region_profiler.snapshot`)
+on exit. The main process loads these trees
+when a report is generated and shows them as ``<worker ...>`` subtrees
+of the root, one per worker.
+"""
+
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Dict, List, Optional
+
+from region_profiler import snapshot
+from region_profiler.node import RegionNode, merge_nodes
+
+WORKER_FILE_SUFFIX = ".rpworker"
+
+
+class WorkerCollector:
+    """Ship region trees of worker processes to the main process.
+
+    The collector is attached to a profiler in the main process.
+    In each worker process started by :py:mod:`multiprocessing`
+    using ``fork``, the inherited profiler is reset (its tree, listeners
+    and device synchronization are dropped, since they belong to the
+    main process) and the worker tree is saved on exit
+    to a per-process file in a shared directory. File names contain
+    the process id and a random token, so that a worker, that reuses
+    the pid of an exited one, doesn't overwrite its tree.
+
+    Attributes:
+        profiler (:py:class:`region_profiler.profiler.RegionProfiler`):
+            profiler, that is shared with worker processes
+        directory (str): directory, where worker trees are saved
+        worker_roots (dict): loaded trees of worker processes by file name.
+            Files are loaded again only when they are modified
+    """
+
+    def __init__(self, profiler, directory: Optional[str] = None):
+        """
+        Args:
+            profiler (:py:class:`region_profiler.profiler.RegionProfiler`): profiler
+            directory (:py:class:`str`, optional): directory for worker trees.
+                Default: new temporary directory, in shared memory if available
+        """
+        self.profiler = profiler
+        self.owns_directory = directory is None
+        if directory is None:
+            shm = "/dev/shm"
+            directory = tempfile.mkdtemp(
+                prefix="region_profiler_", dir=shm if os.path.isdir(shm) else None
+            )
+        self.directory = directory
+        self.main_pid = os.getpid()
+        self.worker_label: Optional[str] = None
+        self.worker_id: Optional[str] = None
+        self.worker_roots: Dict[str, RegionNode] = {}
+        self._mtimes: Dict[str, int] = {}
+        profiler.worker_collector = self
+        multiprocessing.util.register_after_fork(self, WorkerCollector._after_fork)
+
+    def is_worker(self) -> bool:
+        """Check if the current process is a worker process."""
+        return os.getpid() != self.main_pid
+
+    def set_worker_label(self, label: str):
+        """Set a label of the current worker.
+
+        Trees of workers with the same label are merged in the report.
+        By default, the label is the worker process id.
+
+        Args:
+            label (str): worker label, e.g. ``DataLoader`` worker id
+        """
+        self.worker_label = label
+
+    def _after_fork(self):
+        self.worker_label = None
+        self.worker_id = "{}-{}".format(os.getpid(), uuid.uuid4().hex)
+        self.worker_roots = {}
+        self._mtimes = {}
+        self.profiler._reset_worker()
+        multiprocessing.util.Finalize(self, self.flush, exitpriority=100)
+
+    def flush(self):
+        """Save the tree of the current worker process.
+
+        This is done automatically on worker exit, but may be also
+        called periodically to make partial results available.
+        Does nothing in the main process.
+        """
+        if not self.is_worker():
+            return
+        label = self.worker_label or "pid {}".format(os.getpid())
+        filename = "{}{}".format(self.worker_id, WORKER_FILE_SUFFIX)
+        path = os.path.join(self.directory, filename)
+        tmp_path = path + ".tmp"
+        snapshot.save(
+            self.profiler.merged_root(), tmp_path, root_name="<worker {}>".format(label)
+        )
+        os.replace(tmp_path, path)
+
+    def collect(self) -> Dict[str, RegionNode]:
+        """Load trees saved by worker processes.
+
+        Returns:
+            dict: worker trees by worker label.
+                Each tree is rooted at a node named ``<worker label>``
+                with worker lifetime as its stats
+        """
+        if not self.is_worker() and os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(WORKER_FILE_SUFFIX):
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                if self._mtimes.get(filename) == mtime:
+                    continue
+                self.worker_roots[filename] = snapshot.load(path)
+                self._mtimes[filename] = mtime
+
+        groups: Dict[str, List[RegionNode]] = {}
+        for root in self.worker_roots.values():
+            groups.setdefault(root.name, []).append(root)
+        return {name: merge_nodes(group) for name, group in groups.items()}
+
+    def cleanup(self):
+        """Remove the worker trees directory, if it was created by the collector."""
+        if self.owns_directory and not self.is_worker():
+            shutil.rmtree(self.directory, ignore_errors=True)
+
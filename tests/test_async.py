@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.reporters import Slice
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_concurrent_async_regions(profiler_cls):
+    """Test that asynchronous regions of concurrent tasks
+    do not interfere with each other.
+    """
+    rp = profiler_cls()
+
+    async def handler(i):
+        async with rp.aregion('request'):
+            await asyncio.sleep(0.01 * i)
+            with rp.region('parse'):
+                pass
+            async with rp.aregion('db'):
+                await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[handler(i) for i in range(3)])
+
+    asyncio.run(main())
+
+    assert rp.current_node is rp.root
+    assert set(rp.root.children) == {'request'}
+    request = rp.root.children['request']
+    assert request.stats.count == 3
+    assert set(request.children) == {'parse', 'db'}
+    assert request.children['parse'].stats.count == 3
+    assert request.children['db'].stats.count == 3
+    assert request.children['db'].stats.min >= 0.01
+    assert request.stats.max >= 0.03
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_coroutine_running_time(profiler_cls):
+    """Test that decorated coroutines account running time
+    separately from the time they were suspended.
+    """
+    rp = profiler_cls()
+
+    @rp.func()
+    async def io_bound():
+        await asyncio.sleep(0.05)
+
+    @rp.func()
+    async def cpu_bound():
+        time.sleep(0.05)
+        await asyncio.sleep(0)
+        return 42
+
+    async def main():
+        return await asyncio.gather(io_bound(), cpu_bound())
+
+    assert asyncio.run(main()) == [None, 42]
+
+    io = rp.root.children['io_bound()']
+    cpu = rp.root.children['cpu_bound()']
+    assert io.stats.total >= 0.05
+    assert io.running_stats.total < 0.01
+    assert cpu.running_stats.total >= 0.05
+    assert cpu.running_stats.total <= cpu.stats.total
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_coroutine_exception(profiler_cls):
+    """Test that exceptions propagate through decorated coroutines.
+    """
+    rp = profiler_cls()
+
+    @rp.func()
+    async def foo():
+        await asyncio.sleep(0)
+        raise RuntimeError('Dummy')
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await foo()
+
+    asyncio.run(main())
+    assert rp.root.children['foo()'].stats.count == 1
+    assert rp.root.children['foo()'].running_stats.count == 1
+    assert rp.current_node is rp.root
+
+
+def test_running_columns():
+    """Test running time column providers.
+    """
+    slices = [Slice(0, '<root>', None, 0, 1, 10, 1, 10, 10),
+              Slice(1, 'a', None, 1, 2, 4, 4, 1, 3, running_time=1)]
+    assert cols.running(slices[0], slices) == ''
+    assert cols.running_us(slices[0], slices) == ''
+    assert cols.running_percents(slices[0], slices) == ''
+    assert cols.running(slices[1], slices) == '1.000 s'
+    assert cols.running_us(slices[1], slices) == '1000000'
+    assert cols.running_percents(slices[1], slices) == '25.00%'
@@ -1,8 +1,11 @@
+import gzip
 import json
 import os
 import threading
 from unittest import mock
 
+import pytest
+
 from region_profiler import RegionProfiler
 from region_profiler.chrome_trace_listener import ChromeTraceListener
 from region_profiler.utils import Timer
@@ -141,3 +144,123 @@ def test_chrome_trace_parent_node_canceled(tmpdir, capsys):
     with trace_file.open() as f:
         trace = json.load(f)
     assert trace[2:] == expected
+
+
+def test_chrome_trace_batches_and_threads(tmpdir, capsys):
+    """Test that events of several threads are written in batches
+    and each thread produces balanced records with its own tid.
+    """
+    trace_file = tmpdir.join('trace.json')
+    rp = RegionProfiler(listeners=[ChromeTraceListener(str(trace_file), batch_size=3,
+                                                       max_pending_batches=1)])
+
+    def worker():
+        for _ in range(10):
+            with rp.region('a'):
+                with rp.region('b "quoted"'):
+                    pass
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rp.finalize()
+
+    with trace_file.open() as f:
+        trace = json.load(f)
+
+    tids = {t.ident for t in threads}
+    events = [e for e in trace[2:] if e['tid'] in tids]
+    assert len(events) == 3 * 10 * 4
+    for tid in tids:
+        thread_events = [(e['name'], e['ph']) for e in events if e['tid'] == tid]
+        assert thread_events == [('a', 'B'), ('b "quoted"', 'B'),
+                                 ('b "quoted"', 'E'), ('a', 'E')] * 10
+    assert all(e['pid'] == os.getpid() for e in events)
+
+
+def test_chrome_trace_complete_events(tmpdir, capsys):
+    """Test that complete events have the same timing as begin/end pairs
+    and canceled regions are skipped.
+    """
+    trace_file = tmpdir.join('trace.json')
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 100, 1))
+    rp = RegionProfiler(listeners=[ChromeTraceListener(str(trace_file),
+                                                       complete_events=True)],
+                        timer_cls=lambda: Timer(mock_clock))
+
+    with rp.region('a'):
+        for _ in rp.iter_proxy([1, 2], 'b'):
+            pass
+
+    rp.finalize()
+
+    pid = os.getpid()
+    tid = threading.get_ident()
+    expected = [
+        {'name': 'b', 'ph': 'X', 'ts': 2000000, 'dur': 1000000, 'pid': pid, 'tid': tid},
+        {'name': 'b', 'ph': 'X', 'ts': 4000000, 'dur': 1000000, 'pid': pid, 'tid': tid},
+        {'name': 'a', 'ph': 'X', 'ts': 1000000, 'dur': 8000000, 'pid': pid, 'tid': tid},
+        {'name': rp.ROOT_NODE_NAME, 'ph': 'X', 'ts': 0, 'dur': 10000000,
+         'pid': pid, 'tid': tid},
+    ]
+
+    with trace_file.open() as f:
+        trace = json.load(f)
+    assert trace[2:] == expected
+
+
+@pytest.mark.parametrize('asglobal,collapse_recursion', [(True, False), (False, True)])
+def test_chrome_trace_complete_events_of_recursion(tmpdir, capsys, asglobal,
+                                                   collapse_recursion):
+    """Test that a recursive hit is written as a single complete event.
+    """
+    trace_file = tmpdir.join('trace.json')
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 100, 1))
+    rp = RegionProfiler(listeners=[ChromeTraceListener(str(trace_file),
+                                                       complete_events=True)],
+                        timer_cls=lambda: Timer(mock_clock),
+                        collapse_recursion=collapse_recursion)
+
+    @rp.func(asglobal=asglobal)
+    def rec(n):
+        if n:
+            rec(n - 1)
+
+    rec(3)
+    rp.finalize()
+
+    with trace_file.open() as f:
+        trace = json.load(f)
+    events = [(e['name'], e['ts'], e['dur']) for e in trace[2:]]
+    assert events == [('rec()', 1000000, 7000000), (rp.ROOT_NODE_NAME, 0, 9000000)]
+
+
+def test_chrome_trace_compressed_rotation(tmpdir, capsys):
+    """Test that a gzip-compressed trace is rotated by size into
+    independently loadable files.
+    """
+    trace_file = tmpdir.join('trace.json.gz')
+    listener = ChromeTraceListener(str(trace_file), batch_size=10,
+                                   complete_events=True, max_file_size=1000)
+    rp = RegionProfiler(listeners=[listener])
+
+    for _ in range(100):
+        with rp.region('a'):
+            pass
+
+    rp.finalize()
+
+    assert len(listener.filenames) > 1
+    assert listener.filenames[0] == str(trace_file)
+    assert listener.filenames[1] == str(tmpdir.join('trace.1.json.gz'))
+    events = []
+    for filename in listener.filenames:
+        with gzip.open(filename, 'rt') as f:
+            trace = json.load(f)
+        assert trace[0]['ph'] == 'M'
+        events.extend(e for e in trace if e['ph'] == 'X')
+    assert [e['name'] for e in events] == ['a'] * 100 + [rp.ROOT_NODE_NAME]
@@ -0,0 +1,131 @@
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler.compact import CompactTree
+from region_profiler.node import merge_nodes
+from region_profiler.reporters import get_node_slice, get_profiler_slice
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.snapshot import load, save
+from region_profiler.utils import Timer
+
+
+def make_profiler(**kwargs):
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 1000, 1))
+    return RegionProfiler(timer_cls=lambda: Timer(mock_clock), **kwargs)
+
+
+def run_workload(rp, now):
+    """Run regions, advancing the clock ``now`` independently of clock reads."""
+    def recurse(depth):
+        with rp.region('r'):
+            now[0] += 1
+            if depth:
+                recurse(depth - 1)
+
+    for i in range(4):
+        with rp.region('a'):
+            with rp.region('b'):
+                now[0] += i + 1
+            if i % 2:
+                with rp.region('c'):
+                    now[0] += 3
+        for _ in rp.iter_proxy([1, 2], 'it'):
+            now[0] += 1
+    recurse(2)
+    every_2 = SamplingPolicy.every(2)
+    for _ in range(2):
+        with rp.region('d', sampling=every_2):
+            now[0] += 1
+
+
+def test_compact_matches_regular_tree():
+    """Test that compact trees record the same stats as regular ones.
+    """
+    now = [0]
+    regular = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]))
+    compact = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]), compact=True)
+    for rp in (regular, compact):
+        now[0] = 0
+        rp.root.enter_region()
+        run_workload(rp, now)
+        rp.root.exit_region()
+
+    assert isinstance(compact.root.tree, CompactTree)
+    a = compact.root.children['a']
+    assert a.stats.count == 4
+    assert a.children['b'].stats == regular.root.children['a'].children['b'].stats
+    assert compact.root.children['d'].skipped == 1
+    assert compact.root.children['r'].recursion_depth == 0
+
+    expected = get_profiler_slice(regular)
+    actual = get_profiler_slice(compact)
+    assert actual == expected
+    assert [s.sample_rate for s in actual] == [s.sample_rate for s in expected]
+    assert [s.stddev for s in actual] == pytest.approx([s.stddev for s in expected])
+
+    assert get_profiler_slice(compact, 2, 10.0) == get_profiler_slice(regular, 2, 10.0)
+
+    # generic slice builder produces the same result
+    generic = []
+    get_node_slice(generic, compact.root, None, 0)
+    assert generic == actual
+
+
+def test_compact_tree_merge_and_snapshot(tmpdir):
+    rp = make_profiler(compact=True)
+    run_workload(rp, [0])
+    rp.root.exit_region()
+
+    merged = merge_nodes([rp.root])
+    assert merged.children['a'].stats.count == 4
+    assert merged.children['d'].skipped == 1
+
+    filename = str(tmpdir.join('compact.rps'))
+    save(rp.root, filename)
+    loaded = load(filename)
+    assert loaded.children['a'].children['b'].stats.count == 4
+    assert loaded.children['it'].stats.count == 8
+
+
+def test_compact_tree_storage():
+    tree = CompactTree(clock=mock.Mock(side_effect=range(100)))
+    a = tree.root.get_child('a')
+    assert tree.root.get_child('a') is a
+    b = a.get_child('b')
+    assert len(tree) == 3
+    assert list(tree.parent_ids) == [-1, 0, 1]
+    assert tree.child_ids == {0: {'a': 1}, 1: {'b': 2}}
+    assert list(a.children) == ['b']
+
+    b.enter_region()
+    b.exit_region()
+    b.enter_region()
+    b.cancel_region()
+    b.exit_region()
+    assert b.stats.count == 1
+    assert b.timer.begin_ts() == 3
+    assert b.timer.end_ts() == 4
+    assert b.timer.last_event_time == 4
+
+
+def test_compact_tree_ns_timestamps():
+    """Test that timestamps of nanosecond clocks are kept as integers,
+    so that durations don't lose precision on large clock values.
+    """
+    begin = 2 ** 60
+    clock = mock.Mock(side_effect=[begin, begin + 1, begin + 3])
+    tree = CompactTree(clock=clock, scale=1e-9)
+    a = tree.root.get_child('a')
+    a.enter_region()
+    a.exit_region()
+
+    assert tree.begin_ts.typecode == 'q'
+    assert a.stats.total == pytest.approx(2e-9)
+
+
+def test_compact_with_histograms():
+    with pytest.raises(ValueError):
+        RegionProfiler(compact=True, histograms=True)
@@ -0,0 +1,121 @@
+import time
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.cpu_listener import CpuTimeListener
+from region_profiler.node import merge_nodes
+from region_profiler.reporters import get_profiler_slice
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.snapshot import load, save
+from region_profiler.utils import Timer
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class FakeClocks:
+    """Wall and CPU clocks, that advance only when told to."""
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def wall_clock(self):
+        return self.wall
+
+    def cpu_clock(self):
+        return self.cpu
+
+    def run(self, wall, cpu):
+        self.wall += wall
+        self.cpu += cpu
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_cpu_time_of_busy_and_sleeping_regions(compact):
+    """Test that CPU time of regions is recorded next to their wall time.
+    """
+    clocks = FakeClocks()
+    rp = RegionProfiler(listeners=[CpuTimeListener(clocks.cpu_clock)],
+                        timer_cls=lambda: Timer(clocks.wall_clock), compact=compact)
+    with rp.region('busy'):
+        clocks.run(wall=5, cpu=4)
+    with rp.region('sleep'):
+        clocks.run(wall=5, cpu=0)
+    clocks.run(wall=1, cpu=1)
+    rp.finalize()
+
+    busy = rp.root.children['busy']
+    sleep = rp.root.children['sleep']
+    assert busy.cpu_stats.count == 1
+    assert busy.cpu_stats.total == 4
+    assert busy.stats.total == 5
+    assert sleep.cpu_stats.total == 0
+    assert sleep.stats.total == 5
+    assert rp.root.cpu_stats.total == 5
+
+    slices = get_profiler_slice(rp)
+    busy_slice = [s for s in slices if s.name == 'busy'][0]
+    assert busy_slice.cpu_time == 4
+    assert cols.cpu_percents(busy_slice, slices) == '80.00%'
+    assert cols.cpu_us(busy_slice, slices) == '4000000'
+    assert cols.cpu(slices[0], slices) != ''
+
+
+def test_cpu_time_recursive_canceled_and_sampled():
+    clock = mock.Mock(side_effect=[float(x) for x in range(100)])
+    rp = RegionProfiler(listeners=[CpuTimeListener(clock)],
+                        sampling=SamplingPolicy.every(2))
+
+    def recurse(depth):
+        with rp.region('r', asglobal=True, sampling=SamplingPolicy.every(1)):
+            if depth:
+                recurse(depth - 1)
+
+    recurse(3)
+    r = rp.root.children['r']
+    assert r.cpu_stats.count == 1
+    assert r.cpu_stats.total == 1
+
+    for _ in rp.iter_proxy([1], 'it'):
+        pass
+    it = rp.root.children['it']
+    assert it.cpu_stats.count == it.stats.count
+
+    for _ in range(4):
+        with rp.region('s'):
+            pass
+    rp.root.exit_region()
+    s = [s for s in get_profiler_slice(rp) if s.name == 's'][0]
+    assert s.sample_rate == 0.5
+    assert s.cpu_time == 2 * rp.root.children['s'].cpu_stats.total
+
+
+def test_cpu_time_merge_and_snapshot(tmpdir):
+    rp = RegionProfiler(listeners=[CpuTimeListener()])
+    with rp.region('a'):
+        busy_wait(0.001)
+    rp.finalize()
+
+    merged = merge_nodes([rp.root.children['a']] * 2)
+    assert merged.cpu_stats.count == 2
+
+    filename = str(tmpdir.join('cpu.rps'))
+    save(rp.root, filename)
+    assert load(filename).children['a'].cpu_stats == rp.root.children['a'].cpu_stats
+
+
+def test_regions_without_cpu_time():
+    rp = RegionProfiler()
+    with rp.region('a'):
+        pass
+    slices = get_profiler_slice(rp)
+    assert slices[1].cpu_time is None
+    assert cols.cpu(slices[1], slices) == ''
+    assert cols.cpu_percents(slices[1], slices) == ''
@@ -0,0 +1,138 @@
+import io
+
+import pytest
+
+from region_profiler import snapshot
+from region_profiler.cli import main
+from region_profiler.diff import (diff_profiles, load_profile, print_diff,
+                                  read_csv, region_metrics, welch_t_test)
+from region_profiler.node import RegionNode
+from region_profiler.reporters import CsvReporter, get_tree_slice
+
+
+def make_tree(a=4.0, b=1.0, c=None, root_name='<main>'):
+    root = RegionNode(root_name)
+    root.stats.add(10)
+    node_a = root.get_child('a')
+    node_a.stats.add(a / 2)
+    node_a.stats.add(a / 2)
+    node_a.get_child('b').stats.add(b)
+    if c is not None:
+        root.get_child('c').stats.add(c)
+    return root
+
+
+def test_welch_t_test():
+    assert welch_t_test([1, 2, 3, 4], [3, 4, 5, 6]) == pytest.approx(0.0710, abs=1e-4)
+    assert welch_t_test([1, 2, 3], [1, 2, 3]) == pytest.approx(1.0)
+    assert welch_t_test([1, 1], [2, 2]) == 0
+    assert welch_t_test([1], [2, 3]) is None
+
+
+def test_region_metrics():
+    metrics = region_metrics(make_tree())
+    assert list(metrics) == [(), ('a',), ('a', 'b')]
+    a = metrics[('a',)]
+    assert (a.total, a.self_time, a.count, a.average) == (4, 3, 2, 2)
+
+
+def test_single_run_diff():
+    diffs = diff_profiles([make_tree(c=0.5)], [make_tree(a=5, c=0.6, root_name='r1')],
+                          threshold=10)
+    by_path = {d.path: d for d in diffs}
+    assert [d.path for d in diffs] == [(), ('a',), ('a', 'b'), ('c',)]
+    assert by_path[('a',)].change('total') == pytest.approx(25)
+    assert by_path[('a',)].change('self') == pytest.approx(100 / 3)
+    assert by_path[('a',)].p_value is None
+    assert [d.path for d in diffs if d.regressed] == [('a',), ('c',)]
+
+    diffs = diff_profiles([make_tree(c=0.5)], [make_tree(a=5, c=0.6)],
+                          threshold=10, min_time=1.0)
+    assert [d.path for d in diffs if d.regressed] == [('a',)]
+
+
+def test_root_is_not_gated():
+    slower_root = make_tree()
+    slower_root.stats.add(10)
+    diffs = diff_profiles([make_tree()], [slower_root])
+    assert diffs[0].path == ()
+    assert diffs[0].change('total') == pytest.approx(100)
+    assert not any(d.regressed for d in diffs)
+
+
+def test_added_and_removed_regions():
+    diffs = diff_profiles([make_tree(c=1)], [make_tree()])
+    c = diffs[-1]
+    assert (c.path, c.in_base, c.in_new, c.regressed) == (('c',), True, False, False)
+    diffs = diff_profiles([make_tree()], [make_tree(c=1)])
+    c = diffs[-1]
+    assert (c.path, c.in_base, c.in_new, c.regressed) == (('c',), False, True, False)
+    out = io.StringIO()
+    print_diff(diffs, out)
+    assert out.getvalue().splitlines()[-3].split()[-1] == 'new'
+
+
+@pytest.mark.parametrize('new_a,regressed', [
+    ([4.1, 3.9, 4.3, 3.8], False),  # noise
+    ([4.9, 5.1, 5.0, 5.2], True),
+    ([3.0, 3.1, 2.9, 3.0], False),  # improvement
+])
+def test_multiple_runs_diff(new_a, regressed):
+    base = [make_tree(a) for a in (4.0, 4.2, 3.9, 4.1)]
+    new = [make_tree(a) for a in new_a]
+    a = {d.path: d for d in diff_profiles(base, new)}[('a',)]
+    assert a.p_value is not None
+    assert a.regressed == regressed
+
+
+def test_read_csv():
+    root = make_tree(c=0.5)
+    out = io.StringIO()
+    reporter = CsvReporter(stream=out)
+    reporter.dump_slices(get_tree_slice(root))
+    reporter.dump_slices(get_tree_slice(make_tree(a=6, c=0.5)))
+    loaded = read_csv(io.StringIO(out.getvalue()))
+    metrics = region_metrics(loaded)
+    assert set(metrics) == {(), ('a',), ('a', 'b'), ('c',)}
+    assert metrics[('a',)].total == pytest.approx(6)
+    assert metrics[('a',)].count == 2
+    with pytest.raises(ValueError):
+        read_csv(io.StringIO('a, b\n1, 2\n'))
+
+
+def test_read_csv_rows_in_any_order():
+    out = io.StringIO()
+    CsvReporter(stream=out).dump_slices(get_tree_slice(make_tree(c=0.5)))
+    header, *rows = out.getvalue().splitlines()
+    loaded = read_csv(io.StringIO('\n'.join([header] + rows[::-1])))
+    metrics = region_metrics(loaded)
+    assert set(metrics) == {(), ('a',), ('a', 'b'), ('c',)}
+    assert metrics[('a', 'b')].total == pytest.approx(1)
+    with pytest.raises(ValueError, match='unknown parent id 7'):
+        read_csv(io.StringIO('\n'.join([header] + rows + ['4, d, 7, x, 1, 1, 1'])))
+
+
+def test_cli_diff(tmpdir, capsys):
+    base = str(tmpdir.join('base.rps'))
+    snapshot.save(make_tree(), base)
+    same = str(tmpdir.join('same.csv'))
+    with open(same, 'w') as f:
+        CsvReporter(stream=f).dump_slices(get_tree_slice(make_tree()))
+    slower = str(tmpdir.join('slower.rps'))
+    snapshot.save(make_tree(b=2), slower)
+    assert isinstance(load_profile(same), RegionNode)
+
+    assert main(['diff', '--base', base, '--new', same]) == 0
+    assert main(['diff', '--base', base, '--new', slower]) == 1
+    out, _ = capsys.readouterr()
+    assert '1 of 3 regions regressed' in out
+    assert main(['diff', '--base', base, '--new', slower, '--threshold', '200']) == 0
+    assert main(['diff', '--base', base, '--new', slower, '--metric', 'self']) == 1
+    capsys.readouterr()
+    assert main(['diff', '--format', 'csv', '--base', base, base,
+                 '--new', slower, slower]) == 1
+    out, _ = capsys.readouterr()
+    rows = out.splitlines()
+    assert rows[0].startswith('path,base_total,new_total,total_diff')
+    assert rows[3].startswith('<main>;a;b,1.000 s,2.000 s,+100.00%')
+    assert rows[3].endswith(',0.0000,REGRESSED')
@@ -0,0 +1,140 @@
+import io
+import json
+
+import pytest
+
+from region_profiler import RegionProfiler, snapshot
+from region_profiler.cli import main
+from region_profiler.flamegraph import (FoldedStackReporter, SpeedscopeReporter,
+                                        iter_self_times, write_folded,
+                                        write_speedscope)
+from region_profiler.node import RegionNode
+
+
+def make_tree():
+    root = RegionNode('<main>')
+    root.stats.add(10)
+    a = root.get_child('a')
+    a.stats.add(6)
+    a.get_child('b').stats.add(2)
+    a.get_child('x;y').stats.add(1)
+    c = root.get_child('c')
+    c.stats.add(1)
+    c.skipped = 1  # sampled at rate 0.5
+    c.get_child('b').stats.add(0.5)
+    return root
+
+
+def test_self_times():
+    times = [([n.name for n in path], t) for path, t in iter_self_times(make_tree())]
+    assert times == [(['<main>'], 2), (['<main>', 'a'], 3), (['<main>', 'a', 'b'], 2),
+                     (['<main>', 'a', 'x;y'], 1), (['<main>', 'c'], 1.5),
+                     (['<main>', 'c', 'b'], 0.5)]
+
+
+def test_write_folded():
+    f = io.StringIO()
+    write_folded(f, make_tree())
+    assert f.getvalue().splitlines() == [
+        '<main> 2000000',
+        '<main>;a 3000000',
+        '<main>;a;b 2000000',
+        '<main>;a;x:y 1000000',
+        '<main>;c 1500000',
+        '<main>;c;b 500000',
+    ]
+
+
+def speedscope_self_times(profile):
+    """Replay speedscope events and compute self times by stack.
+    """
+    frames = [fr['name'] for fr in profile['shared']['frames']]
+    profile = profile['profiles'][0]
+    assert profile['type'] == 'evented'
+    self_times = {}
+    stack = []
+    last = 0
+    for e in profile['events']:
+        if stack:
+            key = tuple(frames[i] for i in stack)
+            self_times[key] = self_times.get(key, 0) + e['at'] - last
+        last = e['at']
+        if e['type'] == 'O':
+            stack.append(e['frame'])
+        else:
+            assert stack.pop() == e['frame']
+    assert not stack
+    assert last == profile['endValue']
+    return self_times
+
+
+def test_write_speedscope():
+    f = io.StringIO()
+    write_speedscope(f, make_tree(), name='run')
+    profile = json.loads(f.getvalue())
+    assert profile['name'] == 'run'
+    assert [fr['name'] for fr in profile['shared']['frames']] == ['<main>', 'a', 'b',
+                                                                  'x;y', 'c']
+    assert speedscope_self_times(profile) == {
+        ('<main>',): 2, ('<main>', 'a'): 3, ('<main>', 'a', 'b'): 2,
+        ('<main>', 'a', 'x;y'): 1, ('<main>', 'c'): 1.5, ('<main>', 'c', 'b'): 0.5,
+    }
+
+
+def test_speedscope_children_longer_than_parent():
+    root = RegionNode('<main>')
+    root.stats.add(1)
+    root.get_child('a').stats.add(2)
+    f = io.StringIO()
+    write_speedscope(f, root)
+    profile = json.loads(f.getvalue())
+    assert speedscope_self_times(profile) == {('<main>',): 0, ('<main>', 'a'): 2}
+
+
+def test_deep_tree():
+    root = node = RegionNode('<main>')
+    for i in range(5000):
+        node = node.get_child('r')
+        node.stats.add(1)
+    root.stats.add(1)
+    f = io.StringIO()
+    write_folded(f, root)
+    lines = f.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].count(';') == 5000
+    f = io.StringIO()
+    write_speedscope(f, root)
+    assert len(json.loads(f.getvalue())['profiles'][0]['events']) == 10002
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_reporters(tmpdir, compact):
+    rp = RegionProfiler(compact=compact)
+    with rp.region('a'):
+        with rp.region('b'):
+            pass
+    rp.finalize()
+    folded = str(tmpdir.join('profile.folded'))
+    FoldedStackReporter(folded).dump_profiler(rp)
+    with open(folded) as f:
+        assert any(line.startswith('<main>;a;b ') for line in f)
+    speedscope = str(tmpdir.join('profile.json'))
+    SpeedscopeReporter(speedscope).dump_profiler(rp)
+    with open(speedscope) as f:
+        assert ('<main>', 'a', 'b') in speedscope_self_times(json.load(f))
+
+
+def test_cli_export(tmpdir, capsys):
+    filenames = []
+    for i in range(2):
+        filename = str(tmpdir.join('{}.rps'.format(i)))
+        snapshot.save(make_tree(), filename)
+        filenames.append(filename)
+    assert main(['export'] + filenames) == 0
+    out, _ = capsys.readouterr()
+    assert '<main>;a;b 4000000' in out.splitlines()
+
+    output = str(tmpdir.join('profile.json'))
+    assert main(['export', '--format', 'speedscope', '-o', output] + filenames) == 0
+    with open(output) as f:
+        assert speedscope_self_times(json.load(f))[('<main>', 'c')] == 3
@@ -0,0 +1,118 @@
+import random
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler, snapshot
+from region_profiler import reporter_columns as cols
+from region_profiler.histogram import HistSeqStats, LogHistogram
+from region_profiler.node import merge_nodes
+from region_profiler.reporters import get_profiler_slice, get_tree_slice
+from region_profiler.utils import Timer
+
+
+@pytest.mark.parametrize('q', [50, 90, 99, 99.9])
+def test_percentile_precision(q):
+    """Test that percentiles are estimated within histogram precision.
+    """
+    rng = random.Random(0)
+    values = [rng.lognormvariate(-7, 1.5) for _ in range(10000)]
+    h = LogHistogram(precision=0.01)
+    for v in values:
+        h.add(v)
+
+    exact = sorted(values)[int(len(values) * q / 100) - 1]
+    assert h.percentile(q) == pytest.approx(exact, rel=0.02)
+
+
+def test_histogram_bounds():
+    h = LogHistogram(min_value=1e-6, max_value=1)
+    assert h.percentile(50) is None
+    h.add(0)
+    h.add(10)
+    assert h.count == 2
+    assert h.percentile(0) == 1e-6
+    assert h.percentile(100) == pytest.approx(1, rel=0.01)
+    assert len(h.buckets) == 2
+
+
+def test_histogram_merge():
+    a = LogHistogram()
+    b = LogHistogram()
+    full = LogHistogram()
+    for v in [1e-3, 2e-3, 5e-3]:
+        a.add(v)
+        full.add(v)
+    for v in [2e-3, 1]:
+        b.add(v)
+        full.add(v)
+    a.merge(b)
+    assert a.buckets == full.buckets
+    assert a.count == full.count
+
+    with pytest.raises(ValueError):
+        a.merge(LogHistogram(precision=0.05))
+
+
+def test_hist_stats_percentile_clamped():
+    s = HistSeqStats()
+    s.add(0.00105)
+    assert s.percentile(50) == 0.00105
+
+
+def test_profiler_histograms(tmpdir):
+    """Test that profiler histograms are reported, merged and saved.
+    """
+    mock_clock = mock.Mock()
+    durations = [i / 1000. for i in range(1, 101)]
+    mock_clock.side_effect = [0] + [x for d in durations for x in (0, d)] + [1]
+    rp = RegionProfiler(timer_cls=lambda: Timer(mock_clock), histograms=True)
+    for _ in range(100):
+        with rp.region('a'):
+            pass
+    rp.root.exit_region()  # stop root timer, so root stats do not change
+
+    a = rp.root.children['a']
+    assert isinstance(a.stats, HistSeqStats)
+    slices = get_profiler_slice(rp)
+    assert slices[1].percentile(50) == pytest.approx(0.05, rel=0.01)
+    p99 = slices[1].percentile(99)
+    assert cols.p99_us(slices[1], slices) == str(int(p99 * 1000000))
+    assert cols.p50(slices[0], slices) == ''
+
+    filename = str(tmpdir.join('hist.rps'))
+    snapshot.save(rp.root, filename)
+    loaded = snapshot.load(filename).children['a']
+    assert loaded.stats.histogram.buckets == a.stats.histogram.buckets
+    assert loaded.stats.stddev == pytest.approx(a.stats.stddev)
+
+    merged = merge_nodes([loaded, a])
+    assert merged.stats.histogram.count == 200
+    assert merged.stats.percentile(50) == pytest.approx(0.05, rel=0.01)
+
+
+def test_merge_with_stats_without_histogram():
+    """Test that percentiles of histograms, that miss merged hits, are marked.
+    """
+    now = [0]
+    trees = []
+    for histograms in (True, False):
+        rp = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]),
+                            histograms=histograms)
+        for _ in range(2):
+            with rp.region('a'):
+                now[0] += 0.001
+        rp.root.exit_region()
+        trees.append(rp.root)
+
+    merged = merge_nodes(trees)
+    stats = merged.children['a'].stats
+    assert (stats.count, stats.histogram.count) == (4, 2)
+    assert stats.partial
+    assert not trees[0].children['a'].stats.partial
+
+    slices = get_tree_slice(merged)
+    p50 = slices[1].percentile(50)
+    assert p50 == pytest.approx(0.001, rel=0.01)
+    assert cols.p50_us(slices[1], slices) == '{}*'.format(int(p50 * 1000000))
+    assert cols.p50(slices[1], slices).endswith('*')
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    'torch',
+    'inspect',
+    'multiprocessing',
+    'region_profiler.chrome_trace_listener',
+    'region_profiler.compact',
+    'region_profiler.cpu_listener',
+    'region_profiler.debug_listener',
+    'region_profiler.histogram',
+    'region_profiler.memory_listener',
+    'region_profiler.overhead',
+    'region_profiler.periodic',
+    'region_profiler.prometheus',
+    'region_profiler.workers',
+]
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+begin = time.perf_counter()
+import region_profiler
+elapsed = time.perf_counter() - begin
+print(elapsed, ' '.join(m for m in {!r} if m in sys.modules))
+""".format(HEAVY_MODULES)
+
+
+def test_import_does_not_load_optional_modules():
+    """Assert that ``import region_profiler`` is cheap: torch and modules
+    of optional features are not imported until they are enabled.
+    """
+    timings = []
+    for _ in range(3):
+        out = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT])
+        elapsed, *loaded = out.decode().split()
+        assert loaded == []
+        timings.append(float(elapsed))
+    assert min(timings) < 0.1
@@ -1,7 +1,12 @@
+import threading
 from unittest import mock
 
+import pytest
+
 from region_profiler import RegionProfiler
 from region_profiler.debug_listener import DebugListener
+from region_profiler.listener import (CANCEL, ENTER, EXIT, BatchedListener,
+                                      RegionProfilerListener)
 from region_profiler.utils import Timer
 
 
@@ -33,3 +38,190 @@ def test_debug_listener(capsys):
     assert 'Exited a at 8' in err
     assert 'Exited foo() at 9' in err
     assert 'Finalizing' in err
+
+
+class RecordingListener(RegionProfilerListener):
+    def __init__(self):
+        self.log = []
+
+    def finalize(self):
+        self.log.append(('finalize', None))
+
+    def region_entered(self, profiler, region):
+        self.log.append((ENTER, region.name))
+
+    def region_exited(self, profiler, region):
+        self.log.append((EXIT, region.name))
+
+    def region_canceled(self, profiler, region):
+        self.log.append((CANCEL, region.name))
+
+
+def run_regions(rp):
+    with rp.region('data_load'):
+        for _ in rp.iter_proxy([1], 'data_iter'):
+            pass
+    with rp.region('forward'):
+        pass
+
+
+class StackListener(RegionProfilerListener):
+    def __init__(self):
+        self.stack = []
+        self.hits = []
+
+    def finalize(self):
+        pass
+
+    def region_entered(self, profiler, region):
+        self.stack.append(region.name)
+
+    def region_exited(self, profiler, region):
+        assert self.stack.pop() == region.name
+        self.hits.append(region.name)
+
+    def region_canceled(self, profiler, region):
+        assert self.stack[-1] == region.name
+
+
+def test_listener_added_in_open_region():
+    """Test that listeners attached inside a region receive neither its exit
+    nor exits of enclosing regions, but receive subsequent hits,
+    and that listeners detached inside a region don't receive its exit.
+    """
+    rp = RegionProfiler()
+    listener = StackListener()
+
+    @rp.func()
+    def rec(n):
+        if n == 1 and listener not in rp.listeners:
+            rp.add_listener(listener)
+        if n:
+            rec(n - 1)
+
+    with rp.region('a'):
+        rec(2)
+        for _ in rp.iter_proxy([1], 'iter'):
+            pass
+    with rp.region('a'):
+        rec(1)
+    with rp.region('b'):
+        rp.remove_listener(listener)
+    rp.finalize()
+    assert listener.stack == ['b']
+    assert listener.hits == ['rec()', 'iter', 'iter', 'rec()', 'rec()', 'a']
+
+
+@pytest.mark.parametrize('events,regions,expected', [
+    (None, None, [(ENTER, '<main>'), (ENTER, 'data_load'), (ENTER, 'data_iter'),
+                  (EXIT, 'data_iter'), (ENTER, 'data_iter'), (CANCEL, 'data_iter'),
+                  (EXIT, 'data_iter'), (EXIT, 'data_load'), (ENTER, 'forward'),
+                  (EXIT, 'forward'), (EXIT, '<main>')]),
+    ([EXIT], None, [(EXIT, 'data_iter'), (EXIT, 'data_iter'), (EXIT, 'data_load'),
+                    (EXIT, 'forward'), (EXIT, '<main>')]),
+    (None, ['data*'], [(ENTER, 'data_load'), (ENTER, 'data_iter'),
+                       (EXIT, 'data_iter'), (ENTER, 'data_iter'),
+                       (CANCEL, 'data_iter'), (EXIT, 'data_iter'),
+                       (EXIT, 'data_load')]),
+    ([ENTER, CANCEL], ['*iter', 'forward'], [(ENTER, 'data_iter'), (ENTER, 'data_iter'),
+                                            (CANCEL, 'data_iter'), (ENTER, 'forward')]),
+])
+def test_listener_subscriptions(events, regions, expected):
+    """Test that listeners receive only subscribed events.
+    """
+    listener = RecordingListener().subscribe(events, regions)
+    rp = RegionProfiler(listeners=[listener])
+    run_regions(rp)
+    rp.finalize()
+    assert listener.log == expected + [('finalize', None)]
+
+
+def test_unknown_listener_event():
+    with pytest.raises(ValueError):
+        RecordingListener().subscribe(['enter', 'resume'])
+
+
+def test_listeners_update_cached_contexts():
+    """Test that listeners attached after regions were entered
+    receive events of these regions, starting from the next hit.
+    """
+    rp = RegionProfiler()
+    first = RecordingListener().subscribe(regions=['a'])
+    second = RecordingListener().subscribe(events=[EXIT])
+    with rp.region('a'):
+        pass
+    rp.add_listener(first)
+    with rp.region('a'):
+        rp.add_listener(second)
+    rp.remove_listener(first)
+    with rp.region('a'):
+        pass
+    assert first.log == [(ENTER, 'a'), (EXIT, 'a'), ('finalize', None)]
+    assert second.log == [(EXIT, 'a')]
+
+
+class CollectingListener(BatchedListener):
+    def __init__(self, batch_size):
+        super(CollectingListener, self).__init__(batch_size)
+        self.batches = []
+
+    def process_events(self, profiler, events):
+        self.batches.append([(e, r.name, ts) for e, r, ts in events])
+
+
+def test_batched_listener():
+    """Test that batched listeners receive events in batches with timestamps.
+    """
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 100, 1))
+    listener = CollectingListener(batch_size=4)
+    rp = RegionProfiler(listeners=[listener], timer_cls=lambda: Timer(mock_clock))
+    run_regions(rp)
+    assert [len(b) for b in listener.batches] == [4, 4]
+    rp.finalize()
+    assert [len(b) for b in listener.batches] == [4, 4, 3]
+    events = [e for b in listener.batches for e in b]
+    assert events[:4] == [(ENTER, '<main>', 0), (ENTER, 'data_load', 1),
+                          (ENTER, 'data_iter', 2), (EXIT, 'data_iter', 3)]
+    assert events[5] == (CANCEL, 'data_iter', 5)
+    assert events[-1] == (EXIT, '<main>', 10)
+
+
+def test_batched_listener_threads():
+    listener = CollectingListener(batch_size=1000)
+    rp = RegionProfiler(listeners=[listener])
+
+    def worker():
+        for _ in range(10):
+            with rp.region('w'):
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rp.finalize()
+    names = [name for b in listener.batches for _, name, _ in b]
+    assert names.count('w') == 60
+    assert all(len(b) == 20 for b in listener.batches if b[0][1] == 'w')
+
+
+def test_batched_listener_added_in_open_region():
+    """Test that subscription tables, rebuilt while regions are open,
+    don't pass exits of these regions to batched listeners.
+    """
+    listener = CollectingListener(batch_size=100).subscribe(regions=['data*'])
+    rp = RegionProfiler()
+    with rp.region('data_load'):
+        for i in rp.iter_proxy([1, 2], 'data_iter'):
+            if i == 1:
+                rp.add_listener(listener)
+    with rp.region('data_load'):
+        pass
+    rp.finalize()
+    events = [(e, name) for b in listener.batches for e, name, _ in b]
+    assert events == [(ENTER, 'data_iter'), (EXIT, 'data_iter'),
+                      (ENTER, 'data_iter'), (CANCEL, 'data_iter'),
+                      (EXIT, 'data_iter'), (ENTER, 'data_load'),
+                      (EXIT, 'data_load')]
@@ -0,0 +1,135 @@
+import json
+import sys
+import tracemalloc
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.chrome_trace_listener import ChromeTraceListener
+from region_profiler.memory_listener import MemoryListener
+from region_profiler.node import merge_nodes
+from region_profiler.periodic import delta_tree
+from region_profiler.reporters import get_profiler_slice
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.snapshot import load, save
+
+has_reset_peak = pytest.mark.skipif(sys.version_info < (3, 9),
+                                    reason='tracemalloc.reset_peak requires Python 3.9')
+
+
+def run_regions(rp, keep):
+    for _ in range(3):
+        with rp.region('outer'):
+            with rp.region('temporary'):
+                data = bytearray(1000000)
+                del data
+            with rp.region('kept'):
+                keep.append(bytearray(100000))
+
+
+@has_reset_peak
+@pytest.mark.parametrize('compact', [False, True])
+def test_traced_memory(compact):
+    """Test that retained and peak memory of regions are recorded.
+    """
+    assert not tracemalloc.is_tracing()
+    rp = RegionProfiler(listeners=[MemoryListener()], compact=compact)
+    assert tracemalloc.is_tracing()
+    keep = []
+    run_regions(rp, keep)
+    rp.finalize()
+    assert not tracemalloc.is_tracing()
+
+    outer = rp.root.children['outer']
+    temporary = outer.children['temporary']
+    kept = outer.children['kept']
+    assert temporary.memory_stats.count == 3
+    assert abs(temporary.memory_stats.max) < 10000
+    assert 1000000 <= temporary.peak_memory_stats.min < 1010000
+    assert 100000 <= kept.memory_stats.min < 110000
+    assert 100000 <= kept.peak_memory_stats.min < 110000
+    # the peak of a child is the peak of its parent
+    assert 1000000 <= outer.peak_memory_stats.min < outer.peak_memory_stats.max < 1300000
+    assert 300000 <= outer.memory_stats.total < 330000
+    assert rp.root.peak_memory_stats.max >= outer.peak_memory_stats.max
+
+    slices = {s.name: s for s in get_profiler_slice(rp)}
+    s = slices['outer']
+    assert s.retained == outer.memory_stats.total
+    assert s.allocated == outer.peak_memory_stats.total
+    assert s.net_blocks is None
+    assert cols.retained_bytes(s, []) == str(int(s.retained))
+    assert cols.peak_memory(s, []).endswith(('KiB', 'MiB'))
+    assert cols.allocated(s, []) != ''
+    assert cols.net_blocks(s, []) == ''
+
+
+def test_counts_only():
+    rp = RegionProfiler(listeners=[MemoryListener(counts_only=True)],
+                        sampling=SamplingPolicy.every(2))
+    assert not tracemalloc.is_tracing()
+    keep = []
+    for _ in range(4):
+        with rp.region('alloc'):
+            keep.extend(object() for _ in range(1000))
+    with rp.region('empty'):
+        pass
+    for _ in rp.iter_proxy([1], 'it'):
+        pass
+    rp.finalize()
+
+    alloc = rp.root.children['alloc']
+    assert alloc.memory_stats is None
+    assert alloc.block_stats.count == 2
+    assert alloc.block_stats.min >= 1000
+    slices = {s.name: s for s in get_profiler_slice(rp)}
+    assert slices['alloc'].net_blocks == 2 * alloc.block_stats.total
+    assert slices['alloc'].retained is None
+    assert cols.net_blocks(slices['alloc'], []) == str(int(slices['alloc'].net_blocks))
+    assert cols.retained(slices['alloc'], []) == ''
+    assert rp.root.children['it'].block_stats.count == 1
+
+
+def test_memory_merge_delta_and_snapshot(tmpdir):
+    rp = RegionProfiler(listeners=[MemoryListener()])
+    keep = []
+    run_regions(rp, keep)
+    previous = merge_nodes([rp.root])
+    run_regions(rp, keep)
+    rp.finalize()
+
+    outer = rp.root.children['outer']
+    merged = merge_nodes([outer] * 2)
+    assert merged.memory_stats.count == 12
+    assert merged.memory_stats.total == 2 * outer.memory_stats.total
+    delta = delta_tree(rp.root, previous).children['outer']
+    assert delta.memory_stats.count == 3
+
+    filename = str(tmpdir.join('memory.rps'))
+    save(rp.root, filename)
+    loaded = load(filename).children['outer']
+    for attr in ('memory_stats', 'peak_memory_stats'):
+        if getattr(outer, attr) is not None:
+            assert getattr(loaded, attr) == getattr(outer, attr)
+    assert loaded.block_stats is None
+
+
+@pytest.mark.parametrize('counts_only,counter', [
+    (False, ('traced memory', 'bytes')),
+    (True, ('allocated blocks', 'blocks')),
+])
+def test_chrome_trace_memory_counters(tmpdir, capsys, counts_only, counter):
+    trace_file = str(tmpdir.join('trace.json'))
+    listeners = [MemoryListener(counts_only=counts_only),
+                 ChromeTraceListener(trace_file, memory_counters=True)]
+    rp = RegionProfiler(listeners=listeners)
+    keep = []
+    run_regions(rp, keep)
+    rp.finalize()
+    with open(trace_file) as f:
+        events = json.load(f)
+    counters = [e for e in events if e['ph'] == 'C']
+    assert len(counters) == 2 * 10
+    name, unit = counter
+    assert all(e['name'] == name and e['args'][unit] > 0 for e in counters)
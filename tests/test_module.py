@@ -7,7 +7,7 @@ from unittest import mock
 import pytest
 import region_profiler.global_instance
 import region_profiler.profiler
-from region_profiler import RegionProfiler, func
+from region_profiler import RegionProfiler, SyncPolicy, func
 from region_profiler import install as install_profiler
 from region_profiler import iter_proxy, region
 from region_profiler import reporter_columns as cols
@@ -214,8 +214,62 @@ def test_automatic_naming(monkeypatch, use_cython):
         ["name"],
         [RegionProfiler.ROOT_NODE_NAME],
         ["foo()"],
-        ["foo() <test_module.py:198>"],
-        ["foo() <test_module.py:199>"],
+        ["foo() <test_module.py:203>"],
+        ["foo() <test_module.py:204>"],
     ]
 
     assert reporter.rows == expected
+
+
+def test_not_installed(monkeypatch):
+    """Test that regions are no-ops until the profiler is installed
+    and decorated functions pick up the profiler once it is.
+    """
+    reporter = SilentReporter([cols.name, cols.count])
+    monkeypatch.setattr(region_profiler.global_instance, "_profiler", None)
+
+    @func()
+    def foo():
+        return 42
+
+    assert foo() == 42
+    assert region("a") is region("b")
+    with region("a"):
+        pass
+
+    with fresh_region_profiler(monkeypatch):
+        install_profiler(reporter=reporter)
+        assert foo() == 42
+
+    assert reporter.rows[2] == ["foo()", "1"]
+
+
+def test_disabled(monkeypatch):
+    """Test that disabled profiling leaves functions unchanged
+    and ignores install().
+    """
+    monkeypatch.setattr(region_profiler.global_instance, "_disabled", False)
+    monkeypatch.setattr(region_profiler.global_instance, "_profiler", None)
+    region_profiler.disable()
+    assert region_profiler.is_disabled()
+
+    def foo():
+        return 42
+
+    assert func()(foo) is foo
+    assert list(iter_proxy([1, 2])) == [1, 2]
+    with pytest.warns(UserWarning):
+        assert install_profiler() is None
+    assert region_profiler.global_instance._profiler is None
+    assert region() is region()
+
+
+def test_iter_proxy_sync_policy(monkeypatch):
+    """Test that module-level iter_proxy passes the sync policy to the profiler."""
+    sync = mock.Mock()
+    with fresh_region_profiler(monkeypatch):
+        rp = install_profiler(reporter=SilentReporter([cols.name]))
+        rp.synchronizer = sync
+        for _ in iter_proxy([1, 2], "iter", sync_policy=SyncPolicy.on_exit_only()):
+            pass
+        assert sync.call_count == 3
@@ -0,0 +1,120 @@
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.node import RegionNode
+from region_profiler.overhead import InstrumentationOverhead, calibrate
+from region_profiler.reporters import get_profiler_slice, get_tree_slice
+from region_profiler.utils import Timer
+
+
+def test_calibrate():
+    overhead = calibrate(iterations=200, repeats=2)
+    assert overhead.hit_cost > 0
+    assert 0 <= overhead.self_cost <= overhead.hit_cost
+    assert 0 < overhead.clock_resolution < 0.1
+
+
+def test_overhead_estimation():
+    """Test that overhead is estimated from the number of descendant hits.
+    """
+    root = RegionNode('root')
+    a = root.get_child('a')
+    a.stats.add(20)
+    a.stats.add(20)
+    for _ in range(10):
+        a.get_child('b').stats.add(1)
+    for _ in range(3):
+        a.get_child('c').stats.add(0.1)
+
+    overhead = InstrumentationOverhead(hit_cost=1, self_cost=0.25, clock_resolution=0)
+    slices = {s.name: s for s in get_tree_slice(root, overhead=overhead)}
+    assert slices['root'].overhead_time == 15
+    assert slices['root'].inner_overhead_time == 1.5
+    assert slices['a'].overhead_time == 13.5
+    assert slices['a'].inner_overhead_time == 10.25
+    assert slices['a'].compensated_total_time == 26.5
+    assert slices['a'].compensated_inner_time == pytest.approx(40 - 10.3 - 10.25)
+    assert slices['b'].overhead_time == 2.5
+    assert slices['c'].compensated_total_time == 0
+    assert cols.overhead_percents(slices['c'], []) == '100.00%'
+    assert cols.compensated_total_us(slices['a'], []) == '26500000'
+
+    pruned = get_tree_slice(root, top_k=1, overhead=overhead)
+    assert [s.name for s in pruned] == ['root', 'a', 'b']
+    assert pruned[1].overhead_time == 13.5
+
+
+def test_compact_overhead_estimation():
+    now = [0]
+    overhead = InstrumentationOverhead(hit_cost=1, self_cost=0.25, clock_resolution=0)
+    results = []
+    for compact in (False, True):
+        rp = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]), compact=compact)
+        rp.overhead = overhead
+        for i in range(3):
+            with rp.region('a'):
+                for _ in range(i + 1):
+                    with rp.region('b'):
+                        now[0] += 1
+        rp.root.exit_region()
+        results.append([(s.overhead_time, s.inner_overhead_time)
+                        for s in get_profiler_slice(rp)])
+    assert results[0] == results[1]
+    assert results[0][1] == (0.75 + 6, 0.75 + 0.75 * 6)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_overhead_of_global_and_muted_regions(compact):
+    """Test that entries of global and disabled regions inside a region
+    are accounted in its overhead, though they are not its descendants.
+    """
+    now = [0]
+    rp = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]), compact=compact)
+    rp.overhead = InstrumentationOverhead(hit_cost=1, self_cost=0.25,
+                                          clock_resolution=0)
+    rp.disable_regions('muted')
+    for _ in range(2):
+        with rp.region('a'):
+            now[0] += 10
+            with rp.region('b'):
+                with rp.region('g', asglobal=True):
+                    pass
+                with rp.region('muted'):
+                    with rp.region('c'):
+                        pass
+    rp.root.exit_region()
+    slices = {s.name: s for s in get_profiler_slice(rp)}
+    assert slices['a'].overhead_time == 0.5 + 2 * 4
+    assert slices['b'].overhead_time == 0.5 + 2 * 3
+    assert slices['g'].overhead_time == 0.5
+    assert slices['<main>'].overhead_time == 2 * 5
+
+
+def test_compensated_columns_of_tiny_regions():
+    """Test that time of tiny regions is mostly attributed to the overhead.
+    """
+    now = [0]
+    rp = RegionProfiler(timer_cls=lambda: Timer(lambda: now[0]))
+    rp.overhead = InstrumentationOverhead(hit_cost=0.75, self_cost=0.25,
+                                          clock_resolution=0)
+    with rp.region('parent'):
+        for _ in range(5000):
+            with rp.region('child'):
+                now[0] += 1
+    slices = get_profiler_slice(rp)
+    parent = slices[1]
+    assert parent.name == 'parent'
+    assert parent.total_time == 5000
+    assert parent.overhead_time == 0.25 + 0.75 * 5000
+    assert parent.compensated_total_time == 5000 - 0.25 - 0.75 * 5000
+    assert cols.overhead_percents(parent, slices) == '75.00%'
+
+
+def test_no_overhead_by_default():
+    rp = RegionProfiler()
+    with rp.region('a'):
+        pass
+    slices = get_profiler_slice(rp)
+    assert slices[1].overhead_time == 0
+    assert slices[1].compensated_total_time == pytest.approx(slices[1].total_time)
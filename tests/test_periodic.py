@@ -0,0 +1,106 @@
+import io
+import statistics
+import time
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.histogram import HistSeqStats
+from region_profiler.periodic import PeriodicReporter, delta_stats
+from region_profiler.reporters import CsvReporter, SilentReporter
+from region_profiler.utils import SeqStats
+
+
+@pytest.mark.parametrize('stats_cls', [SeqStats, HistSeqStats])
+def test_delta_stats(stats_cls):
+    """Test that delta stats equal stats of the values added after the snapshot.
+    """
+    first = [5e-3, 44e-3, 6e-3]
+    second = [3e-3, 7e-3, 9e-3]
+
+    s = stats_cls()
+    for v in first:
+        s.add(v)
+    previous = stats_cls()
+    previous.merge(s)
+    for v in second:
+        s.add(v)
+
+    d = delta_stats(s, previous)
+    assert d.count == 3
+    assert d.total == pytest.approx(sum(second))
+    assert d.stddev == pytest.approx(statistics.pstdev(second))
+    if stats_cls is HistSeqStats:
+        assert d.histogram.count == 3
+        assert d.percentile(50) == pytest.approx(7e-3, rel=0.01)
+    assert delta_stats(s, s).count == 0
+
+
+def make_reporter(rp, **kwargs):
+    reporter = SilentReporter([cols.name, cols.count])
+    return reporter, PeriodicReporter(rp, 60, reporter, stream=io.StringIO(), **kwargs)
+
+
+def test_delta_reports():
+    rp = RegionProfiler()
+    reporter, periodic = make_reporter(rp)
+
+    for _ in range(3):
+        with rp.region('a'):
+            pass
+    periodic.report()
+    assert reporter.rows[2] == ['a', '3']
+
+    with rp.region('a'):
+        pass
+    with rp.region('b'):
+        pass
+    periodic.report()
+    # siblings are ordered by their real time
+    assert sorted(reporter.rows[2:]) == [['a', '1'], ['b', '1']]
+    assert periodic.stream.getvalue().count('# RegionProfiler report') == 2
+
+
+def test_cumulative_reports():
+    rp = RegionProfiler()
+    reporter, periodic = make_reporter(rp, delta=False)
+    for _ in range(2):
+        with rp.region('a'):
+            pass
+        periodic.report()
+    assert reporter.rows[2] == ['a', '2']
+
+
+def test_background_thread():
+    rp = RegionProfiler()
+    reporter, periodic = make_reporter(rp)
+    periodic.interval = 0.01
+    periodic.start()
+    deadline = time.time() + 5
+    while periodic.report_count < 2 and time.time() < deadline:
+        with rp.region('a'):
+            time.sleep(0.001)
+    periodic.stop()
+    assert periodic.report_count >= 3
+
+
+def test_rotating_file(tmpdir):
+    rp = RegionProfiler()
+    filename = str(tmpdir.join('profile.csv'))
+    shared_stream = io.StringIO()
+    reporter = CsvReporter(stream=shared_stream)
+    periodic = PeriodicReporter(rp, 60, reporter, filename=filename,
+                                max_bytes=200, backup_count=2)
+    for _ in range(5):
+        with rp.region('a'):
+            pass
+        periodic.report()
+
+    assert tmpdir.join('profile.csv.1').check()
+    assert tmpdir.join('profile.csv.2').check()
+    assert not tmpdir.join('profile.csv.3').check()
+    assert '# RegionProfiler report 5' in tmpdir.join('profile.csv.1').read()
+    # the shared reporter is not redirected to the file
+    assert reporter.stream is shared_stream
+    assert shared_stream.getvalue() == ''
@@ -0,0 +1,99 @@
+import urllib.request
+from unittest import mock
+
+from region_profiler import RegionProfiler
+from region_profiler.prometheus import (PrometheusExporter, format_metrics,
+                                        write_textfile)
+from region_profiler.reporters import get_profiler_slice
+from region_profiler.sampling import SamplingPolicy
+from region_profiler.utils import Timer
+
+
+def make_profiler(histograms=False):
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = [0, 0, 0.002, 0, 0.003, 0, 0.5, 1]
+    rp = RegionProfiler(timer_cls=lambda: Timer(mock_clock), histograms=histograms)
+    with rp.region('a'):
+        pass
+    with rp.region('a'):
+        with rp.region('b "x"'):
+            pass
+    rp.root.exit_region()  # stop root timer, so root stats do not change
+    return rp
+
+
+def test_format_counters():
+    rp = make_profiler()
+    text = format_metrics(get_profiler_slice(rp))
+    lines = text.splitlines()
+
+    assert '# TYPE region_profiler_region_hits_total counter' in lines
+    assert 'region_profiler_region_hits_total{path="<main>/a"} 2' in lines
+    assert 'region_profiler_region_hits_total{path="<main>/a/b \\"x\\""} 1' in lines
+    assert 'region_profiler_region_seconds_total{path="<main>"} 1.0' in lines
+    assert 'region_duration_seconds' not in text
+
+
+def test_format_histograms():
+    rp = make_profiler(histograms=True)
+    text = format_metrics(get_profiler_slice(rp), buckets=(0.001, 0.0025, 1))
+    lines = text.splitlines()
+
+    assert '# TYPE region_profiler_region_duration_seconds histogram' in lines
+    prefix = 'region_profiler_region_duration_seconds'
+    a = [line for line in lines
+         if line.startswith(prefix) and 'path="<main>/a"' in line]
+    assert a == [
+        prefix + '_bucket{path="<main>/a",le="0.001"} 0',
+        prefix + '_bucket{path="<main>/a",le="0.0025"} 1',
+        prefix + '_bucket{path="<main>/a",le="1.0"} 2',
+        prefix + '_bucket{path="<main>/a",le="+Inf"} 2',
+        prefix + '_count{path="<main>/a"} 2',
+        prefix + '_sum{path="<main>/a"} 0.502',
+    ]
+
+
+def test_format_sampled_regions():
+    """Test that counters export recorded hits, so that they agree
+    with histograms and never decrease, and estimates are exported as gauges.
+    """
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(100))
+    rp = RegionProfiler(timer_cls=lambda: Timer(mock_clock), histograms=True,
+                        sampling=SamplingPolicy.every(3))
+    for _ in range(4):
+        with rp.region('a'):
+            pass
+    rp.root.exit_region()
+    lines = format_metrics(get_profiler_slice(rp)).splitlines()
+
+    assert 'region_profiler_region_hits_total{path="<main>/a"} 2' in lines
+    assert 'region_profiler_region_skipped_hits_total{path="<main>/a"} 2' in lines
+    assert 'region_profiler_region_seconds_total{path="<main>/a"} 2.0' in lines
+    assert '# TYPE region_profiler_region_estimated_seconds gauge' in lines
+    assert 'region_profiler_region_estimated_seconds{path="<main>/a"} 4.0' in lines
+    assert 'region_profiler_region_duration_seconds_count{path="<main>/a"} 2' in lines
+    assert 'region_profiler_region_duration_seconds_sum{path="<main>/a"} 2.0' in lines
+
+
+def test_textfile(tmpdir):
+    rp = make_profiler()
+    filename = str(tmpdir.join('region_profiler.prom'))
+    write_textfile(rp, filename)
+    with open(filename) as f:
+        assert 'region_profiler_region_hits_total{path="<main>/a"} 2' in f.read()
+    assert tmpdir.listdir() == [tmpdir.join('region_profiler.prom')]
+
+
+def test_http_exporter():
+    rp = make_profiler()
+    exporter = PrometheusExporter(rp, port=0)
+    exporter.start()
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(exporter.port)
+        with urllib.request.urlopen(url) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            text = response.read().decode()
+    finally:
+        exporter.stop()
+    assert 'region_profiler_region_hits_total{path="<main>/a"} 2' in text
@@ -4,7 +4,11 @@ from unittest import mock
 import pytest
 
 from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
 from region_profiler.debug_listener import DebugListener
+from region_profiler.node import merge_nodes
+from region_profiler.reporters import get_profiler_slice
+from region_profiler.sampling import SamplingPolicy
 
 
 @pytest.mark.parametrize('profiler_cls', [RegionProfiler])
@@ -38,3 +42,104 @@ def test_recursive_global_func_call(profiler_cls):
     assert rp.root.children['foo()'].stats.count == 2
     assert rp.root.children['foo()'].stats.total >= 1.5
     assert rp.root.children['foo()'].stats.total <= 1.55
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_collapse_recursion(compact):
+    """Test that recursive entries are folded into a single node
+    with recursion depths of the hits.
+    """
+    rp = RegionProfiler(collapse_recursion=True, compact=compact)
+
+    @rp.func()
+    def fact(x):
+        with rp.region('step'):
+            return x * fact(x - 1) if x > 1 else x
+
+    assert fact(5) == 120
+    assert fact(3) == 6
+    with rp.region('outer'):
+        fact(1)
+
+    fact_node = rp.root.children['fact()']
+    assert list(fact_node.children) == ['step']
+    assert list(fact_node.children['step'].children) == []
+    assert fact_node.stats.count == 2
+    assert fact_node.recursion_depths == {5: 1, 3: 1}
+    assert fact_node.max_recursion_depth == 5
+    assert fact_node.children['step'].recursion_depths == {5: 1, 3: 1}
+    outer_fact = rp.root.children['outer'].children['fact()']
+    assert outer_fact.recursion_depths is None
+    assert outer_fact.max_recursion_depth == 1
+    assert rp.node_stack == [rp.root]
+
+    fact(2)
+    rp.root.exit_region()
+    slices = get_profiler_slice(rp)
+    fact_slice = [s for s in slices if s.name == 'fact()' and s.call_depth == 1][0]
+    assert cols.max_recursion_depth(fact_slice, slices) == '5'
+    assert cols.recursion_depths(fact_slice, slices) == '2:1 3:1 5:1'
+    merged = merge_nodes([fact_node, fact_node])
+    assert merged.recursion_depths == {2: 2, 3: 2, 5: 2}
+
+
+def test_nested_recursion_without_collapsing():
+    rp = RegionProfiler()
+
+    @rp.func()
+    def countdown(x):
+        if x > 1:
+            countdown(x - 1)
+
+    countdown(3)
+    node = rp.root.children['countdown()']
+    assert node.children['countdown()'].children['countdown()'].stats.count == 1
+    assert node.recursion_depths is None
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_recursion_depths_of_sampled_region(compact):
+    """Test that skipped hits are not reported as hits without recursion.
+    """
+    rp = RegionProfiler(collapse_recursion=True, compact=compact,
+                        sampling=SamplingPolicy.every(2))
+
+    @rp.func()
+    def rec(n):
+        if n:
+            rec(n - 1)
+
+    for n in (0, 0, 2, 2):
+        rec(n)
+    rp.root.exit_region()
+    slices = get_profiler_slice(rp)
+    rec_slice = [s for s in slices if s.name == 'rec()'][0]
+    assert rec_slice.count == 4
+    assert cols.recursion_depths(rec_slice, slices) == '1:1 3:1'
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_collapse_recursion_depends_on_stack(compact):
+    """Test that regions are collapsed by the current stack,
+    when their parent was entered before with a different stack.
+    """
+    rp = RegionProfiler(collapse_recursion=True, compact=compact)
+    with rp.region('A'):
+        with rp.region('C'):
+            pass
+    with rp.region('A'):
+        with rp.region('B'):
+            with rp.region('C'):
+                with rp.region('A'):
+                    with rp.region('C'):
+                        pass
+
+    a = rp.root.children['A']
+    assert a.recursion_depths == {2: 1}
+    assert a.children['C'].stats.count == 1
+    assert a.children['C'].recursion_depths is None
+    c = a.children['B'].children['C']
+    assert c.stats.count == 1
+    assert c.recursion_depths == {2: 1}
+    assert list(c.children) == []
+    assert rp.node_stack == [rp.root]
@@ -10,7 +10,10 @@ from region_profiler.reporters import (
     SilentReporter,
     Slice,
     get_profiler_slice,
+    get_tree_slice,
 )
+from region_profiler.node import RegionNode, merge_nodes
+from region_profiler.periodic import delta_tree
 from region_profiler.utils import SeqStatsProtocol
 
 
@@ -73,6 +76,46 @@ def test_slice_generation(dummy_region_profiler):
     assert slices == expected
 
 
+@pytest.mark.parametrize(
+    "top_k,min_percent,expected",
+    [
+        (1, 0.0, ["a", "c", "x"]),
+        (None, 22.0, ["a", "c", "d"]),
+        (2, 10.0, ["a", "c", "x", "d", "x"]),
+    ],
+)
+def test_slice_pruning(dummy_region_profiler, top_k, min_percent, expected):
+    """Test that pruned children are not serialized,
+    but their time is excluded from the inner time of the parent.
+    """
+    slices = get_profiler_slice(dummy_region_profiler, top_k, min_percent)
+    assert [s.name for s in slices[1:]] == expected
+    assert [s.id for s in slices] == list(range(len(slices)))
+    assert slices[1].total_inner_time == 15
+
+    r = SilentReporter([cols.name])
+    r.dump_slices(slices)
+    assert len(r.rows) == len(slices) + 1
+
+
+def test_deep_tree_slice():
+    """Test that trees deeper than the recursion limit can be reported."""
+    depth = sys.getrecursionlimit() * 2
+    root = RegionNode("root")
+    node = root
+    for i in range(depth):
+        node = node.get_child("n")
+        node.stats.add(depth - i)
+
+    merged = merge_nodes([root, root])
+    delta = delta_tree(merged, merge_nodes([root]))
+    slices = get_tree_slice(delta)
+    assert len(slices) == depth + 1
+    assert slices[-1].call_depth == depth
+    assert slices[-1].count == 1
+    assert slices[1].total_inner_time == 1
+
+
 def test_silent_reporter(dummy_region_profiler):
     """Test :py:class:`SilentReporter` reporter."""
     r = SilentReporter([cols.name, cols.node_id, cols.parent_id, cols.total_us])
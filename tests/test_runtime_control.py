@@ -0,0 +1,171 @@
+import asyncio
+import os
+import signal
+from unittest import mock
+
+import pytest
+
+import region_profiler.global_instance
+from region_profiler import RegionProfiler, toggle_on_signal
+
+
+def run_regions(rp, n=2):
+    for _ in range(n):
+        with rp.region('a'):
+            with rp.region('b'):
+                pass
+        with rp.region('data'):
+            with rp.region('c'):
+                pass
+
+
+def test_pause_resume():
+    """Test that paused hits are not recorded and stats are kept.
+    """
+    listener = mock.Mock()
+    rp = RegionProfiler(listeners=[listener])
+    run_regions(rp)
+    rp.pause()
+    run_regions(rp)
+    listener.reset_mock()
+    with rp.region('a'):
+        rp.resume()
+        with rp.region('b'):
+            pass
+
+    a = rp.root.children['a']
+    assert a.stats.count == 2
+    assert a.skipped == 0
+    # regions entered after resume are recorded, even inside a paused hit
+    assert a.children['b'].stats.count == 3
+    assert rp.root.children['data'].stats.count == 2
+    assert rp.node_stack == [rp.root]
+    assert a.mute_depth == 0
+    assert listener.region_entered.call_count == 1
+
+
+def test_pause_inside_region():
+    """Test that a region entered before pause is recorded on exit.
+    """
+    rp = RegionProfiler()
+    with rp.region('a'):
+        rp.pause()
+        with rp.region('b'):
+            pass
+    rp.resume()
+
+    assert rp.root.children['a'].stats.count == 1
+    assert rp.root.children['a'].children['b'].stats.count == 0
+
+
+def test_disable_regions():
+    """Test that disabled regions and their subtrees are not recorded.
+    """
+    rp = RegionProfiler()
+    rp.disable_regions('dat?', 'x*')
+    run_regions(rp)
+    for _ in rp.iter_proxy([1, 2], 'xs'):
+        pass
+
+    assert rp.root.children['a'].stats.count == 2
+    assert rp.root.children['a'].children['b'].stats.count == 2
+    assert rp.root.children['data'].stats.count == 0
+    assert rp.root.children['data'].children['c'].stats.count == 0
+    assert rp.root.children['xs'].stats.count == 0
+
+    rp.enable_regions('dat?')
+    assert rp.disabled_patterns == ('x*',)
+    run_regions(rp)
+    assert rp.root.children['data'].children['c'].stats.count == 2
+    rp.enable_regions()
+    assert rp.disabled_patterns == ()
+
+
+def test_pause_async_regions():
+    """Test that asynchronous regions and coroutine functions
+    entered while paused are not recorded.
+    """
+    rp = RegionProfiler()
+
+    @rp.func()
+    async def fetch():
+        with rp.region('parse'):
+            pass
+
+    async def main():
+        async with rp.aregion('a'):
+            with rp.region('b'):
+                pass
+        await fetch()
+
+    rp.pause()
+    asyncio.run(main())
+    rp.resume()
+    asyncio.run(main())
+
+    a = rp.root.children['a']
+    assert a.stats.count == 1
+    assert a.children['b'].stats.count == 1
+    assert a.mute_depth == 0
+    fetch_node = rp.root.children['fetch()']
+    assert fetch_node.stats.count == 1
+    assert fetch_node.children['parse'].stats.count == 1
+
+
+def test_disable_async_regions():
+    """Test that disabled asynchronous regions and their subtrees,
+    both synchronous and asynchronous, are not recorded.
+    """
+    rp = RegionProfiler()
+    rp.disable_regions('a')
+
+    async def main():
+        async with rp.aregion('a'):
+            with rp.region('b'):
+                pass
+            async with rp.aregion('c'):
+                pass
+        async with rp.aregion('d'):
+            with rp.region('a'):
+                pass
+
+    asyncio.run(main())
+
+    a = rp.root.children['a']
+    assert a.stats.count == 0
+    assert a.children['b'].stats.count == 0
+    assert a.children['c'].stats.count == 0
+    assert a.mute_depth == 0
+    d = rp.root.children['d']
+    assert d.stats.count == 1
+    assert d.children['a'].stats.count == 0
+
+
+def test_add_remove_listener():
+    listener = mock.Mock()
+    rp = RegionProfiler()
+    run_regions(rp, 1)
+    rp.add_listener(listener)
+    run_regions(rp, 1)
+    rp.remove_listener(listener)
+    run_regions(rp, 1)
+
+    assert listener.region_entered.call_count == 4
+    assert listener.region_exited.call_count == 4
+    listener.finalize.assert_called_once_with()
+    assert rp.listeners == []
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='requires SIGUSR1')
+def test_toggle_on_signal(monkeypatch):
+    rp = RegionProfiler()
+    monkeypatch.setattr(region_profiler.global_instance, '_profiler', rp)
+    old_handler = signal.getsignal(signal.SIGUSR1)
+    try:
+        toggle_on_signal()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert rp.paused
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert not rp.paused
+    finally:
+        signal.signal(signal.SIGUSR1, old_handler)
@@ -0,0 +1,148 @@
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.reporters import get_profiler_slice
+from region_profiler.sampling import RandomSampling, RateLimitedSampling, SamplingPolicy
+from region_profiler.snapshot import load, save
+from region_profiler.utils import Timer
+
+
+def make_profiler(**kwargs):
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 1000, 1))
+    return RegionProfiler(timer_cls=lambda: Timer(mock_clock), **kwargs)
+
+
+def test_every_nth_sampling():
+    """Test that unsampled hits are only counted
+    and the report estimates totals for all hits.
+    """
+    listener = mock.Mock()
+    rp = make_profiler(sampling=SamplingPolicy.every(4), listeners=[listener])
+    for _ in range(8):
+        with rp.region('a'):
+            with rp.region('b'):
+                pass
+
+    a = rp.root.children['a']
+    b = a.children['b']
+    assert a.stats.count == 2
+    assert a.skipped == 6
+    assert a.sample_rate == 0.25
+    assert a.estimated_total == a.stats.total * 4
+    # nested regions stay in place and are sampled independently
+    assert b.stats.count == 2
+    assert b.skipped == 6
+    # entered, exited for each of 4 recorded nodes, plus root enter
+    assert listener.region_entered.call_count == 5
+    assert listener.region_exited.call_count == 4
+
+    rp.root.exit_region()
+    slices = get_profiler_slice(rp)
+    assert slices[1].name == 'a'
+    assert slices[1].count == 8
+    assert slices[1].total_time == a.estimated_total
+    assert cols.sample_rate(slices[1], slices) == '25.00%'
+    assert cols.sample_rate(slices[0], slices) == '100.00%'
+
+
+def test_region_sampling_overrides_profiler():
+    """Test that region sampling policy overrides profiler one.
+    """
+    rp = make_profiler(sampling=SamplingPolicy.every(2))
+    for _ in range(4):
+        with rp.region('a', sampling=SamplingPolicy.every(1)):
+            pass
+        with rp.region('b'):
+            pass
+
+    assert rp.root.children['a'].skipped == 0
+    assert rp.root.children['b'].skipped == 2
+
+
+def test_region_sampling_is_per_call():
+    """Test that a sampling policy passed to a single call is not applied
+    to other calls of the same region.
+    """
+    rp = make_profiler()
+    every_4 = SamplingPolicy.every(4)
+    for _ in range(4):
+        with rp.region('a', sampling=every_4):
+            pass
+        with rp.region('a'):
+            pass
+
+    assert rp.root.children['a'].stats.count == 6
+    assert rp.root.children['a'].skipped == 2
+
+
+def test_sampling_recursive_and_canceled():
+    """Test that recursive entries follow the outermost hit
+    and canceled hits are not counted.
+    """
+    rp = make_profiler(sampling=SamplingPolicy.every(2))
+
+    def recurse(depth):
+        with rp.region('r'):
+            if depth:
+                recurse(depth - 1)
+
+    recurse(2)
+    recurse(2)
+    r = rp.root.children['r']
+    assert r.stats.count == 1
+    assert r.skipped == 1
+    assert r.recursion_depth == 0
+    assert r.skip_depth == 0
+
+    for _ in rp.iter_proxy([1, 2, 3], 'it'):
+        pass
+    it = rp.root.children['it']
+    assert it.stats.count + it.skipped == 3
+    assert rp.node_stack == [rp.root]
+
+
+def test_random_sampling():
+    values = iter([0.1, 0.9, 0.4, 0.6])
+    policy = RandomSampling(0.5, random_fn=lambda: next(values))
+    rp = make_profiler(sampling=policy)
+    for _ in range(4):
+        with rp.region('a'):
+            pass
+    assert rp.root.children['a'].stats.count == 2
+    assert rp.root.children['a'].skipped == 2
+
+
+def test_rate_limited_sampling():
+    clock = mock.Mock()
+    clock.side_effect = [0, 0.1, 0.2, 0.3, 0.4, 1.5, 1.6]
+    policy = RateLimitedSampling(2, clock=clock)
+    node = mock.Mock()
+    assert [policy.should_record(node) for _ in range(6)] == [
+        True, True, False, False, True, True]
+
+
+@pytest.mark.parametrize('args', [
+    (SamplingPolicy.every, 0),
+    (SamplingPolicy.probability, 0),
+    (SamplingPolicy.probability, 1.5),
+    (SamplingPolicy.rate_limited, 0),
+])
+def test_invalid_sampling_policy(args):
+    with pytest.raises(ValueError):
+        args[0](args[1])
+
+
+def test_snapshot_keeps_skipped(tmpdir):
+    rp = make_profiler(sampling=SamplingPolicy.every(3))
+    for _ in range(5):
+        with rp.region('a'):
+            pass
+    rp.root.exit_region()
+
+    filename = str(tmpdir.join('sampled.rps'))
+    save(rp.root, filename)
+    assert load(filename).children['a'].skipped == 3
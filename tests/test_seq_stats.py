@@ -1,9 +1,12 @@
+import statistics
+
 import pytest
 
+from region_profiler.histogram import HistSeqStats
 from region_profiler.utils import SeqStats
 
 
-@pytest.mark.parametrize('stats_cls', [SeqStats])
+@pytest.mark.parametrize('stats_cls', [SeqStats, HistSeqStats])
 def test_seq_stats(stats_cls):
     values = [5, 44, 6, 3, 7]
 
@@ -29,3 +32,54 @@ def test_seq_stats(stats_cls):
     assert s.avg == sum(values) / len(values)
     assert s.min == min(values)
     assert s.max == max(values)
+
+
+@pytest.mark.parametrize('stats_cls', [SeqStats, HistSeqStats])
+def test_seq_stats_merge(stats_cls):
+    """Test that merged stats equal stats of the concatenated sequence.
+    """
+    a_values = [5, 44, 6]
+    b_values = [3, 7]
+
+    a = stats_cls()
+    b = stats_cls()
+    full = stats_cls()
+    for v in a_values:
+        a.add(v)
+        full.add(v)
+    for v in b_values:
+        b.add(v)
+        full.add(v)
+
+    empty = stats_cls()
+    empty.merge(a)
+    assert empty == a
+
+    a.merge(b)
+    assert a == full
+    a.merge(stats_cls())
+    assert a == full
+
+
+@pytest.mark.parametrize('stats_cls', [SeqStats, HistSeqStats])
+def test_seq_stats_stddev(stats_cls):
+    """Test that online and merged standard deviation match
+    the standard deviation of the whole sequence.
+    """
+    values = [5, 44, 6, 3, 7]
+    expected = statistics.pstdev(values)
+
+    s = stats_cls()
+    for v in values:
+        s.add(v)
+    assert s.stddev == pytest.approx(expected)
+
+    a = stats_cls()
+    b = stats_cls()
+    for v in values[:2]:
+        a.add(v)
+    for v in values[2:]:
+        b.add(v)
+    a.merge(b)
+    assert a.stddev == pytest.approx(expected)
+    assert stats_cls().stddev == 0
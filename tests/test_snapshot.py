@@ -0,0 +1,144 @@
+import io
+import struct
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler, snapshot
+from region_profiler.cli import main
+from region_profiler.node import RegionNode
+from region_profiler.utils import SeqStats, Timer
+
+
+def make_profiler(n):
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = list(range(0, 1000, 1))
+    rp = RegionProfiler(timer_cls=lambda: Timer(mock_clock))
+    for i in range(n):
+        with rp.region('a'):
+            with rp.region('b'):
+                pass
+            if i % 2:
+                with rp.region('c'):
+                    pass
+    rp.root.exit_region()  # stop root timer, so root stats do not change
+    return rp
+
+
+def assert_trees_equal(a, b):
+    assert a.name == b.name
+    assert a.stats == b.stats
+    assert set(a.children) == set(b.children)
+    for name in a.children:
+        assert_trees_equal(a.children[name], b.children[name])
+
+
+def test_save_load(tmpdir):
+    """Test that a saved snapshot is loaded back unchanged.
+    """
+    rp = make_profiler(3)
+    rp.root.children['a'].running_stats = SeqStats(2, 1.5, 0.5, 1.0)
+    filename = str(tmpdir.join('profile.rps'))
+    snapshot.save(rp.root, filename)
+    root = snapshot.load(filename)
+
+    assert_trees_equal(root, rp.root)
+    assert root.children['a'].running_stats == SeqStats(2, 1.5, 0.5, 1.0)
+    assert root.children['a'].children['b'].running_stats is None
+
+
+def test_save_load_recursion_and_overhead_counts():
+    """Test that hit counts by recursion depth and numbers
+    of region entries are saved.
+    """
+    rp = make_profiler(2)
+    a = rp.root.children['a']
+    a.recursion_depths = {1: 3, 4: 1}
+    a.descendant_hits = 7
+    f = io.BytesIO()
+    snapshot.write(f, rp.root)
+    f.seek(0)
+    root = snapshot.read(f)
+
+    assert root.children['a'].recursion_depths == {1: 3, 4: 1}
+    assert root.children['a'].descendant_hits == 7
+    assert root.children['a'].children['b'].recursion_depths is None
+    assert root.children['a'].children['b'].descendant_hits == 0
+
+
+def test_load_version_1():
+    """Test that snapshots of the first format version are loaded.
+    """
+    data = struct.pack('<6sH', b'RPSNAP', 1)
+    for name, stats, flags, child_count in [('root', (1, 3.0, 3.0, 3.0), 0, 1),
+                                            ('a', (2, 2.0, 0.5, 1.5), 1, 0)]:
+        data += struct.pack('<I', len(name)) + name.encode()
+        data += struct.pack('<qdddBI', *stats, flags, child_count)
+    data += struct.pack('<qddd', 2, 1.0, 0.5, 0.5)
+    root = snapshot.read(io.BytesIO(data))
+
+    assert root.stats == SeqStats(1, 3.0, 3.0, 3.0)
+    assert root.children['a'].stats == SeqStats(2, 2.0, 0.5, 1.5)
+    assert root.children['a'].running_stats == SeqStats(2, 1.0, 0.5, 0.5)
+
+
+def test_deep_tree():
+    """Test that deep trees are serialized without recursion.
+    """
+    root = RegionNode('root')
+    node = root
+    for i in range(5000):
+        node = node.get_child(str(i))
+        node.stats.add(i)
+
+    f = io.BytesIO()
+    snapshot.write(f, root)
+    f.seek(0)
+    node = snapshot.read(f)
+    for i in range(5000):
+        node = node.children[str(i)]
+        assert node.stats == SeqStats(1, i, i, i)
+
+
+def test_invalid_snapshot():
+    """Test that invalid and truncated snapshots are rejected.
+    """
+    with pytest.raises(ValueError):
+        snapshot.read(io.BytesIO(b'not a snapshot'))
+
+    f = io.BytesIO()
+    snapshot.write(f, make_profiler(1).root)
+    with pytest.raises(ValueError):
+        snapshot.read(io.BytesIO(f.getvalue()[:-1]))
+
+
+def test_merge_is_associative():
+    """Test that merging snapshots sums counts and totals
+    and does not depend on grouping.
+    """
+    roots = [make_profiler(n).root for n in (1, 2, 3)]
+    left = snapshot.merge([snapshot.merge(roots[:2]), roots[2]])
+    right = snapshot.merge([roots[0], snapshot.merge(roots[1:])])
+    assert_trees_equal(left, right)
+
+    a = left.children['a']
+    assert a.stats.count == 6
+    assert a.children['b'].stats.count == 6
+    assert a.children['c'].stats.count == 2
+
+
+def test_cli_merge(tmpdir, capsys):
+    """Test that CLI merges snapshots into a single report.
+    """
+    filenames = []
+    for n in (1, 2):
+        filenames.append(str(tmpdir.join('rank{}.rps'.format(n))))
+        snapshot.save(make_profiler(n).root, filenames[-1])
+    merged = str(tmpdir.join('merged.rps'))
+
+    assert main(['merge', '--format', 'csv', '-o', merged] + filenames) == 0
+    out, _ = capsys.readouterr()
+    rows = [[c.strip() for c in r.split(',')] for r in out.strip().split('\n')]
+    assert [r[1] for r in rows] == ['name', RegionProfiler.ROOT_NODE_NAME, 'a', 'b', 'c']
+    assert [r[6] for r in rows] == ['count', '2', '3', '3', '1']
+    assert snapshot.load(merged).children['a'].stats.count == 3
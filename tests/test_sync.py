@@ -0,0 +1,91 @@
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler.sync import CudaSynchronizer, SyncPolicy
+
+
+def run_regions(rp):
+    for _ in range(4):
+        with rp.region('a'):
+            with rp.region('b'):
+                pass
+
+
+@pytest.mark.parametrize('policy,expected_calls', [
+    (SyncPolicy.never(), 0),
+    (SyncPolicy.always(), 16),
+    (SyncPolicy.on_exit_only(), 8),
+    (SyncPolicy.named('b'), 8),
+    (SyncPolicy.sampled(2), 8),
+])
+def test_profiler_sync_policy(policy, expected_calls):
+    """Test that profiler synchronizes device according to its policy.
+    """
+    sync = mock.Mock()
+    rp = RegionProfiler(sync_policy=policy, synchronizer=sync)
+    run_regions(rp)
+    assert sync.call_count == expected_calls
+
+
+def test_no_sync_by_default():
+    """Test that device is not synchronized unless requested.
+    """
+    sync = mock.Mock()
+    rp = RegionProfiler(synchronizer=sync)
+    run_regions(rp)
+    assert sync.call_count == 0
+
+
+def test_region_sync_policy():
+    """Test that region policy overrides profiler policy.
+    """
+    sync = mock.Mock()
+    rp = RegionProfiler(synchronizer=sync)
+    with rp.region('a', sync_policy=SyncPolicy.on_exit_only()):
+        with rp.region('b'):
+            pass
+    assert sync.call_count == 1
+
+    @rp.func(sync_policy=SyncPolicy.always())
+    def foo():
+        pass
+
+    foo()
+    assert sync.call_count == 3
+
+
+def test_region_sync_policy_is_per_call():
+    """Test that a policy passed to a single call is not applied
+    to other calls of the same region.
+    """
+    sync = mock.Mock()
+    rp = RegionProfiler(synchronizer=sync)
+    policy = SyncPolicy.always()
+    for _ in range(2):
+        with rp.region('a', sync_policy=policy):
+            pass
+    assert sync.call_count == 4
+    with rp.region('a'):
+        pass
+    assert sync.call_count == 4
+    assert rp.root.children['a'].stats.count == 3
+    for _ in rp.iter_proxy([1], 'it', sync_policy=policy):
+        pass
+    for _ in rp.iter_proxy([1], 'it'):
+        pass
+    assert sync.call_count == 8
+
+
+def test_cuda_synchronizer_latches_failure():
+    """Test that synchronization failure is reported only once.
+    """
+    s = CudaSynchronizer.__new__(CudaSynchronizer)
+    s.failed = False
+    s._synchronize = mock.Mock(side_effect=RuntimeError('no CUDA'))
+    with pytest.warns(UserWarning, match='no CUDA'):
+        s()
+    assert s.failed
+    s()
+    assert s._synchronize.call_count == 1
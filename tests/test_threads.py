@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler.reporters import SilentReporter
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_thread_stacks_are_independent(profiler_cls):
+    """Test that regions entered concurrently from different threads
+    do not interleave in the hierarchy.
+    """
+    rp = profiler_cls()
+    barrier = threading.Barrier(4)
+
+    def worker(i):
+        with rp.region('request'):
+            barrier.wait()
+            with rp.region('handle'):
+                barrier.wait()
+        return rp.current_node
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        current = list(executor.map(worker, range(4)))
+
+    assert rp.root.children == {}
+    assert len(rp.thread_roots) == 4
+    assert current == rp.thread_roots
+    for root in rp.thread_roots:
+        assert set(root.children) == {'request'}
+        request = root.children['request']
+        assert set(request.children) == {'handle'}
+        assert request.stats.count == 1
+        assert request.recursion_depth == 0
+        assert request.children['handle'].stats.count == 1
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_merged_report(profiler_cls):
+    """Test that reports merge region trees of all threads.
+    """
+    rp = profiler_cls()
+
+    def worker(i):
+        with rp.region('request', asglobal=True):
+            for _ in range(i):
+                with rp.region('step'):
+                    pass
+
+    with rp.region('main'):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(worker, [1, 2, 3]))
+
+    merged = rp.merged_root()
+    assert merged.stats is rp.root.stats
+    assert set(merged.children) == {'main', 'request'}
+    assert merged.children['request'].stats.count == 3
+    assert merged.children['request'].children['step'].stats.count == 6
+
+    reporter = SilentReporter([cols.name, cols.count])
+    reporter.dump_profiler(rp)
+    assert reporter.rows[1:] == [
+        [RegionProfiler.ROOT_NODE_NAME, '1'],
+        ['main', '1'],
+        ['request', '3'],
+        ['step', '6'],
+    ] or reporter.rows[1:] == [
+        [RegionProfiler.ROOT_NODE_NAME, '1'],
+        ['request', '3'],
+        ['step', '6'],
+        ['main', '1'],
+    ]
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_finished_threads_are_folded(compact):
+    """Test that trees of finished threads are merged into a single tree
+    and their cached region contexts are dropped.
+    """
+    rp = RegionProfiler(compact=compact)
+
+    def worker():
+        with rp.region('request'):
+            with rp.region('handle'):
+                pass
+
+    for _ in range(5):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert len(rp.thread_roots) == 1
+    with rp.region('main'):
+        pass
+
+    merged = rp.merged_root()
+    assert rp.thread_roots == []
+    assert set(merged.children) == {'main', 'request'}
+    assert merged.children['request'].stats.count == 5
+    assert merged.children['request'].children['handle'].stats.count == 5
+    assert [parent for parent, _ in rp._contexts] == [rp.root]
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert rp.merged_root().children['request'].stats.count == 6
@@ -2,7 +2,7 @@ from unittest import mock
 
 import pytest
 
-from region_profiler.utils import Timer
+from region_profiler.utils import CLOCKS, NsTimer, Timer, get_clock, make_timer_cls
 
 
 @pytest.mark.parametrize('timer_cls', [Timer])
@@ -90,3 +90,38 @@ def test_timer_multiple_shots(timer_cls):
     assert t.end_ts() == 200
     assert t.elapsed() == 80
     assert not t.is_running()
+
+
+def test_ns_timer():
+    """Test that ``NsTimer`` subtracts integer timestamps
+    and reports seconds.
+    """
+    base = 10 ** 18  # float seconds would lose nanoseconds at this point
+    mock_clock = mock.Mock()
+    mock_clock.side_effect = [base + 10, base + 25, base + 40]
+    t = NsTimer(clock=mock_clock)
+
+    t.start()
+    assert t.current_elapsed() == pytest.approx(15e-9)
+    t.stop()
+    assert t.elapsed() == pytest.approx(30e-9)
+    assert t.begin_ts() == pytest.approx(base * 1e-9)
+    assert t.last_event_time == t.end_ts()
+
+
+@pytest.mark.parametrize('name,timer_cls,scale', [
+    ('perf_counter', Timer, 1.0),
+    ('perf_counter_ns', NsTimer, 1e-9),
+    ('thread_time_ns', NsTimer, 1e-9),
+    ('process_time', Timer, 1.0),
+])
+def test_make_timer_cls(name, timer_cls, scale):
+    t = make_timer_cls(name)()
+    assert type(t) is timer_cls
+    assert t.clock is CLOCKS[name]
+    assert get_clock(name) == (CLOCKS[name], scale)
+
+
+def test_unknown_clock():
+    with pytest.raises(ValueError):
+        make_timer_cls('sundial')
@@ -1,7 +1,10 @@
+import functools
+
 import pytest
 
-from region_profiler.utils import (NullContext, null_decorator,
-                                   pretty_print_time)
+from region_profiler.utils import (NullContext, get_name_by_callsite,
+                                   is_coroutine_function, null_decorator,
+                                   pretty_print_bytes, pretty_print_time)
 
 
 def test_pretty_print_time():
@@ -18,6 +21,16 @@ def test_pretty_print_time():
     assert pretty_print_time(0.00000013244) == '132 ns'
 
 
+def test_pretty_print_bytes():
+    assert pretty_print_bytes(0) == '0 B'
+    assert pretty_print_bytes(1023) == '1023 B'
+    assert pretty_print_bytes(1536) == '1.500 KiB'
+    assert pretty_print_bytes(-3 * 2 ** 20) == '-3.000 MiB'
+    assert pretty_print_bytes(150.5 * 2 ** 20) == '150.5 MiB'
+    assert pretty_print_bytes(12.5 * 2 ** 30) == '12.50 GiB'
+    assert pretty_print_bytes(2 ** 45) == '32768.0 GiB'
+
+
 def test_null_context():
     """Test null context.
     """
@@ -37,3 +50,43 @@ def test_null_decorator():
         return 42
 
     assert foo() == 42
+
+
+def test_is_coroutine_function():
+    """Test detection of ``async def`` functions, methods and partials.
+    """
+    async def coro(x):
+        pass
+
+    def func(x):
+        pass
+
+    class A:
+        async def method(self):
+            pass
+
+    assert is_coroutine_function(coro)
+    assert is_coroutine_function(A().method)
+    assert is_coroutine_function(functools.partial(coro, 1))
+    assert not is_coroutine_function(func)
+    assert not is_coroutine_function(functools.partial(func, 1))
+    assert not is_coroutine_function(A)
+    assert not is_coroutine_function(len)
+
+
+def test_callsite_names_cached():
+    """Test that callsite names are cached per call site
+    and different call sites on the same line get their own entries.
+    """
+    def name():
+        return get_name_by_callsite(1)
+
+    names = []
+    for _ in range(3):
+        names.append(name())
+    assert names[0] is names[1] is names[2]
+    assert names[0].startswith('test_callsite_names_cached() <test_utils.py:')
+
+    a, b = name(), name()
+    assert a == b
+    assert a != names[0]
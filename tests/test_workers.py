@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+from unittest import mock
+
+import pytest
+
+from region_profiler import RegionProfiler
+from region_profiler import reporter_columns as cols
+from region_profiler import snapshot
+from region_profiler.reporters import SilentReporter
+from region_profiler.workers import WorkerCollector
+
+fork = pytest.importorskip('multiprocessing').get_context('fork')
+
+
+def load_samples(rp, label, n):
+    rp.worker_collector.set_worker_label(label)
+    for _ in range(n):
+        with rp.region('__getitem__()'):
+            pass
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_worker_trees_are_collected(profiler_cls, tmpdir):
+    """Test that region trees of forked workers are reported by the main process.
+    """
+    rp = profiler_cls()
+    collector = WorkerCollector(rp, str(tmpdir))
+
+    with rp.region('epoch'):
+        workers = [fork.Process(target=load_samples, args=(rp, str(i), i + 1))
+                   for i in range(2)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+            assert w.exitcode == 0
+
+    assert set(rp.root.children) == {'epoch'}
+    assert rp.root.children['epoch'].children == {}
+
+    root = rp.merged_root()
+    assert set(root.children) == {'epoch', '<worker 0>', '<worker 1>'}
+    for i in range(2):
+        worker = root.children['<worker {}>'.format(i)]
+        assert worker.stats.count == 1
+        assert set(worker.children) == {'__getitem__()'}
+        assert worker.children['__getitem__()'].stats.count == i + 1
+    assert {int(name.split('-')[0]) for name in collector.worker_roots} == {
+        w.pid for w in workers}
+
+    reporter = SilentReporter([cols.name, cols.count])
+    reporter.dump_profiler(rp)
+    assert len(reporter.rows) == 7
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_workers_with_same_label_are_merged(profiler_cls, tmpdir):
+    """Test that trees of workers with the same label are merged.
+    """
+    rp = profiler_cls()
+    WorkerCollector(rp, str(tmpdir))
+
+    for _ in range(3):
+        w = fork.Process(target=load_samples, args=(rp, '0', 2))
+        w.start()
+        w.join()
+
+    root = rp.merged_root()
+    assert set(root.children) == {'<worker 0>'}
+    worker = root.children['<worker 0>']
+    assert worker.stats.count == 3
+    assert worker.children['__getitem__()'].stats.count == 6
+    assert len(tmpdir.listdir()) == 3
+
+
+@pytest.mark.parametrize('profiler_cls', [RegionProfiler])
+def test_unmodified_worker_trees_are_not_reloaded(profiler_cls, tmpdir):
+    rp = profiler_cls()
+    WorkerCollector(rp, str(tmpdir))
+    w = fork.Process(target=load_samples, args=(rp, '0', 2))
+    w.start()
+    w.join()
+
+    with mock.patch('region_profiler.snapshot.load', wraps=snapshot.load) as load:
+        rp.merged_root()
+        rp.merged_root()
+        assert load.call_count == 1
+        path = tmpdir.listdir()[0]
+        os.utime(str(path), ns=(0, 0))
+        assert rp.merged_root().children['<worker 0>'].stats.count == 1
+        assert load.call_count == 2